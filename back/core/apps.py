@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,4 +7,7 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals
+        from core.search import asegurar_indice
+
+        post_migrate.connect(asegurar_indice, sender=self, dispatch_uid='asegurar_indice_busqueda')
 
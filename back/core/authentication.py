@@ -0,0 +1,154 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+from .models import CustomUser
+
+# JWT sin consultas por petición:
+# - El token lleva lo que las vistas y el frontend necesitan del usuario (CLAIMS).
+# - El usuario autenticado sale del caché (AUTH_USER_CACHE_TIMEOUT); signals.py
+#   lo borra cada vez que se guarda un CustomUser (perfil, verificación, contraseña).
+#   Solo se guardan CAMPOS_EN_CACHE (nunca el hash de la contraseña); el resto se
+#   carga de la base si alguna vista lo pide. El borrado solo llega a todos los
+#   procesos con un caché compartido (REDIS_URL, 60 s por defecto); con LocMemCache
+#   otro worker sigue aceptando a un usuario desactivado hasta que vence su
+#   entrada, así que ahí el TTL por defecto es de 5 s. Lo mismo vale para la lista negra.
+# - El login ya no escribe un OutstandingToken: se crea solo al poner el token en
+#   la lista negra (logout), y la consulta a la lista negra también se cachea.
+# - run_worker borra de vez en cuando los OutstandingToken vencidos.
+
+CLAIMS = ('email', 'is_verified', 'first_name', 'last_name')
+CAMPOS_EN_CACHE = (
+    'id', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+    'is_verified', 'date_joined',
+)
+PREFIJO_USUARIO = 'auth:usuario'
+PREFIJO_LISTA_NEGRA = 'auth:lista_negra'
+
+
+def timeout_usuario():
+    # 0 desactiva el caché del usuario y de las respuestas "no" de la lista negra
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+
+
+def clave_usuario(usuario_id):
+    return f'{PREFIJO_USUARIO}:{usuario_id}'
+
+
+def invalidar_usuario(usuario_id):
+    # Ahora, y otra vez al confirmar (como invalidar_catalogo_al_confirmar)
+    cache.delete(clave_usuario(usuario_id))
+    transaction.on_commit(lambda: cache.delete(clave_usuario(usuario_id)))
+
+
+def poner_claims(token, user):
+    for claim in CLAIMS:
+        token[claim] = getattr(user, claim)
+
+
+def segundos_restantes(token):
+    vence = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    return max(int((vence - timezone.now()).total_seconds()), 1)
+
+
+class TokenConClaims(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        # Sin BlacklistMixin.for_user: no se guarda un OutstandingToken por login
+        token = super(BlacklistMixin, cls).for_user(user)
+        poner_claims(token, user)
+        return token
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        clave = f'{PREFIJO_LISTA_NEGRA}:{jti}'
+        en_lista = cache.get(clave)
+        if en_lista is None:
+            en_lista = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            # Un "no" se vuelve a confirmar pronto; un "sí" vale hasta que el token vence
+            cache.set(clave, en_lista, timeout=segundos_restantes(self) if en_lista else timeout_usuario())
+        if en_lista:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        resultado = super().blacklist()
+        cache.set(
+            f'{PREFIJO_LISTA_NEGRA}:{self.payload[api_settings.JTI_CLAIM]}', True,
+            timeout=segundos_restantes(self),
+        )
+        return resultado
+
+
+class RefrescarTokenSerializer(TokenRefreshSerializer):
+    # El access nuevo lleva los datos actuales del usuario, no los del login
+    token_class = TokenConClaims
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = usuario_en_cache(refresh[api_settings.USER_ID_CLAIM])
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        access = refresh.access_token
+        poner_claims(access, user)
+        data = {'access': str(access)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            poner_claims(refresh, user)
+            data['refresh'] = str(refresh)
+        return data
+
+
+class CerrarSesionSerializer(TokenBlacklistSerializer):
+    token_class = TokenConClaims
+
+
+def usuario_en_cache(usuario_id):
+    timeout = timeout_usuario()
+    if not timeout:
+        return CustomUser.objects.filter(pk=usuario_id).first()
+    clave = clave_usuario(usuario_id)
+    campos = cache.get(clave)
+    if campos is None:
+        campos = CustomUser.objects.filter(pk=usuario_id).values(*CAMPOS_EN_CACHE).first()
+        if campos is None:
+            return None
+        cache.set(clave, campos, timeout=timeout)
+    # Los demás campos quedan diferidos: save() sin update_fields solo escribe estos.
+    # from_db espera los valores en el orden de los campos del modelo
+    nombres = [f.attname for f in CustomUser._meta.concrete_fields if f.attname in campos]
+    return CustomUser.from_db(DEFAULT_DB_ALIAS, nombres, [campos[nombre] for nombre in nombres])
+
+
+class JWTAuthenticationEnCache(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed(_("Token contained no recognizable user identification"), code="token_not_valid")
+        user = usuario_en_cache(usuario_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+def purgar_tokens_vencidos():
+    # Lo mismo que `manage.py flushexpiredtokens` (borra en cascada su BlacklistedToken)
+    _total, borrados = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return borrados.get(OutstandingToken._meta.label, 0)
@@ -0,0 +1,119 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+# Caché de lecturas anónimas del catálogo (GET /api/materiales/).
+# Todos los visitantes sin sesión ven el mismo listado, así que la respuesta
+# ya serializada se guarda con una clave que depende de la versión del catálogo
+# y de los parámetros normalizados (filtros, búsqueda, orden, cursor).
+# Cualquier escritura en Material/Calificacion sube la versión (signals.py):
+# las claves viejas dejan de usarse y expiran solas. Funciona con cualquier
+# backend de Django (locmem en desarrollo y pruebas, Redis/memcached en producción).
+
+PREFIJO = 'catalogo'
+CLAVE_VERSION = f'{PREFIJO}:version'
+CLAVE_ACIERTOS = f'{PREFIJO}:aciertos'
+CLAVE_FALLOS = f'{PREFIJO}:fallos'
+
+
+def cache_catalogo():
+    return caches[getattr(settings, 'CATALOGO_CACHE_ALIAS', 'default')]
+
+
+def timeout_catalogo():
+    return getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 300)
+
+
+def version_catalogo():
+    cache = cache_catalogo()
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, 1, timeout=None)
+        version = cache.get(CLAVE_VERSION, 1)
+    return version
+
+
+def invalidar_catalogo():
+    cache = cache_catalogo()
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        # La versión expiró o el caché se reinició: cualquier valor nuevo sirve
+        cache.set(CLAVE_VERSION, version_catalogo() + 1, timeout=None)
+
+
+def invalidar_catalogo_al_confirmar():
+    # Ahora, y otra vez al confirmar: lo que un lector haya guardado entre la
+    # escritura y el commit (con los datos viejos) queda descartado
+    invalidar_catalogo()
+    transaction.on_commit(invalidar_catalogo)
+
+
+def parametros_normalizados(query_params):
+    # El orden de los parámetros y los vacíos no cambian la respuesta
+    pares = []
+    for nombre in sorted(query_params):
+        for valor in sorted(query_params.getlist(nombre)):
+            valor = valor.strip()
+            if valor:
+                pares.append((nombre, valor))
+    return urlencode(pares)
+
+
+def clave_respuesta(request):
+    # El host entra en la clave porque los enlaces next/previous son absolutos
+    base = f'{request.get_host()}{request.path}?{parametros_normalizados(request.query_params)}'
+    digest = hashlib.sha256(base.encode()).hexdigest()
+    return f'{PREFIJO}:v{version_catalogo()}:{digest}'
+
+
+def contar(clave):
+    cache = cache_catalogo()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, timeout=None)
+        cache.incr(clave)
+
+
+def metricas():
+    cache = cache_catalogo()
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': aciertos / total if total else None,
+        'version': cache.get(CLAVE_VERSION),
+    }
+
+
+def reiniciar_metricas():
+    cache_catalogo().delete_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+
+
+class CatalogoCacheMixin:
+    # Para ListAPIView: cachea el listado solo para usuarios anónimos
+    # (el de un usuario autenticado incluye mi_calificacion y sus filtros)
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated or timeout_catalogo() <= 0:
+            return super().list(request, *args, **kwargs)
+
+        cache = cache_catalogo()
+        clave = clave_respuesta(request)
+        datos = cache.get(clave)
+        if datos is not None:
+            contar(CLAVE_ACIERTOS)
+            return Response(datos, headers={'X-Cache': 'HIT'})
+
+        contar(CLAVE_FALLOS)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(clave, response.data, timeout=timeout_catalogo())
+        response['X-Cache'] = 'MISS'
+        return response
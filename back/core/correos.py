@@ -0,0 +1,131 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import CorreoPendiente
+from .tasks import BACKOFF_BASE, TIEMPO_MAXIMO, worker_id
+
+# Bandeja de salida de correos. Las vistas solo guardan el correo ya renderizado
+# (encolar_correo), dentro de su transacción: si el registro se revierte, el
+# correo también. run_worker los envía por lotes, todos los de un lote por la
+# misma conexión SMTP, y reintenta con espera exponencial si el servidor falla.
+
+# plantilla -> asunto; el cuerpo está en templates/core/emails/<plantilla>.txt/.html
+PLANTILLAS = {
+    'verificacion': 'Verifica tu cuenta en Kichwa Yachay',
+    'recuperacion': 'Recupera tu contraseña en Kichwa Yachay',
+}
+
+
+def tamanio_lote():
+    return getattr(settings, 'CORREOS_LOTE', 50)
+
+
+@lru_cache(maxsize=None)
+def plantillas(nombre):
+    # Se compilan una sola vez por proceso
+    return (
+        get_template(f'core/emails/{nombre}.txt'),
+        get_template(f'core/emails/{nombre}.html'),
+    )
+
+
+def encolar_correo(plantilla, destinatario, **contexto):
+    texto, html = plantillas(plantilla)
+    return CorreoPendiente.objects.create(
+        plantilla=plantilla,
+        destinatario=destinatario,
+        asunto=PLANTILLAS[plantilla],
+        texto=texto.render(contexto),
+        html=html.render(contexto),
+    )
+
+
+def reclamar_correos(limite, worker=None):
+    # Igual que reclamar_siguiente (tasks.py), pero por lotes: el UPDATE repite
+    # la condición, así dos workers no se quedan con el mismo correo
+    ahora = timezone.now()
+    worker = worker or worker_id()
+    disponibles = (
+        models.Q(estado=CorreoPendiente.PENDIENTE, disponible_desde__lte=ahora)
+        | models.Q(estado=CorreoPendiente.EN_PROCESO, tomado_en__lt=ahora - TIEMPO_MAXIMO)
+    )
+    ids = list(
+        CorreoPendiente.objects.filter(disponibles)
+        .order_by('disponible_desde', 'id').values_list('id', flat=True)[:limite]
+    )
+    if not ids:
+        return []
+    CorreoPendiente.objects.filter(disponibles, id__in=ids).update(
+        estado=CorreoPendiente.EN_PROCESO,
+        intentos=models.F('intentos') + 1,
+        tomado_en=ahora,
+        worker=worker,
+    )
+    return list(CorreoPendiente.objects.filter(
+        id__in=ids, estado=CorreoPendiente.EN_PROCESO, tomado_en=ahora, worker=worker,
+    ).order_by('id'))
+
+
+def mensaje(correo, connection):
+    msg = EmailMultiAlternatives(
+        correo.asunto, correo.texto, settings.DEFAULT_FROM_EMAIL, [correo.destinatario],
+        connection=connection,
+    )
+    if correo.html:
+        msg.attach_alternative(correo.html, "text/html")
+    return msg
+
+
+def marcar_error(correo, error):
+    correo.ultimo_error = f"{type(error).__name__}: {error}"
+    if correo.intentos >= correo.max_intentos:
+        correo.estado = CorreoPendiente.FALLIDO
+    else:
+        correo.estado = CorreoPendiente.PENDIENTE
+        correo.disponible_desde = timezone.now() + BACKOFF_BASE * (2 ** (correo.intentos - 1))
+    correo.save(update_fields=['estado', 'ultimo_error', 'disponible_desde'])
+
+
+def enviar_lote(correos):
+    enviados = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Sin servidor no se intenta ninguno del lote
+        for correo in correos:
+            marcar_error(correo, e)
+        return enviados
+    try:
+        for correo in correos:
+            try:
+                mensaje(correo, connection).send()
+            except Exception as e:
+                marcar_error(correo, e)
+            else:
+                correo.estado = CorreoPendiente.ENVIADO
+                enviados.append(correo)
+    finally:
+        connection.close()
+    CorreoPendiente.objects.filter(id__in=[c.id for c in enviados]).update(
+        estado=CorreoPendiente.ENVIADO, fecha_envio=timezone.now(), ultimo_error='',
+    )
+    return enviados
+
+
+def enviar_correos_pendientes(limite=None, worker=None):
+    # Devuelve los correos que se tomaron (enviados o no) en esta pasada
+    procesados = []
+    while limite is None or len(procesados) < limite:
+        lote = tamanio_lote() if limite is None else min(tamanio_lote(), limite - len(procesados))
+        correos = reclamar_correos(lote, worker)
+        if not correos:
+            break
+        enviar_lote(correos)
+        procesados.extend(correos)
+    return procesados
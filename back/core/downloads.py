@@ -0,0 +1,156 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date
+
+from .storage import blob_storage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+class RangoInvalido(Exception):
+    pass
+
+
+def parse_range(header, size):
+    # Solo un rango por petición; cualquier otra cosa se ignora y se envía todo
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    inicio, fin = match.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        sufijo = int(fin)
+        if sufijo == 0 or size == 0:
+            raise RangoInvalido()
+        return max(size - sufijo, 0), size - 1
+    inicio = int(inicio)
+    fin = int(fin) if fin else None
+    if fin is not None and fin < inicio:
+        return None
+    if inicio >= size:
+        raise RangoInvalido()
+    return inicio, size - 1 if fin is None else min(fin, size - 1)
+
+
+def _leer_rango(archivo, inicio, largo):
+    try:
+        archivo.seek(inicio)
+        while largo > 0:
+            chunk = archivo.read(min(CHUNK_SIZE, largo))
+            if not chunk:
+                break
+            largo -= len(chunk)
+            yield chunk
+    finally:
+        archivo.close()
+
+
+async def _leer_rango_async(archivo, inicio, largo):
+    # Igual que _leer_rango, para ASGI: cada lectura va a un hilo y el event
+    # loop queda libre mientras un cliente lento recibe el archivo.
+    # (Con un iterador síncrono, Django bajo ASGI lee el archivo entero a memoria.)
+    leer = sync_to_async(archivo.read, thread_sensitive=False)
+    try:
+        await sync_to_async(archivo.seek, thread_sensitive=False)(inicio)
+        while largo > 0:
+            chunk = await leer(min(CHUNK_SIZE, largo))
+            if not chunk:
+                break
+            largo -= len(chunk)
+            yield chunk
+    finally:
+        archivo.close()
+
+
+def es_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _cabeceras_de_cache(response, etag, last_modified, immutable, vary=None):
+    response['ETag'] = etag
+    if vary:
+        patch_vary_headers(response, vary)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Una URL versionada (?v=<digest>) nunca cambia de contenido
+    response['Cache-Control'] = 'public, max-age=31536000, immutable' if immutable else 'no-cache'
+    return response
+
+
+def _if_range_coincide(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return last_modified is not None and if_range == http_date(last_modified)
+
+
+def serve_blob(request, digest, size, content_type, filename, as_attachment=True, last_modified=None,
+               immutable=False, name=None, vary=None):
+    # Envía un archivo del almacenamiento sin cargarlo entero en memoria.
+    # El ETag es el SHA-256, así que un 304 se decide sin abrir el archivo.
+    # Con DOWNLOAD_SENDFILE el servidor web (Apache/nginx) entrega los bytes.
+    # `name` sirve otro archivo del almacenamiento (p. ej. una variante) con
+    # `digest` como clave del ETag. Bajo ASGI el cuerpo es un iterador asíncrono.
+    etag = f'"{digest}"'
+    storage = blob_storage()
+    name = name or storage.name_for(digest)
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    condicional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if condicional is not None:
+        return _cabeceras_de_cache(condicional, etag, last_modified, immutable, vary)
+
+    disposition = content_disposition_header(as_attachment, filename)
+
+    modo = getattr(settings, 'DOWNLOAD_SENDFILE', '')
+    if modo:
+        response = HttpResponse(content_type=content_type)
+        if modo == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + name.replace('\\', '/')
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        response['Content-Disposition'] = disposition
+        return _cabeceras_de_cache(response, etag, last_modified, immutable, vary)
+
+    try:
+        rango = None
+        if _if_range_coincide(request, etag, last_modified):
+            rango = parse_range(request.headers.get('Range'), size)
+    except RangoInvalido:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    archivo = storage.open(name, 'rb')
+    if es_asgi(request):
+        inicio, fin = rango or (0, size - 1)
+        response = StreamingHttpResponse(
+            _leer_rango_async(archivo, inicio, fin - inicio + 1),
+            status=200 if rango is None else 206, content_type=content_type,
+        )
+        response['Content-Length'] = fin - inicio + 1
+        if rango is not None:
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{size}'
+    elif rango is None:
+        response = FileResponse(archivo, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        inicio, fin = rango
+        response = StreamingHttpResponse(
+            _leer_rango(archivo, inicio, fin - inicio + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{size}'
+        response['Content-Length'] = fin - inicio + 1
+    response['Content-Disposition'] = disposition
+    response['Accept-Ranges'] = 'bytes'
+    return _cabeceras_de_cache(response, etag, last_modified, immutable, vary)
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+
+# Columnas que lee el listado de materiales
+COLUMNAS = 'id, titulo, descripcion, archivo_nombre, archivo_tipo, tipo, usuario_id, fecha_creacion, thumbnail_tipo'
+
+ESQUEMA_ANTES = """
+CREATE TABLE material (
+    id INTEGER PRIMARY KEY, titulo TEXT, descripcion TEXT, archivo_blob BLOB,
+    archivo_nombre TEXT, archivo_tipo TEXT, tipo TEXT, usuario_id INTEGER,
+    fecha_creacion TEXT, thumbnail_blob BLOB, thumbnail_tipo TEXT
+)"""
+
+ESQUEMA_DESPUES = """
+CREATE TABLE material (
+    id INTEGER PRIMARY KEY, titulo TEXT, descripcion TEXT,
+    archivo_nombre TEXT, archivo_tipo TEXT, tipo TEXT, usuario_id INTEGER,
+    fecha_creacion TEXT, thumbnail_tipo TEXT,
+    archivo_sha256 TEXT, archivo_size INTEGER, thumbnail_sha256 TEXT, thumbnail_size INTEGER
+)"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia del listado de materiales con los archivos dentro de SQLite "
+        "(antes) y fuera, referenciados por SHA-256 (después), sobre bases de prueba."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Materiales a sembrar.")
+        parser.add_argument('--size-kb', type=int, default=256, help="Tamaño de cada archivo en KB.")
+        parser.add_argument('--repeat', type=int, default=20, help="Repeticiones de cada consulta.")
+
+    def handle(self, *args, **options):
+        filas = options['rows']
+        tamanio = options['size_kb'] * 1024
+        repeticiones = options['repeat']
+
+        with tempfile.TemporaryDirectory(prefix='bench-blobs-') as tmp:
+            antes = self.sembrar(os.path.join(tmp, 'antes.sqlite3'), ESQUEMA_ANTES, filas, tamanio, inline=True)
+            despues = self.sembrar(os.path.join(tmp, 'despues.sqlite3'), ESQUEMA_DESPUES, filas, tamanio, inline=False)
+
+            self.stdout.write(f"{filas} materiales de {options['size_kb']} KB, {repeticiones} repeticiones (mediana)")
+            self.stdout.write(f"Tamaño de la base: antes {self.mb(antes)} MB, después {self.mb(despues)} MB")
+
+            casos = [
+                ("SELECT * (página de 20)", antes, "SELECT * FROM material ORDER BY fecha_creacion DESC LIMIT 20"),
+                ("metadatos, blobs en la base (página de 20)", antes, f"SELECT {COLUMNAS} FROM material ORDER BY fecha_creacion DESC LIMIT 20"),
+                ("metadatos, blobs fuera (página de 20)", despues, f"SELECT {COLUMNAS}, archivo_size FROM material ORDER BY fecha_creacion DESC LIMIT 20"),
+                ("metadatos, blobs en la base (todo)", antes, f"SELECT {COLUMNAS} FROM material ORDER BY fecha_creacion DESC"),
+                ("metadatos, blobs fuera (todo)", despues, f"SELECT {COLUMNAS}, archivo_size FROM material ORDER BY fecha_creacion DESC"),
+            ]
+            for nombre, ruta, sql in casos:
+                mediana = self.medir(ruta, sql, repeticiones)
+                self.stdout.write(f"  {nombre:<45} {mediana * 1000:8.2f} ms")
+
+    def sembrar(self, ruta, esquema, filas, tamanio, inline):
+        conexion = sqlite3.connect(ruta)
+        conexion.execute(esquema)
+        with conexion:
+            for i in range(filas):
+                comun = (f"Material {i}", "Descripción de prueba", f"archivo_{i}.pdf", "application/pdf",
+                         "ficha", 1, f"2025-01-01T00:00:{i:08d}", "image/png")
+                if inline:
+                    conexion.execute(
+                        "INSERT INTO material (titulo, descripcion, archivo_nombre, archivo_tipo, tipo, usuario_id, "
+                        "fecha_creacion, thumbnail_tipo, archivo_blob, thumbnail_blob) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                        comun + (os.urandom(tamanio), os.urandom(16 * 1024)),
+                    )
+                else:
+                    conexion.execute(
+                        "INSERT INTO material (titulo, descripcion, archivo_nombre, archivo_tipo, tipo, usuario_id, "
+                        "fecha_creacion, thumbnail_tipo, archivo_sha256, archivo_size, thumbnail_sha256, thumbnail_size) "
+                        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                        comun + (os.urandom(32).hex(), tamanio, os.urandom(32).hex(), 16 * 1024),
+                    )
+        conexion.close()
+        return ruta
+
+    def medir(self, ruta, sql, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            # Conexión nueva en cada vuelta: sin la caché de páginas de SQLite
+            conexion = sqlite3.connect(ruta)
+            inicio = time.perf_counter()
+            conexion.execute(sql).fetchall()
+            tiempos.append(time.perf_counter() - inicio)
+            conexion.close()
+        return statistics.median(tiempos)
+
+    def mb(self, ruta):
+        return round(os.path.getsize(ruta) / (1024 * 1024), 1)
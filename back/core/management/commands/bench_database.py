@@ -0,0 +1,140 @@
+import copy
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+
+from core.models import Calificacion, Material
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de la base de datos: lectores del catálogo y escritores simultáneos, "
+        "con la configuración por defecto de Django (antes) y con la de settings.DATABASES (después)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help="Duración de cada escenario.")
+        parser.add_argument('--readers', type=int, default=8, help="Hilos que leen el catálogo.")
+        parser.add_argument('--writers', type=int, default=4, help="Hilos que crean materiales y calificaciones.")
+        parser.add_argument('--materials', type=int, default=2000, help="Materiales iniciales.")
+
+    def handle(self, *args, **options):
+        carpeta = tempfile.mkdtemp(prefix='bench-db-')
+        original = connections.settings['default']
+        nombre_original = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # En un archivo, como en producción (por defecto las pruebas usan memoria)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(carpeta, 'bench.sqlite3')
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            configurado = copy.deepcopy(original)
+            self.sembrar(options['materials'])
+            connection.close()
+            self.stdout.write(
+                f"{connection.vendor}: {options['readers']} lectores y {options['writers']} escritores "
+                f"durante {options['seconds']} s"
+            )
+            for nombre, config in (
+                ("antes", self.config_por_defecto(configurado)),
+                ("después", configurado),
+            ):
+                self.reportar(nombre, self.escenario(config, options))
+        finally:
+            connections.settings['default'] = original
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    def config_por_defecto(self, configurado):
+        # Lo que había antes: una conexión nueva por petición, sin pool ni pragmas
+        config = copy.deepcopy(configurado)
+        config['CONN_MAX_AGE'] = 0
+        config['CONN_HEALTH_CHECKS'] = False
+        if connection.vendor == 'sqlite':
+            # journal_mode queda guardado en el archivo: hay que volver a DELETE
+            config['OPTIONS'] = {'init_command': 'PRAGMA journal_mode=DELETE'}
+        else:
+            config['OPTIONS'].pop('pool', None)
+        return config
+
+    def sembrar(self, cantidad):
+        User = get_user_model()
+        self.usuarios = [
+            User.objects.create_user(email=f'bench{i}@correo.com', password='bench').pk for i in range(20)
+        ]
+        Material.objects.bulk_create(
+            Material(titulo=f"Material {i}", descripcion="Ficha de práctica " * 5, tipo='ficha',
+                     usuario_id=self.usuarios[i % len(self.usuarios)])
+            for i in range(cantidad)
+        )
+
+    #------------------------Carga------------------------
+
+    def escenario(self, config, options):
+        # Cada hilo abre sus propias conexiones con esta configuración
+        connections.settings['default'] = config
+        for conn in connections.all(initialized_only=True):
+            conn.close()
+        resultado = {'lecturas': [], 'escrituras': [], 'errores': 0}
+        candado = threading.Lock()
+        fin = time.perf_counter() + options['seconds']
+
+        def trabajar(operacion, clave, indice):
+            latencias = []
+            errores = 0
+            while time.perf_counter() < fin:
+                # Como una petición: request_started/request_finished
+                close_old_connections()
+                inicio = time.perf_counter()
+                try:
+                    operacion(indice)
+                    latencias.append(time.perf_counter() - inicio)
+                except OperationalError:
+                    errores += 1
+                close_old_connections()
+            connections.close_all()
+            with candado:
+                resultado[clave].extend(latencias)
+                resultado['errores'] += errores
+
+        hilos = [
+            threading.Thread(target=trabajar, args=(self.leer, 'lecturas', i)) for i in range(options['readers'])
+        ] + [
+            threading.Thread(target=trabajar, args=(self.escribir, 'escrituras', i)) for i in range(options['writers'])
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        resultado['segundos'] = time.perf_counter() - inicio
+        if 'pool' in config.get('OPTIONS', {}):
+            connection.close_pool()
+        return resultado
+
+    def leer(self, indice):
+        # Una página del catálogo con su autor y sus calificaciones
+        list(Material.objects.with_ratings().select_related('usuario').order_by('-fecha_creacion')[:20])
+
+    def escribir(self, indice):
+        usuario_id = self.usuarios[indice % len(self.usuarios)]
+        with transaction.atomic():
+            material = Material.objects.create(
+                titulo=f"Nuevo {indice}", descripcion="Subido durante la prueba", tipo='ficha', usuario_id=usuario_id,
+            )
+            Calificacion.objects.create(material=material, usuario_id=self.usuarios[-1 - indice], puntaje=4)
+
+    def reportar(self, nombre, resultado):
+        lecturas, escrituras = resultado['lecturas'], resultado['escrituras']
+        p95 = lambda datos: statistics.quantiles(datos, n=20)[-1] * 1000 if len(datos) > 1 else 0
+        self.stdout.write(
+            f"  {nombre:<8} lecturas {len(lecturas) / resultado['segundos']:7.0f}/s (p95 {p95(lecturas):6.1f} ms)  "
+            f"escrituras {len(escrituras) / resultado['segundos']:6.0f}/s (p95 {p95(escrituras):6.1f} ms)  "
+            f"errores {resultado['errores']}"
+        )
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+
+ESQUEMA = [
+    """CREATE TABLE core_material (
+        id INTEGER PRIMARY KEY, titulo TEXT, descripcion TEXT, tipo TEXT, usuario_id INTEGER,
+        fecha_creacion TEXT
+    )""",
+    # El índice que recorre el cursor: (fecha_creacion, id)
+    "CREATE INDEX material_fecha_id ON core_material (fecha_creacion, id)",
+]
+
+COLUMNAS = "id, titulo, descripcion, tipo, usuario_id, fecha_creacion"
+PAGINA = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia de una página profunda del listado de materiales con "
+        "LIMIT/OFFSET (antes) y con cursor sobre (fecha_creacion, id) (después)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help="Materiales a sembrar.")
+        parser.add_argument('--repeat', type=int, default=20, help="Repeticiones de cada consulta.")
+
+    def handle(self, *args, **options):
+        filas = options['rows']
+        with tempfile.TemporaryDirectory(prefix='bench-paginacion-') as tmp:
+            ruta = os.path.join(tmp, 'paginacion.sqlite3')
+            self.sembrar(ruta, filas)
+            conexion = sqlite3.connect(ruta)
+            self.stdout.write(f"{filas} materiales, páginas de {PAGINA}, {options['repeat']} repeticiones (mediana)")
+            for pagina in [1, 100, 1000, 5000, filas // PAGINA]:
+                offset = (pagina - 1) * PAGINA
+                if offset >= filas:
+                    continue
+                sql_offset = (
+                    f"SELECT {COLUMNAS} FROM core_material "
+                    f"ORDER BY fecha_creacion DESC, id DESC LIMIT {PAGINA} OFFSET {offset}"
+                )
+                antes = self.medir(conexion, sql_offset, [], options['repeat'])
+                # El cursor de esa página: la última fila de la anterior
+                cursor = conexion.execute(
+                    f"SELECT fecha_creacion, id FROM core_material "
+                    f"ORDER BY fecha_creacion DESC, id DESC LIMIT 1 OFFSET {max(offset - 1, 0)}"
+                ).fetchone()
+                sql_keyset = (
+                    f"SELECT {COLUMNAS} FROM core_material "
+                    "WHERE fecha_creacion <= ? AND (fecha_creacion < ? OR (fecha_creacion = ? AND id < ?)) "
+                    f"ORDER BY fecha_creacion DESC, id DESC LIMIT {PAGINA}"
+                )
+                despues = self.medir(conexion, sql_keyset, [cursor[0], cursor[0], cursor[0], cursor[1]], options['repeat'])
+                self.stdout.write(
+                    f"  página {pagina:>6}: OFFSET {antes * 1000:8.2f} ms   cursor {despues * 1000:6.2f} ms"
+                )
+            conexion.close()
+
+    def sembrar(self, ruta, filas):
+        conexion = sqlite3.connect(ruta)
+        for sql in ESQUEMA:
+            conexion.execute(sql)
+        with conexion:
+            conexion.executemany(
+                "INSERT INTO core_material (titulo, descripcion, tipo, usuario_id, fecha_creacion) VALUES (?,?,?,?,?)",
+                (
+                    # De a cinco por segundo: hay empates de fecha que resuelve el id
+                    (f"Material {i}", "Descripción de prueba " * 10, "ficha", i % 50, f"2025-01-01 {i // 5:010d}")
+                    for i in range(filas)
+                ),
+            )
+        conexion.close()
+
+    def medir(self, conexion, sql, params, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            conexion.execute(sql, params).fetchall()
+            tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos)
@@ -0,0 +1,125 @@
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.search import FTS_TABLE, SQLITE_CREAR, consulta_fts, terminos
+
+
+ESQUEMA = """
+CREATE TABLE core_material (
+    id INTEGER PRIMARY KEY, titulo TEXT, descripcion TEXT, fecha_creacion TEXT
+)"""
+
+VOCABULARIO = (
+    "kichwa yachay ficha presentación canción cuento números colores animales familia "
+    "comunidad chakra mikuna wasi runa shimi killa inti yaku allpa tullpu taki "
+    "lectura escritura matemática ciencias naturaleza cultura identidad música danza "
+    "ejercicio actividad práctica evaluación primaria secundaria docente estudiante"
+).split()
+
+SILABAS = "ka ki ku cha chi chu ma mi mu na ni nu pa pi pu ra ri ru sa si su ta ti tu wa wi ya yu lla lli" .split()
+
+BUSQUEDAS = ["kichwa", "canción", "cancion", "tak", "chakra mikuna", "colores inti", "zzzz"]
+
+
+def vocabulario(aleatorio, total=20000):
+    # Palabras reales + palabras inventadas con sílabas kichwa; frecuencia tipo Zipf
+    inventadas = {''.join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))) for _ in range(total)}
+    palabras = VOCABULARIO + sorted(inventadas - set(VOCABULARIO))
+    aleatorio.shuffle(palabras)
+    pesos = list(itertools.accumulate(1 / (posicion + 1) for posicion in range(len(palabras))))
+    return palabras, pesos
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda con LIKE '%...%' (antes, SearchFilter) contra el índice FTS5 "
+        "(después) sobre una base SQLite de prueba."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Materiales a sembrar.")
+        parser.add_argument('--repeat', type=int, default=10, help="Repeticiones de cada consulta.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='bench-busqueda-') as tmp:
+            ruta = os.path.join(tmp, 'busqueda.sqlite3')
+            inicio = time.perf_counter()
+            self.sembrar(ruta, options['rows'])
+            self.stdout.write(
+                f"{options['rows']} materiales sembrados e indexados en {time.perf_counter() - inicio:.1f} s, "
+                f"{options['repeat']} repeticiones (mediana, primeras 20 coincidencias)"
+            )
+            for texto in BUSQUEDAS:
+                antes, n_antes = self.medir(ruta, *self.sql_like(texto), repeticiones=options['repeat'])
+                despues, n_despues = self.medir(ruta, *self.sql_fts(texto), repeticiones=options['repeat'])
+                self.stdout.write(
+                    f"  {texto!r:<16} LIKE {antes * 1000:8.2f} ms ({n_antes:>6} filas)   "
+                    f"FTS5 {despues * 1000:7.2f} ms ({n_despues:>6} filas)"
+                )
+
+    def sembrar(self, ruta, filas):
+        aleatorio = random.Random(42)
+        palabras, pesos = vocabulario(aleatorio)
+        conexion = sqlite3.connect(ruta)
+        conexion.execute(ESQUEMA)
+        # Los triggers del índice se crean antes, así la carga también mide la sincronización
+        for sql in SQLITE_CREAR:
+            conexion.execute(sql)
+        with conexion:
+            conexion.executemany(
+                "INSERT INTO core_material (titulo, descripcion, fecha_creacion) VALUES (?, ?, ?)",
+                (
+                    (
+                        ' '.join(aleatorio.choices(palabras, cum_weights=pesos, k=4)).capitalize(),
+                        ' '.join(aleatorio.choices(palabras, cum_weights=pesos, k=30)),
+                        f"2025-01-01T00:00:{i:08d}",
+                    )
+                    for i in range(filas)
+                ),
+            )
+        conexion.close()
+
+    def sql_like(self, texto):
+        # Lo que generaba SearchFilter: cada palabra en título o descripción
+        condiciones, params = [], []
+        for palabra in texto.split():
+            condiciones.append("(titulo LIKE ? OR descripcion LIKE ?)")
+            params += [f'%{palabra}%'] * 2
+        sql = (
+            f"SELECT id, titulo FROM core_material WHERE {' AND '.join(condiciones)} "
+            "ORDER BY fecha_creacion DESC LIMIT 20"
+        )
+        return sql, params
+
+    def sql_fts(self, texto):
+        consulta = consulta_fts(terminos(texto))
+        # La misma consulta que arma el ORM (buscar() + MaterialBusqueda)
+        sql = (
+            f"SELECT core_material.id, core_material.titulo, {FTS_TABLE}.rank AS relevancia "
+            f"FROM core_material INNER JOIN {FTS_TABLE} ON core_material.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE}.{FTS_TABLE} MATCH ? ORDER BY relevancia LIMIT 20"
+        )
+        return sql, [consulta]
+
+    def medir(self, ruta, sql, params, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            conexion = sqlite3.connect(ruta)
+            inicio = time.perf_counter()
+            conexion.execute(sql, params).fetchall()
+            tiempos.append(time.perf_counter() - inicio)
+            conexion.close()
+        return statistics.median(tiempos), self.contar(ruta, sql, params)
+
+    def contar(self, ruta, sql, params):
+        conexion = sqlite3.connect(ruta)
+        total = conexion.execute(f"SELECT count(*) FROM ({sql.replace(' LIMIT 20', '')})", params).fetchone()[0]
+        conexion.close()
+        return total
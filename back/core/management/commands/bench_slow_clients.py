@@ -0,0 +1,196 @@
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.models import Material
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+
+class ManejadorSilencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ServidorWSGI(WSGIServer):
+    # Como un worker de gunicorn con --threads N: N peticiones a la vez, el resto espera
+    def __init__(self, direccion, hilos):
+        super().__init__(direccion, ManejadorSilencioso)
+        self.pool = ThreadPoolExecutor(max_workers=hilos)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga con clientes lentos: descargas simultáneas contra un servidor WSGI "
+        "con N hilos (antes) y contra uvicorn/ASGI (después), más peticiones rápidas de control."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32, help="Descargas lentas simultáneas.")
+        parser.add_argument('--size', type=float, default=8, help="Tamaño del archivo en MB.")
+        parser.add_argument('--rate', type=int, default=1024, help="Velocidad de cada cliente lento en KB/s.")
+        parser.add_argument('--threads', type=int, default=8, help="Hilos del servidor WSGI.")
+        parser.add_argument('--probes', type=int, default=10, help="Peticiones rápidas durante la carga.")
+
+    def handle(self, *args, **options):
+        if uvicorn is None:
+            raise CommandError("Esta prueba necesita uvicorn (pip install uvicorn).")
+        carpeta = tempfile.mkdtemp(prefix='bench-clientes-lentos-')
+        # Base de datos y almacenamiento de prueba, compartidos por los hilos de los servidores
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(carpeta, 'bench.sqlite3')
+        nombre_original = connection.settings_dict['NAME']
+        almacenamiento = override_settings(STORAGES={
+            **settings.STORAGES,
+            'blobs': {'BACKEND': 'core.storage.ContentAddressedStorage', 'OPTIONS': {'location': carpeta}},
+        })
+        almacenamiento.enable()
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            grande, chico = self.sembrar(int(options['size'] * 1024 * 1024))
+            self.stdout.write(
+                f"{options['clients']} clientes a {options['rate']} KB/s descargando {options['size']} MB, "
+                f"{options['probes']} peticiones rápidas de control"
+            )
+            for nombre, servidor in (
+                (f"WSGI, {options['threads']} hilos", self.servidor_wsgi(options['threads'])),
+                ("ASGI (uvicorn)", self.servidor_asgi()),
+            ):
+                with servidor as puerto:
+                    resultado = asyncio.run(self.carga(puerto, grande, chico, options))
+                self.reportar(nombre, resultado)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            almacenamiento.disable()
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    def sembrar(self, tamanio):
+        usuario = get_user_model().objects.create_user(email='bench@correo.com', password='bench')
+        crear = lambda titulo, contenido: Material.objects.create(
+            titulo=titulo, tipo='ficha', usuario=usuario, archivo_blob=contenido,
+            archivo_tipo='application/pdf', archivo_nombre=f'{titulo}.pdf',
+        )
+        grande = crear('grande', os.urandom(tamanio))
+        chico = crear('chico', os.urandom(8 * 1024))
+        return f'/api/materiales/{grande.pk}/descargar/', f'/api/materiales/{chico.pk}/descargar/'
+
+    #------------------------Servidores------------------------
+
+    def servidor_wsgi(self, hilos):
+        class Contexto:
+            def __enter__(self):
+                self.servidor = ServidorWSGI(('127.0.0.1', 0), hilos)
+                self.servidor.set_app(get_wsgi_application())
+                self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+                self.hilo.start()
+                return self.servidor.server_address[1]
+
+            def __exit__(self, *exc):
+                self.servidor.shutdown()
+                self.servidor.pool.shutdown(wait=True)
+                self.servidor.server_close()
+
+        return Contexto()
+
+    def servidor_asgi(self):
+        class Contexto:
+            def __enter__(self):
+                with socket.socket() as s:
+                    s.bind(('127.0.0.1', 0))
+                    puerto = s.getsockname()[1]
+                config = uvicorn.Config(
+                    get_asgi_application(), host='127.0.0.1', port=puerto,
+                    log_level='warning', lifespan='off',
+                )
+                self.servidor = uvicorn.Server(config)
+                self.hilo = threading.Thread(target=self.servidor.run, daemon=True)
+                self.hilo.start()
+                while not self.servidor.started:
+                    time.sleep(0.01)
+                return puerto
+
+            def __exit__(self, *exc):
+                self.servidor.should_exit = True
+                self.hilo.join()
+
+        return Contexto()
+
+    #------------------------Clientes------------------------
+
+    async def descargar(self, puerto, ruta, ritmo=None):
+        # Cliente HTTP mínimo; con `ritmo` (bytes/s) lee despacio y con un
+        # buffer de socket chico, así el servidor no puede adelantarse
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+        sock.setblocking(False)
+        inicio = time.perf_counter()
+        await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', puerto))
+        reader, writer = await asyncio.open_connection(sock=sock)
+        writer.write(f"GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        await reader.readuntil(b'\r\n\r\n')
+        primer_byte = time.perf_counter() - inicio
+        recibido = 0
+        while True:
+            chunk = await reader.read(16 * 1024)
+            if not chunk:
+                break
+            recibido += len(chunk)
+            if ritmo:
+                await asyncio.sleep(len(chunk) / ritmo)
+        writer.close()
+        return primer_byte, time.perf_counter() - inicio, recibido
+
+    async def carga(self, puerto, grande, chico, options):
+        inicio = time.perf_counter()
+        lentos = [
+            asyncio.create_task(self.descargar(puerto, grande, ritmo=options['rate'] * 1024))
+            for _ in range(options['clients'])
+        ]
+        await asyncio.sleep(0.5)
+        control = []
+        for _ in range(options['probes']):
+            control.append(await self.descargar(puerto, chico))
+            await asyncio.sleep(0.1)
+        resultados = await asyncio.gather(*lentos)
+        return {
+            'total': time.perf_counter() - inicio,
+            'lentos': [duracion for _, duracion, _ in resultados],
+            'control': [duracion for _, duracion, _ in control],
+        }
+
+    def reportar(self, nombre, resultado):
+        self.stdout.write(
+            f"  {nombre:<18} todas las descargas lentas en {resultado['total']:6.1f} s "
+            f"(mediana {statistics.median(resultado['lentos']):5.1f} s)  "
+            f"control: mediana {statistics.median(resultado['control']) * 1000:8.1f} ms, "
+            f"máx {max(resultado['control']) * 1000:8.1f} ms"
+        )
@@ -0,0 +1,138 @@
+import io
+import os
+import resource
+import shutil
+import tempfile
+import time
+import warnings
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core.thumbnails import PDF_SUPPORT, THUMBNAIL_SIZE, miniatura_de_archivo, pool_de_miniaturas
+
+try:
+    from pdf2image import convert_from_bytes
+except ImportError:
+    convert_from_bytes = None
+
+
+def reiniciar_pico():
+    # Linux: vuelve a poner el pico (VmHWM) en la memoria actual; así no cuenta
+    # lo que se usó al importar Django
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def pico_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def rss_actual_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def antes(ruta, archivo_tipo):
+    # Como era antes: el archivo entero en memoria y decodificado desde ahí
+    with open(ruta, 'rb') as f:
+        decoded = f.read()
+    if archivo_tipo.startswith('image/'):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            thumb = Image.open(io.BytesIO(decoded))
+            thumb.thumbnail(THUMBNAIL_SIZE)
+    else:
+        thumb = convert_from_bytes(decoded, first_page=1, last_page=1, size=THUMBNAIL_SIZE)[0]
+    output = io.BytesIO()
+    thumb.save(output, format='PNG')
+    return output.getvalue()
+
+
+def medir(funcion, ruta, archivo_tipo):
+    # Se ejecuta en un proceso nuevo: el pico de RSS es solo de esta decodificación
+    reiniciar_pico()
+    base = rss_actual_kb()
+    inicio = time.perf_counter()
+    try:
+        funcion(ruta, archivo_tipo)
+        resultado = 'ok'
+    except Exception as e:
+        resultado = type(e).__name__
+    return pico_rss_kb() - base, time.perf_counter() - inicio, resultado
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el pico de memoria (RSS) al generar miniaturas de archivos grandes: "
+        "decodificación completa (antes) contra draft/límites/PDF a baja resolución (después)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=int, default=50, help="Tamaño de la foto JPEG de prueba.")
+
+    def handle(self, *args, **options):
+        carpeta = tempfile.mkdtemp(prefix='bench-memoria-')
+        try:
+            fixtures = self.fixtures(carpeta, options['megapixels'])
+            self.stdout.write("Pico de RSS por miniatura, cada medición en un proceso nuevo:")
+            for nombre, ruta, archivo_tipo in fixtures:
+                mb = os.path.getsize(ruta) / 1024 / 1024
+                antes_kb, antes_s, antes_r = self.en_proceso_nuevo(antes, ruta, archivo_tipo)
+                despues_kb, despues_s, despues_r = self.en_proceso_nuevo(miniatura_de_archivo, ruta, archivo_tipo)
+                self.stdout.write(
+                    f"  {nombre:<28} ({mb:6.1f} MB)  antes {antes_kb / 1024:7.1f} MB {antes_s:5.2f} s {antes_r:<24}"
+                    f"después {despues_kb / 1024:7.1f} MB {despues_s:5.2f} s {despues_r}"
+                )
+        finally:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    def en_proceso_nuevo(self, funcion, ruta, archivo_tipo):
+        with pool_de_miniaturas(1) as pool:
+            return pool.submit(medir, funcion, ruta, archivo_tipo).result()
+
+    def fixtures(self, carpeta, megapixels):
+        fixtures = []
+        ancho = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+        alto = ancho * 2 // 3
+
+        foto = self.foto(ancho, alto)
+        ruta = os.path.join(carpeta, 'foto.jpg')
+        foto.save(ruta, quality=90)
+        fixtures.append((f'JPEG {ancho}x{alto}', ruta, 'image/jpeg'))
+
+        ruta = os.path.join(carpeta, 'foto.png')
+        foto.resize((ancho * 3 // 4, alto * 3 // 4)).save(ruta, compress_level=1)
+        fixtures.append((f'PNG {ancho * 3 // 4}x{alto * 3 // 4}', ruta, 'image/png'))
+        del foto
+
+        # Pocos KB en disco, 144 MB decodificada
+        ruta = os.path.join(carpeta, 'bomba.png')
+        Image.new('1', (12000, 12000)).save(ruta)
+        fixtures.append(('PNG bomba 12000x12000', ruta, 'image/png'))
+
+        if PDF_SUPPORT and convert_from_bytes is not None and shutil.which('pdftoppm'):
+            # Escaneo: una página A4 a 600 dpi
+            ruta = os.path.join(carpeta, 'escaneo.pdf')
+            self.foto(4960, 7016).save(ruta, resolution=600)
+            fixtures.append(('PDF escaneado A4 600 dpi', ruta, 'application/pdf'))
+        else:
+            self.stdout.write("pdf2image/poppler no disponible: se omite el PDF.")
+        return fixtures
+
+    def foto(self, ancho, alto):
+        # Ruido sobre degradados: no se comprime casi nada, como una foto real
+        ruido = Image.effect_noise((ancho, alto), 40)
+        degradado = Image.linear_gradient('L').resize((ancho, alto))
+        return Image.merge('RGB', (ruido, degradado, Image.blend(ruido, degradado, 0.5)))
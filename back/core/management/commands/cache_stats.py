@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import invalidar_catalogo, metricas, reiniciar_metricas
+
+
+class Command(BaseCommand):
+    help = "Muestra los aciertos y fallos del caché del catálogo anónimo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Pone los contadores en cero.")
+        parser.add_argument('--invalidate', action='store_true', help="Descarta todo el catálogo en caché.")
+
+    def handle(self, *args, **options):
+        datos = metricas()
+        tasa = '-' if datos['tasa_aciertos'] is None else f"{datos['tasa_aciertos']:.1%}"
+        self.stdout.write(
+            f"Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  "
+            f"Tasa de aciertos: {tasa}  Versión: {datos['version']}"
+        )
+        if options['reset']:
+            reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
+        if options['invalidate']:
+            invalidar_catalogo()
+            self.stdout.write(self.style.SUCCESS("Catálogo en caché invalidado."))
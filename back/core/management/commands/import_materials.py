@@ -0,0 +1,241 @@
+import csv
+import hashlib
+import json
+import mimetypes
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.cache import invalidar_catalogo_al_confirmar
+from core.models import TIPO_CHOICES, EstadisticasUsuario, Material
+from core.storage import blob_storage
+from core.tasks import encolar
+from core.thumbnails import (
+    CAMPOS_MINIATURA, aplicar_miniatura, pool_de_miniaturas, soporta_miniatura, tarea_de_miniatura,
+)
+
+EXTENSIONES_PRESENTACION = {'.ppt', '.pptx', '.pps', '.ppsx', '.odp', '.key'}
+TIPOS = [tipo for tipo, _ in TIPO_CHOICES]
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa materiales en lote desde un directorio o un manifiesto (.csv/.jsonl). "
+        "Se puede volver a ejecutar tras una interrupción: lo ya importado se omite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('origen', help="Directorio con los archivos, o manifiesto .csv/.jsonl.")
+        parser.add_argument('--usuario', required=True, help="Email del autor de los materiales.")
+        parser.add_argument(
+            '--tipo', choices=TIPOS,
+            help="Tipo para todos los archivos (por defecto se deduce de la extensión).",
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help="Materiales por bulk_create.")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Procesos para generar miniaturas; 0 las deja en la cola de run_worker.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            self.usuario = get_user_model().objects.get(email=options['usuario'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']}.")
+        self.tipo = options['tipo']
+        self.batch_size = max(1, options['batch_size'])
+        self.storage = blob_storage()
+        self.importados = self.omitidos = self.errores = self.bytes = 0
+        self.miniaturas = {'lista': 0, 'no_aplica': 0, 'fallida': 0, 'en_cola': 0}
+        self.ya_importados = self.cargar_importados()
+        self.inicio = time.perf_counter()
+
+        pool = pool_de_miniaturas(options['workers']) if options['workers'] > 0 else None
+        self.pool = pool
+        self.futuros = {}
+        try:
+            # Miniaturas que quedaron a medias en una ejecución interrumpida
+            self.generar_miniaturas(list(Material.objects.filter(
+                usuario=self.usuario, thumbnail_status=Material.THUMBNAIL_PENDIENTE,
+                thumbnail_sha256__isnull=True, archivo_sha256__isnull=False,
+            )), encolar_tareas=False)
+
+            lote = []
+            for entrada in self.leer_origen(options['origen']):
+                material = self.preparar(entrada)
+                if material is None:
+                    continue
+                lote.append(material)
+                if len(lote) >= self.batch_size:
+                    self.guardar_lote(lote)
+                    lote = []
+            if lote:
+                self.guardar_lote(lote)
+            self.recoger_miniaturas(esperar=True)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        total = time.perf_counter() - self.inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.importados} importados, {self.omitidos} omitidos (ya estaban), {self.errores} con error. "
+            f"{self.bytes / MB:.1f} MB en {total:.1f} s: {self.ritmo()}."
+        ))
+        self.stdout.write(
+            f"Miniaturas: {self.miniaturas['lista']} generadas, {self.miniaturas['no_aplica']} sin miniatura, "
+            f"{self.miniaturas['fallida']} fallidas, {self.miniaturas['en_cola']} en cola."
+        )
+
+    def ritmo(self):
+        segundos = max(time.perf_counter() - self.inicio, 1e-9)
+        return f"{self.importados / segundos:.1f} archivos/s, {self.bytes / MB / segundos:.2f} MB/s"
+
+    #------------------------Lectura del origen------------------------
+
+    def leer_origen(self, origen):
+        # Una entrada por material: {archivo, titulo, descripcion, tipo, archivo_tipo, video_url}
+        if os.path.isdir(origen):
+            for carpeta, subcarpetas, archivos in os.walk(origen):
+                subcarpetas[:] = sorted(d for d in subcarpetas if not d.startswith('.'))
+                for nombre in sorted(archivos):
+                    if not nombre.startswith('.'):
+                        yield {'archivo': os.path.join(carpeta, nombre)}
+            return
+
+        extension = os.path.splitext(origen)[1].lower()
+        if not os.path.isfile(origen) or extension not in ('.csv', '.jsonl'):
+            raise CommandError(f"{origen} no es un directorio ni un manifiesto .csv/.jsonl.")
+        base = os.path.dirname(os.path.abspath(origen))
+        with open(origen, newline='', encoding='utf-8') as manifiesto:
+            if extension == '.csv':
+                filas = csv.DictReader(manifiesto)
+            else:
+                filas = (json.loads(linea) for linea in manifiesto if linea.strip())
+            for fila in filas:
+                entrada = {clave: (valor or '').strip() for clave, valor in fila.items() if clave}
+                if entrada.get('archivo'):
+                    entrada['archivo'] = os.path.join(base, entrada['archivo'])
+                yield entrada
+
+    def cargar_importados(self):
+        # Lo que el usuario ya tiene, para reanudar sin duplicar:
+        # (nombre, tamaño) -> digests, y (título, url) de los videos
+        importados = {}
+        existentes = Material.objects.filter(usuario=self.usuario).values_list(
+            'archivo_nombre', 'archivo_size', 'archivo_sha256', 'titulo', 'video_url',
+        )
+        for nombre, size, digest, titulo, video_url in existentes.iterator():
+            if digest:
+                importados.setdefault((nombre, size), set()).add(digest)
+            elif video_url:
+                importados[(titulo, video_url)] = True
+        return importados
+
+    #------------------------Materiales------------------------
+
+    def preparar(self, entrada):
+        ruta = entrada.get('archivo')
+        video_url = entrada.get('video_url') or None
+        titulo = entrada.get('titulo') or (
+            os.path.splitext(os.path.basename(ruta))[0].replace('_', ' ').strip() if ruta else ''
+        )
+        tipo = entrada.get('tipo') or self.tipo or self.deducir_tipo(ruta)
+        if not titulo or tipo not in TIPOS or not (ruta or video_url):
+            return self.error(ruta or titulo, "falta el título, el archivo/video_url o el tipo no es válido")
+
+        material = Material(
+            titulo=titulo[:200], descripcion=entrada.get('descripcion', ''), tipo=tipo,
+            usuario=self.usuario, video_url=video_url,
+        )
+        if not ruta:
+            if (material.titulo, video_url) in self.ya_importados:
+                self.omitidos += 1
+                return None
+            self.ya_importados[(material.titulo, video_url)] = True
+            return material
+
+        nombre = os.path.basename(ruta)
+        try:
+            size = os.path.getsize(ruta)
+            # Solo se vuelve a leer lo que coincide en nombre y tamaño con algo ya importado
+            previos = self.ya_importados.get((nombre, size))
+            if previos and self.sha256(ruta) in previos:
+                self.omitidos += 1
+                return None
+            with open(ruta, 'rb') as archivo:
+                digest, size = self.storage.store(File(archivo))
+        except OSError as e:
+            return self.error(ruta, e.strerror or str(e))
+
+        self.ya_importados.setdefault((nombre, size), set()).add(digest)
+        material.archivo_nombre = nombre[:255]
+        material.archivo_tipo = entrada.get('archivo_tipo') or mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+        material.archivo_sha256, material.archivo_size = digest, size
+        if soporta_miniatura(material.archivo_tipo):
+            material.thumbnail_status = Material.THUMBNAIL_PENDIENTE
+        self.bytes += size
+        return material
+
+    def deducir_tipo(self, ruta):
+        if not ruta:
+            return 'video'
+        extension = os.path.splitext(ruta)[1].lower()
+        return 'presentacion' if extension in EXTENSIONES_PRESENTACION else 'ficha'
+
+    def sha256(self, ruta):
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(self.storage.chunk_size), b''):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def error(self, origen, motivo):
+        self.errores += 1
+        self.stderr.write(f"{origen}: {motivo}")
+        return None
+
+    def guardar_lote(self, lote):
+        # bulk_create no pasa por save() ni por las señales: los contadores del
+        # autor y el caché del catálogo se actualizan aquí, en la misma transacción
+        with transaction.atomic():
+            Material.objects.bulk_create(lote)
+            EstadisticasUsuario.aplicar(self.usuario.pk, materiales=len(lote))
+            invalidar_catalogo_al_confirmar()
+            self.generar_miniaturas(
+                [m for m in lote if m.thumbnail_status == Material.THUMBNAIL_PENDIENTE],
+                encolar_tareas=self.pool is None,
+            )
+        self.importados += len(lote)
+        self.stdout.write(f"{self.importados} importados ({self.bytes / MB:.1f} MB), {self.ritmo()}")
+        self.recoger_miniaturas(esperar=False)
+
+    #------------------------Miniaturas------------------------
+
+    def generar_miniaturas(self, materiales, encolar_tareas):
+        for material in materiales:
+            if encolar_tareas:
+                encolar('generar_miniatura', material_id=material.pk)
+                self.miniaturas['en_cola'] += 1
+            elif self.pool is not None:
+                self.futuros[tarea_de_miniatura(self.pool, material)] = material
+
+    def recoger_miniaturas(self, esperar):
+        listos = [futuro for futuro in self.futuros if esperar or futuro.done()]
+        if not listos:
+            return
+        actualizados = []
+        for futuro in listos:
+            material = self.futuros.pop(futuro)
+            error = aplicar_miniatura(material, futuro)
+            if error is not None:
+                self.stderr.write(f"Miniatura de {material.archivo_nombre}: {error}")
+            self.miniaturas[material.thumbnail_status] += 1
+            actualizados.append(material)
+        with transaction.atomic():
+            Material.objects.bulk_update(actualizados, CAMPOS_MINIATURA, batch_size=self.batch_size)
+            invalidar_catalogo_al_confirmar()
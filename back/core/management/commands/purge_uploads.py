@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.models import purgar_subidas_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las subidas por partes sin terminar más viejas que SUBIDA_EXPIRACION "
+        "y sus archivos parciales. run_worker lo hace solo cada --purge-interval."
+    )
+
+    def handle(self, *args, **options):
+        borradas = purgar_subidas_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Subidas vencidas borradas: {borradas}."))
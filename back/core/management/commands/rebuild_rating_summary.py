@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ResumenCalificacion
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen de calificaciones por material y reporta los desfasados."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Solo verifica: no escribe nada y sale con error si hay desfase.",
+        )
+        parser.add_argument(
+            '--material', type=int, action='append', dest='materiales',
+            help="Limita la reconstrucción a este material (se puede repetir).",
+        )
+
+    def handle(self, *args, **options):
+        desfasados = ResumenCalificacion.reconstruir(
+            material_ids=options['materiales'],
+            guardar=not options['check'],
+        )
+        for resumen in desfasados:
+            self.stdout.write(f"Material {resumen.material_id}: total={resumen.total} promedio={resumen.promedio}")
+
+        if not desfasados:
+            self.stdout.write(self.style.SUCCESS("Resumen de calificaciones al día."))
+        elif options['check']:
+            raise CommandError(f"{len(desfasados)} resúmenes desfasados.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(desfasados)} resúmenes reconstruidos."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.search import crear_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a crear el índice de búsqueda de materiales y lo llena desde cero. "
+        "migrate ya recrea los triggers de SQLite si faltan; úsalo si el índice quedó "
+        "desincronizado por otra vía (p. ej. SQL directo con los triggers borrados)."
+    )
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            crear_indice(schema_editor)
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
@@ -0,0 +1,104 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from PIL import features
+
+from core.cache import invalidar_catalogo_al_confirmar
+from core.models import Material, Tarea
+from core.thumbnails import (
+    CAMPOS_MINIATURA, PDF_SUPPORT, aplicar_miniatura, pool_de_miniaturas, tarea_de_miniatura,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas que faltan (o están desactualizadas) en un pool de procesos, "
+        "por lotes, y muestra el progreso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', action='store_true',
+            help="Incluye las miniaturas en un formato viejo (PNG cuando Pillow ya soporta WebP).",
+        )
+        parser.add_argument('--all', action='store_true', help="Regenera todas las miniaturas.")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Procesos para generar miniaturas (por defecto, uno por núcleo).",
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help="Materiales por lote (y por commit).")
+        parser.add_argument('--dry-run', action='store_true', help="Solo cuenta los materiales a procesar.")
+
+    def handle(self, *args, **options):
+        pendientes = self.pendientes(options)
+        total = pendientes.count()
+        self.stdout.write(f"{total} materiales sin miniatura o con una desactualizada.")
+        if options['dry_run'] or not total:
+            return
+
+        batch_size = max(1, options['batch_size'])
+        conteo = {estado: 0 for estado, _ in Material.THUMBNAIL_STATUS_CHOICES}
+        procesados = 0
+        ultimo_id = 0
+        inicio = time.perf_counter()
+        with pool_de_miniaturas(options['workers']) as pool:
+            while True:
+                # Por lotes de id: solo las columnas necesarias, nunca los archivos
+                lote = list(
+                    pendientes.filter(pk__gt=ultimo_id).order_by('pk')
+                    .only('pk', 'archivo_sha256', 'archivo_tipo', 'archivo_nombre', *CAMPOS_MINIATURA)[:batch_size]
+                )
+                if not lote:
+                    break
+                ultimo_id = lote[-1].pk
+                futuros = [(material, tarea_de_miniatura(pool, material)) for material in lote]
+
+                anteriores = []
+                for material, futuro in futuros:
+                    anterior = material.thumbnail_sha256
+                    error = aplicar_miniatura(material, futuro)
+                    if error is not None:
+                        self.stderr.write(f"Material {material.pk} ({material.archivo_nombre}): {error}")
+                    if anterior and anterior != material.thumbnail_sha256:
+                        anteriores.append(anterior)
+                    conteo[material.thumbnail_status] += 1
+
+                with transaction.atomic():
+                    Material.objects.bulk_update(lote, CAMPOS_MINIATURA)
+                    invalidar_catalogo_al_confirmar()
+                    if anteriores:
+                        transaction.on_commit(lambda digests=anteriores: Material.liberar_blobs(digests))
+
+                procesados += len(lote)
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(f"{procesados}/{total} ({procesados / segundos:.1f} miniaturas/s)")
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{procesados} procesados en {segundos:.1f} s ({procesados / segundos:.1f}/s): "
+            f"{conteo[Material.THUMBNAIL_LISTA]} generadas, {conteo[Material.THUMBNAIL_NO_APLICA]} sin miniatura, "
+            f"{conteo[Material.THUMBNAIL_FALLIDA]} fallidas."
+        ))
+
+    def pendientes(self, options):
+        # Las pendientes con tarea viva las genera run_worker; si la tarea nunca se
+        # encoló (p. ej. un import que murió a medias) se generan aquí.
+        soportados = Q(archivo_tipo__startswith='image/')
+        if PDF_SUPPORT:
+            soportados |= Q(archivo_tipo='application/pdf')
+        qs = Material.objects.filter(soportados, archivo_sha256__isnull=False)
+        if options['all']:
+            return qs
+        en_cola = Tarea.objects.filter(
+            tipo='generar_miniatura', estado__in=[Tarea.PENDIENTE, Tarea.EN_PROCESO],
+            payload__material_id=OuterRef('pk'),
+        )
+        faltantes = Q(thumbnail_sha256__isnull=True) & (
+            ~Q(thumbnail_status=Material.THUMBNAIL_PENDIENTE) | ~Exists(en_cola)
+        )
+        if options['stale'] and features.check('webp'):
+            faltantes |= Q(thumbnail_tipo='image/png')
+        return qs.filter(faltantes)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import EstadisticasUsuario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los contadores por usuario (materiales, favoritos, comentarios, calificaciones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Solo verifica: no escribe nada y sale con error si hay desfase.",
+        )
+        parser.add_argument(
+            '--usuario', type=int, action='append', dest='usuarios',
+            help="Limita la reconstrucción a este usuario (se puede repetir).",
+        )
+
+    def handle(self, *args, **options):
+        desfasados = EstadisticasUsuario.reconstruir(
+            usuario_ids=options['usuarios'],
+            guardar=not options['check'],
+        )
+        for estadisticas in desfasados:
+            self.stdout.write(
+                f"Usuario {estadisticas.usuario_id}: materiales={estadisticas.materiales} "
+                f"favoritos={estadisticas.favoritos} comentarios={estadisticas.comentarios} "
+                f"calificaciones={estadisticas.calificaciones}"
+            )
+
+        if not desfasados:
+            self.stdout.write(self.style.SUCCESS("Estadísticas de usuarios al día."))
+        elif options['check']:
+            raise CommandError(f"{len(desfasados)} usuarios con estadísticas desfasadas.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(desfasados)} usuarios reconstruidos."))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.authentication import purgar_tokens_vencidos
+from core.correos import enviar_correos_pendientes
+from core.models import purgar_subidas_vencidas
+from core.tasks import procesar_tareas, worker_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las tareas en segundo plano (miniaturas, etc.) de la cola en la base de datos "
+        "y envía los correos pendientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Procesa lo que haya pendiente y termina.",
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help="Segundos de espera cuando la cola está vacía (por defecto 2).",
+        )
+        parser.add_argument(
+            '--max-tasks', type=int, default=None,
+            help="Termina después de procesar esta cantidad de tareas.",
+        )
+        parser.add_argument(
+            '--purge-interval', type=float, default=3600,
+            help="Segundos entre cada limpieza de los tokens JWT y las subidas vencidas (por defecto 1 hora).",
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_id()
+        restantes = options['max_tasks']
+        self.stdout.write(f"Worker {worker} iniciado.")
+        proxima_purga = time.monotonic()
+        while restantes is None or restantes > 0:
+            procesadas = procesar_tareas(limite=restantes, worker=worker)
+            for tarea in procesadas:
+                detalle = f" ({tarea.ultimo_error})" if tarea.ultimo_error else ""
+                self.stdout.write(f"Tarea {tarea.pk} {tarea.tipo}: {tarea.estado}{detalle}")
+            if restantes is not None:
+                restantes -= len(procesadas)
+            correos = enviar_correos_pendientes(worker=worker)
+            if correos:
+                enviados = sum(1 for correo in correos if correo.estado == correo.ENVIADO)
+                self.stdout.write(f"Correos: {enviados} enviados, {len(correos) - enviados} con error.")
+            if time.monotonic() >= proxima_purga:
+                borrados = purgar_tokens_vencidos()
+                if borrados:
+                    self.stdout.write(f"Tokens vencidos borrados: {borrados}.")
+                subidas = purgar_subidas_vencidas()
+                if subidas:
+                    self.stdout.write(f"Subidas vencidas borradas: {subidas}.")
+                proxima_purga = time.monotonic() + options['purge_interval']
+            if options['once']:
+                break
+            if not procesadas and not correos:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS("Worker detenido."))
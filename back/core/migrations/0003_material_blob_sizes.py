@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:28
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def fill_blob_sizes(apps, schema_editor):
+    # Calcula los tamaños en la base de datos, sin traer los blobs a Python
+    Material = apps.get_model('core', 'Material')
+    Material.objects.update(
+        archivo_size=Length('archivo_blob'),
+        thumbnail_size=Length('thumbnail_blob'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_remove_material_thumbnail_nombre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='archivo_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='thumbnail_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_blob_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def construir_resumenes(apps, schema_editor):
+    Calificacion = apps.get_model('core', 'Calificacion')
+    ResumenCalificacion = apps.get_model('core', 'ResumenCalificacion')
+    filas = Calificacion.objects.values('material_id').annotate(
+        total=Count('id'),
+        suma=Sum('puntaje'),
+        **{f'estrellas_{p}': Count('id', filter=Q(puntaje=p)) for p in range(1, 6)},
+    )
+    ResumenCalificacion.objects.bulk_create([
+        ResumenCalificacion(promedio=fila['suma'] / fila['total'], **fila)
+        for fila in filas
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_material_blob_sizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCalificacion',
+            fields=[
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='core.material')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('suma', models.PositiveIntegerField(default=0)),
+                ('estrellas_1', models.PositiveIntegerField(default=0)),
+                ('estrellas_2', models.PositiveIntegerField(default=0)),
+                ('estrellas_3', models.PositiveIntegerField(default=0)),
+                ('estrellas_4', models.PositiveIntegerField(default=0)),
+                ('estrellas_5', models.PositiveIntegerField(default=0)),
+                ('promedio', models.FloatField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(construir_resumenes, migrations.RunPython.noop),
+    ]
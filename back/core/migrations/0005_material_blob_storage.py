@@ -0,0 +1,59 @@
+from django.core.files.storage import storages
+from django.db import migrations, models
+
+
+BLOBS = (
+    ('archivo_blob', 'archivo_sha256', 'archivo_size'),
+    ('thumbnail_blob', 'thumbnail_sha256', 'thumbnail_size'),
+)
+
+
+def mover_blobs_al_almacenamiento(apps, schema_editor):
+    # Fila por fila para no tener todos los archivos en memoria a la vez
+    Material = apps.get_model('core', 'Material')
+    storage = storages['blobs']
+    for pk in Material.objects.values_list('pk', flat=True).iterator():
+        for blob_field, digest_field, size_field in BLOBS:
+            blob = Material.objects.filter(pk=pk).values_list(blob_field, flat=True).get()
+            if not blob:
+                continue
+            digest, size = storage.store(bytes(blob))
+            Material.objects.filter(pk=pk).update(**{digest_field: digest, size_field: size})
+
+
+def devolver_blobs_a_la_base(apps, schema_editor):
+    Material = apps.get_model('core', 'Material')
+    storage = storages['blobs']
+    for blob_field, digest_field, _ in BLOBS:
+        pendientes = Material.objects.exclude(**{f'{digest_field}__isnull': True}).values_list('pk', digest_field)
+        for pk, digest in pendientes.iterator():
+            Material.objects.filter(pk=pk).update(**{blob_field: storage.read_digest(digest)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_resumen_calificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='archivo_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='thumbnail_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(mover_blobs_al_almacenamiento, devolver_blobs_a_la_base),
+        migrations.RemoveField(
+            model_name='material',
+            name='archivo_blob',
+        ),
+        migrations.RemoveField(
+            model_name='material',
+            name='thumbnail_blob',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def marcar_miniaturas_existentes(apps, schema_editor):
+    Material = apps.get_model('core', 'Material')
+    Material.objects.filter(thumbnail_sha256__isnull=False).update(thumbnail_status='lista')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_subida_fragmentada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('no_aplica', 'No aplica'), ('pendiente', 'Pendiente'), ('lista', 'Lista'), ('fallida', 'Fallida')], default='no_aplica', max_length=10),
+        ),
+        migrations.RunPython(marcar_miniaturas_existentes, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomada_en', models.DateTimeField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='tarea_estado_disp_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+import core.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_indice(apps, schema_editor):
+    core.search.crear_indice(schema_editor)
+
+
+def borrar_indice(apps, schema_editor):
+    core.search.borrar_indice(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_tareas_y_estado_miniatura'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+        migrations.CreateModel(
+            name='MaterialBusqueda',
+            fields=[
+                ('material', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='indice_busqueda', serialize=False, to='core.material')),
+                ('titulo', models.TextField()),
+                ('descripcion', models.TextField()),
+                ('indice', core.search.IndiceFTS(db_column='core_material_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'core_material_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_material_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calificacion',
+            index=models.Index(fields=['material', '-fecha', '-id'], name='calif_material_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calificacion',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='calif_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['material', '-fecha', '-id'], name='coment_material_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='coment_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='material_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['usuario', '-fecha_creacion', '-id'], name='material_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['tipo', '-fecha_creacion', '-id'], name='material_tipo_fecha_idx'),
+        ),
+    ]
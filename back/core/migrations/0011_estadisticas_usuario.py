@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+CONTADORES = {
+    'materiales': 'Material',
+    'favoritos': 'Favorito',
+    'comentarios': 'Comentario',
+    'calificaciones': 'Calificacion',
+}
+
+
+def construir_estadisticas(apps, schema_editor):
+    EstadisticasUsuario = apps.get_model('core', 'EstadisticasUsuario')
+    estadisticas = {}
+    for campo, modelo in CONTADORES.items():
+        filas = apps.get_model('core', modelo).objects.order_by().values('usuario_id').annotate(n=Count('id'))
+        for fila in filas:
+            usuario_id = fila['usuario_id']
+            if usuario_id not in estadisticas:
+                estadisticas[usuario_id] = EstadisticasUsuario(usuario_id=usuario_id)
+            setattr(estadisticas[usuario_id], campo, fila['n'])
+    EstadisticasUsuario.objects.bulk_create(estadisticas.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('materiales', models.PositiveIntegerField(default=0)),
+                ('favoritos', models.PositiveIntegerField(default=0)),
+                ('comentarios', models.PositiveIntegerField(default=0)),
+                ('calificaciones', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-materiales'], name='estadisticas_materiales_idx')],
+            },
+        ),
+        migrations.RunPython(construir_estadisticas, migrations.RunPython.noop),
+    ]
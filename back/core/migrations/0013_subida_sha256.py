@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_correos_pendientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidafragmentada',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
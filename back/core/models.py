@@ -1,7 +1,21 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
-from django.db import models
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce
 from django.conf import settings
+from django.utils import timezone
+import fcntl
+import hashlib
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from .search import FTS_TABLE, IndiceFTS
+from .storage import blob_storage
+from .uploads import ArchivoEnDisco
 
 
 #------------------------------Usurario-------------------------------------------------
@@ -54,23 +68,291 @@ TIPO_CHOICES = [
     ('video', 'Video'),
 ]
 
+class MaterialQuerySet(models.QuerySet):
+    def with_ratings(self, user=None):
+        # Promedio y total salen del resumen (O(1)); la calificación del usuario, de una subconsulta
+        # (y su id, para que el frontend la edite sin listar todas las calificaciones)
+        if user is not None and user.is_authenticated:
+            mia = Calificacion.objects.filter(material=models.OuterRef('pk'), usuario=user)
+            mi_calificacion = models.Subquery(mia.values('puntaje')[:1])
+            mi_calificacion_id = models.Subquery(mia.values('id')[:1])
+        else:
+            mi_calificacion = models.Value(None, output_field=models.PositiveSmallIntegerField())
+            mi_calificacion_id = models.Value(None, output_field=models.BigIntegerField())
+        return self.select_related('usuario').annotate(
+            calificacion_promedio=models.F('resumen__promedio'),
+            total_calificaciones=Coalesce(models.F('resumen__total'), 0),
+            mi_calificacion=mi_calificacion,
+            mi_calificacion_id=mi_calificacion_id,
+        )
+
+
 class Material(models.Model):
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True)
-    archivo_blob = models.BinaryField(blank=True, null=True)
     archivo_nombre = models.CharField(max_length=255, blank=True, null=True)
     archivo_tipo = models.CharField(max_length=100, blank=True, null=True)
     video_url = models.URLField(blank=True, null=True)
     tipo = models.CharField(max_length=15, choices=TIPO_CHOICES)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='materiales')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     # Miniatura
-    thumbnail_blob = models.BinaryField(blank=True, null=True)
     thumbnail_tipo = models.CharField(max_length=100, blank=True, null=True)
+    # Los archivos viven en el almacenamiento 'blobs'; aquí solo su SHA-256 y tamaño
+    archivo_sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    archivo_size = models.PositiveBigIntegerField(blank=True, null=True)
+    thumbnail_sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    thumbnail_size = models.PositiveBigIntegerField(blank=True, null=True)
+
+    THUMBNAIL_NO_APLICA = 'no_aplica'
+    THUMBNAIL_PENDIENTE = 'pendiente'
+    THUMBNAIL_LISTA = 'lista'
+    THUMBNAIL_FALLIDA = 'fallida'
+    THUMBNAIL_STATUS_CHOICES = [
+        (THUMBNAIL_NO_APLICA, 'No aplica'),
+        (THUMBNAIL_PENDIENTE, 'Pendiente'),
+        (THUMBNAIL_LISTA, 'Lista'),
+        (THUMBNAIL_FALLIDA, 'Fallida'),
+    ]
+    # La miniatura se genera en segundo plano (core.thumbnails, run_worker)
+    thumbnail_status = models.CharField(max_length=10, choices=THUMBNAIL_STATUS_CHOICES, default=THUMBNAIL_NO_APLICA)
+
+    objects = MaterialQuerySet.as_manager()
+
+    class Meta:
+        # Un índice por cada forma de listar: catálogo, "mis materiales" y por tipo,
+        # todos en el orden del cursor (fecha_creacion, id)
+        indexes = [
+            models.Index(fields=['-fecha_creacion', '-id'], name='material_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha_creacion', '-id'], name='material_usuario_fecha_idx'),
+            models.Index(fields=['tipo', '-fecha_creacion', '-id'], name='material_tipo_fecha_idx'),
+        ]
+
+    BLOBS = {
+        'archivo_blob': ('archivo_sha256', 'archivo_size'),
+        'thumbnail_blob': ('thumbnail_sha256', 'thumbnail_size'),
+    }
 
     def __str__(self):
         return f'{self.titulo} ({self.tipo})'
 
+    @property
+    def has_archivo(self):
+        return bool(self.archivo_size)
+
+    @property
+    def has_thumbnail(self):
+        return bool(self.thumbnail_size)
+
+    @property
+    def thumbnail_version(self):
+        # Va en la URL de la miniatura: si cambia la imagen, cambia la URL
+        return self.thumbnail_sha256[:16] if self.thumbnail_sha256 else None
+
+    # archivo_blob / thumbnail_blob siguen funcionando como antes (bytes), y
+    # también aceptan un archivo (File/UploadedFile): al asignarlos quedan
+    # pendientes y se escriben en el almacenamiento al guardar.
+    def _leer_blob(self, nombre):
+        pendientes = self.__dict__.get('_blobs_pendientes', {})
+        if nombre in pendientes:
+            contenido = pendientes[nombre]
+            if isinstance(contenido, File):
+                contenido.seek(0)
+                return contenido.read()
+            return contenido
+        digest = getattr(self, self.BLOBS[nombre][0])
+        return blob_storage().read_digest(digest) if digest else None
+
+    def _asignar_blob(self, nombre, contenido):
+        self.__dict__.setdefault('_blobs_pendientes', {})[nombre] = contenido
+
+    @property
+    def archivo_blob(self):
+        return self._leer_blob('archivo_blob')
+
+    @archivo_blob.setter
+    def archivo_blob(self, contenido):
+        self._asignar_blob('archivo_blob', contenido)
+
+    @property
+    def thumbnail_blob(self):
+        return self._leer_blob('thumbnail_blob')
+
+    @thumbnail_blob.setter
+    def thumbnail_blob(self, contenido):
+        self._asignar_blob('thumbnail_blob', contenido)
+
+    def open_archivo(self):
+        return blob_storage().open_digest(self.archivo_sha256)
+
+    @property
+    def archivo_path(self):
+        return blob_storage().path(blob_storage().name_for(self.archivo_sha256))
+
+    def open_thumbnail(self):
+        return blob_storage().open_digest(self.thumbnail_sha256)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+        pendientes = self.__dict__.pop('_blobs_pendientes', {})
+        reemplazados = []
+        guardados = set()
+        for nombre, (digest_field, size_field) in self.BLOBS.items():
+            if update_fields is not None and nombre in update_fields:
+                update_fields.discard(nombre)
+                update_fields |= {digest_field, size_field}
+            if nombre not in pendientes:
+                continue
+            contenido = pendientes[nombre]
+            vacio = contenido is None or (isinstance(contenido, (bytes, bytearray, memoryview)) and not contenido)
+            digest, size = blob_storage().store(contenido) if not vacio else (None, None)
+            anterior = getattr(self, digest_field)
+            if anterior and anterior != digest:
+                reemplazados.append(anterior)
+            setattr(self, digest_field, digest)
+            setattr(self, size_field, size)
+            guardados.add(nombre)
+        if 'thumbnail_blob' in guardados:
+            self.thumbnail_status = self.THUMBNAIL_LISTA if self.thumbnail_sha256 else self.THUMBNAIL_NO_APLICA
+            if update_fields is not None:
+                update_fields.add('thumbnail_status')
+        # signals.encolar_miniatura usa esto para saber si cambió el archivo
+        self._blobs_guardados = guardados
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if reemplazados:
+            transaction.on_commit(lambda: Material.liberar_blobs(reemplazados))
+
+    @classmethod
+    def liberar_blobs(cls, digests):
+        # Borra del almacenamiento los archivos que ya no usa ningún material
+        for digest in set(filter(None, digests)):
+            en_uso = cls.objects.filter(
+                models.Q(archivo_sha256=digest) | models.Q(thumbnail_sha256=digest)
+            ).exists()
+            if not en_uso:
+                blob_storage().delete_digest(digest)
+
+
+#----------------------------Subidas por partes------------------------------
+
+class SubidaFragmentada(models.Model):
+    # Subida reanudable: el cliente envía el archivo en trozos (PATCH con
+    # Upload-Offset) y al terminar crea el material con el id de la subida.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='subidas')
+    archivo_nombre = models.CharField(max_length=255)
+    archivo_tipo = models.CharField(max_length=100, blank=True)
+    tamanio_total = models.PositiveBigIntegerField()
+    recibido = models.PositiveBigIntegerField(default=0)
+    # SHA-256 del archivo, calculado al recibir el último trozo
+    sha256 = models.CharField(max_length=64, blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.archivo_nombre} ({self.recibido}/{self.tamanio_total})"
+
+    @property
+    def completa(self):
+        return self.recibido == self.tamanio_total
+
+    @property
+    def ruta_parcial(self):
+        return blob_storage().partial_path(self.id)
+
+    def agregar(self, stream, offset, largo, chunk_size=64 * 1024):
+        # Copia `largo` bytes del stream al final del archivo parcial, por bloques.
+        # Se escribe sin transacción (un cliente lento no retiene el lock de escritura
+        # de SQLite); la exclusión entre peticiones de la misma subida la da un flock
+        # sobre el archivo parcial, y al final solo se confirma `recibido`.
+        os.makedirs(os.path.dirname(self.ruta_parcial), exist_ok=True)
+        with open(os.open(self.ruta_parcial, os.O_RDWR | os.O_CREAT, 0o600), 'r+b') as destino:
+            try:
+                fcntl.flock(destino, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Otra petición está escribiendo esta subida
+                return False
+            recibido = SubidaFragmentada.objects.filter(pk=self.pk).values_list('recibido', flat=True).first()
+            if recibido != offset:
+                return False
+            destino.seek(offset)
+            destino.truncate()
+            restante = largo
+            while restante > 0:
+                chunk = stream.read(min(chunk_size, restante))
+                if not chunk:
+                    break
+                destino.write(chunk)
+                restante -= len(chunk)
+            destino.flush()
+            nuevo = offset + largo - restante
+            # Con el último trozo se calcula el hash, todavía fuera de toda transacción:
+            # al crear el material el archivo se mueve sin volver a leerlo
+            sha256 = self.calcular_sha256(destino, chunk_size) if nuevo == self.tamanio_total else None
+            with transaction.atomic():
+                actualizadas = SubidaFragmentada.objects.filter(pk=self.pk, recibido=offset).update(
+                    recibido=nuevo, sha256=sha256,
+                )
+        if actualizadas:
+            self.recibido, self.sha256 = nuevo, sha256
+        return bool(actualizadas)
+
+    @staticmethod
+    def calcular_sha256(archivo, chunk_size):
+        sha = hashlib.sha256()
+        archivo.seek(0)
+        for chunk in iter(lambda: archivo.read(chunk_size), b''):
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    def abrir(self):
+        if self.sha256:
+            return ArchivoEnDisco(self.ruta_parcial, self.archivo_nombre, self.sha256)
+        return File(open(self.ruta_parcial, 'rb'), name=self.archivo_nombre)
+
+    def descartar(self):
+        if os.path.exists(self.ruta_parcial):
+            os.remove(self.ruta_parcial)
+        self.delete()
+
+    @classmethod
+    def vencidas(cls):
+        limite = timezone.now() - timedelta(seconds=expiracion_subidas())
+        return cls.objects.filter(fecha_creacion__lt=limite)
+
+
+def expiracion_subidas():
+    return getattr(settings, 'SUBIDA_EXPIRACION', 24 * 3600)
+
+
+def purgar_subidas_vencidas():
+    # Borra las subidas abandonadas y sus archivos parciales, también los que
+    # quedaron sin fila (p. ej. al borrar el usuario)
+    borradas = 0
+    for subida in SubidaFragmentada.vencidas().iterator():
+        subida.descartar()
+        borradas += 1
+    carpeta = os.path.dirname(blob_storage().partial_path('x'))
+    if os.path.isdir(carpeta):
+        limite = time.time() - expiracion_subidas()
+        for nombre in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, nombre)
+            subida_id = nombre.removesuffix('.part')
+            try:
+                huerfano = (
+                    os.path.getmtime(ruta) < limite
+                    and not SubidaFragmentada.objects.filter(pk=subida_id).exists()
+                )
+            except (OSError, ValidationError):
+                continue
+            if huerfano:
+                os.remove(ruta)
+    return borradas
+
 
 #----------------------------Favoritos------------------------------
 
@@ -93,6 +375,12 @@ class Comentario(models.Model):
     texto = models.TextField()
     fecha = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['material', '-fecha', '-id'], name='coment_material_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='coment_usuario_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario.email} - {self.texto[:40]}..."
     
@@ -107,7 +395,291 @@ class Calificacion(models.Model):
 
     class Meta:
         unique_together = ('usuario', 'material')
+        indexes = [
+            models.Index(fields=['material', '-fecha', '-id'], name='calif_material_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='calif_usuario_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.email} - {self.material.titulo} - {self.puntaje} estrellas"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recuerda el puntaje (y material) leídos para poder ajustar el resumen al editarlo
+        instance = super().from_db(db, field_names, values)
+        instance._puntaje_guardado = instance.__dict__.get('puntaje')
+        instance._material_guardado = instance.__dict__.get('material_id')
+        return instance
+
+
+
+#-------------------------Índice de búsqueda------------------------
+
+class MaterialBusqueda(models.Model):
+    # Tabla FTS5 (solo SQLite) que mantienen los triggers de la migración 0009.
+    # No se escribe desde el ORM: sirve para unirla a Material y filtrar/ordenar.
+    material = models.OneToOneField(
+        Material, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='indice_busqueda',
+    )
+    titulo = models.TextField()
+    descripcion = models.TextField()
+    indice = IndiceFTS(db_column=FTS_TABLE)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+#-------------------------Tareas en segundo plano------------------------
+
+class Tarea(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    tomada_en = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde'], name='tarea_estado_disp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+
+#-------------------------Correos pendientes-------------------------
+
+class CorreoPendiente(models.Model):
+    # Bandeja de salida: la vista guarda el correo ya renderizado en su misma
+    # transacción y run_worker lo envía (correos.py)
+    PENDIENTE = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    ENVIADO = 'enviado'
+    FALLIDO = 'fallido'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (ENVIADO, 'Enviado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    plantilla = models.CharField(max_length=50)
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    texto = models.TextField()
+    html = models.TextField(blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    tomado_en = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde'], name='correo_estado_disp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plantilla} a {self.destinatario} ({self.estado})"
+
+
+#-------------------------Resumen de calificaciones------------------------
+
+class ResumenCalificacion(models.Model):
+    # Acumulado por material, mantenido en cada alta/cambio/baja de Calificacion
+    material = models.OneToOneField('Material', on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+    total = models.PositiveIntegerField(default=0)
+    suma = models.PositiveIntegerField(default=0)
+    estrellas_1 = models.PositiveIntegerField(default=0)
+    estrellas_2 = models.PositiveIntegerField(default=0)
+    estrellas_3 = models.PositiveIntegerField(default=0)
+    estrellas_4 = models.PositiveIntegerField(default=0)
+    estrellas_5 = models.PositiveIntegerField(default=0)
+    promedio = models.FloatField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.material_id} - {self.promedio} ({self.total})"
+
+    @property
+    def histograma(self):
+        return {p: getattr(self, f'estrellas_{p}') for p in range(1, 6)}
+
+    @classmethod
+    def aplicar(cls, material_id, anterior=None, nuevo=None):
+        # Suma/resta un voto con F() para que sea atómico sin leer la fila
+        cambios = {}
+        delta_total = 0
+        delta_suma = 0
+        if anterior is not None:
+            cambios[f'estrellas_{anterior}'] = models.F(f'estrellas_{anterior}') - 1
+            delta_total -= 1
+            delta_suma -= anterior
+        if nuevo is not None:
+            campo = f'estrellas_{nuevo}'
+            cambios[campo] = (cambios.get(campo) or models.F(campo)) + 1
+            delta_total += 1
+            delta_suma += nuevo
+        if not cambios:
+            return
+        if nuevo is not None and anterior is None:
+            cls.objects.get_or_create(material_id=material_id)
+        total = models.F('total') + delta_total
+        suma = models.F('suma') + delta_suma
+        cls.objects.filter(material_id=material_id).update(
+            total=total,
+            suma=suma,
+            promedio=models.Case(
+                models.When(condition=models.Q(total__gt=-delta_total), then=Cast(suma, models.FloatField()) / total),
+                default=None,
+                output_field=models.FloatField(),
+            ),
+            **cambios,
+        )
+
+    @classmethod
+    def reconstruir(cls, material_ids=None, guardar=True):
+        # Recalcula desde cero; devuelve los resúmenes que estaban desfasados
+        conteos = Calificacion.objects.values('material_id').annotate(
+            total=models.Count('id'),
+            suma=models.Sum('puntaje'),
+            **{f'estrellas_{p}': models.Count('id', filter=models.Q(puntaje=p)) for p in range(1, 6)},
+        )
+        existentes = cls.objects.all()
+        if material_ids is not None:
+            conteos = conteos.filter(material_id__in=material_ids)
+            existentes = existentes.filter(material_id__in=material_ids)
+        esperados = {}
+        for fila in conteos:
+            material_id = fila.pop('material_id')
+            fila['promedio'] = fila['suma'] / fila['total']
+            esperados[material_id] = fila
+        campos = ['total', 'suma', 'promedio'] + [f'estrellas_{p}' for p in range(1, 6)]
+        vacio = dict.fromkeys(campos, 0)
+        vacio['promedio'] = None
+
+        desfasados = []
+        actuales = {r.material_id: r for r in existentes}
+        for material_id in set(esperados) | set(actuales):
+            valores = esperados.get(material_id, vacio)
+            resumen = actuales.get(material_id)
+            if resumen is None:
+                resumen = cls(material_id=material_id)
+            elif all(getattr(resumen, c) == valores[c] for c in campos):
+                continue
+            for campo in campos:
+                setattr(resumen, campo, valores[campo])
+            desfasados.append(resumen)
+
+        if guardar and desfasados:
+            nuevos = [r for r in desfasados if r._state.adding]
+            existentes = [r for r in desfasados if not r._state.adding]
+            with transaction.atomic():
+                cls.objects.bulk_create(nuevos)
+                cls.objects.bulk_update(existentes, campos)
+        return desfasados
+
+
+#-------------------------Estadísticas por usuario------------------------
+
+class EstadisticasUsuario(models.Model):
+    # Contadores por usuario, mantenidos en cada alta/baja (signals.py).
+    # Leerlos no necesita COUNT(*) y se pueden ordenar (p. ej. top de autores).
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas'
+    )
+    materiales = models.PositiveIntegerField(default=0)
+    favoritos = models.PositiveIntegerField(default=0)
+    comentarios = models.PositiveIntegerField(default=0)
+    calificaciones = models.PositiveIntegerField(default=0)
+
+    CONTADORES = ['materiales', 'favoritos', 'comentarios', 'calificaciones']
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-materiales'], name='estadisticas_materiales_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.materiales} materiales"
+
+    @classmethod
+    def modelos(cls):
+        return {
+            'materiales': Material,
+            'favoritos': Favorito,
+            'comentarios': Comentario,
+            'calificaciones': Calificacion,
+        }
+
+    @classmethod
+    def aplicar(cls, usuario_id, **deltas):
+        # Suma/resta con F(): atómico y sin leer la fila
+        cambios = {campo: models.F(campo) + delta for campo, delta in deltas.items() if delta}
+        if not cambios:
+            return
+        if cls.objects.filter(usuario_id=usuario_id).update(**cambios):
+            return
+        # Primera actividad del usuario (una baja sin fila se deja a reconstruir)
+        if all(delta > 0 for delta in deltas.values()):
+            cls.objects.get_or_create(usuario_id=usuario_id)
+            cls.objects.filter(usuario_id=usuario_id).update(**cambios)
+
+    @classmethod
+    def reconstruir(cls, usuario_ids=None, guardar=True):
+        # Recalcula desde cero; devuelve las filas que estaban desfasadas
+        esperados = {}
+        for campo, modelo in cls.modelos().items():
+            conteos = modelo.objects.order_by().values('usuario_id').annotate(n=models.Count('pk'))
+            if usuario_ids is not None:
+                conteos = conteos.filter(usuario_id__in=usuario_ids)
+            for fila in conteos:
+                esperados.setdefault(fila['usuario_id'], dict.fromkeys(cls.CONTADORES, 0))[campo] = fila['n']
+        existentes = cls.objects.all()
+        if usuario_ids is not None:
+            existentes = existentes.filter(usuario_id__in=usuario_ids)
+        vacio = dict.fromkeys(cls.CONTADORES, 0)
+
+        desfasados = []
+        actuales = {e.usuario_id: e for e in existentes}
+        for usuario_id in set(esperados) | set(actuales):
+            valores = esperados.get(usuario_id, vacio)
+            estadisticas = actuales.get(usuario_id)
+            if estadisticas is None:
+                estadisticas = cls(usuario_id=usuario_id)
+            elif all(getattr(estadisticas, c) == valores[c] for c in cls.CONTADORES):
+                continue
+            for campo in cls.CONTADORES:
+                setattr(estadisticas, campo, valores[campo])
+            desfasados.append(estadisticas)
+
+        if guardar and desfasados:
+            nuevos = [e for e in desfasados if e._state.adding]
+            existentes = [e for e in desfasados if not e._state.adding]
+            with transaction.atomic():
+                cls.objects.bulk_create(nuevos)
+                cls.objects.bulk_update(existentes, cls.CONTADORES)
+        return desfasados
@@ -0,0 +1,203 @@
+import base64
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Model, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Paginación por cursor sobre el orden del queryset más el id como desempate,
+    # p. ej. (fecha_creacion, id): cada página es un WHERE sobre esas columnas en
+    # vez de un OFFSET, así que la página 1000 cuesta lo mismo que la primera.
+    # Funciona con cualquier ?ordering= (los NULL siempre van al final).
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        orden = self.get_ordering(queryset)
+        self.nulables = {nombre for nombre, _, _ in orden if self.admite_nulos(queryset, nombre)}
+        cursor = self.decode_cursor(request, orden, queryset)
+        hacia_atras = cursor is not None and cursor['atras']
+        if hacia_atras:
+            orden = [(nombre, not desc, not nulls_last) for nombre, desc, nulls_last in orden]
+
+        queryset = queryset.order_by(*[
+            self.expresion_orden(nombre, desc, nulls_last) for nombre, desc, nulls_last in orden
+        ])
+        if cursor is not None:
+            queryset = queryset.filter(self.despues_de(orden, cursor['valores']))
+
+        resultados = list(queryset[:self.page_size + 1])
+        hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        if hacia_atras:
+            resultados.reverse()
+
+        self.orden = orden if not hacia_atras else [(n, not d, not nl) for n, d, nl in orden]
+        self.next_valores = self.previous_valores = None
+        if resultados:
+            if hay_mas or hacia_atras:
+                self.next_valores = self.valores_de(resultados[-1])
+            if cursor is not None and (hay_mas or not hacia_atras):
+                self.previous_valores = self.valores_de(resultados[0])
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            pedido = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(pedido, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        # (campo, descendente, nulls al final) del queryset ya ordenado por la vista
+        # o por OrderingFilter; siempre termina en pk para que el orden sea total.
+        orden = []
+        for campo in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(campo, str) or campo == '?':
+                continue
+            desc = campo.startswith('-')
+            nombre = campo.lstrip('-')
+            if nombre == 'id':
+                nombre = 'pk'
+            if nombre not in [n for n, _, _ in orden]:
+                orden.append((nombre, desc, True))
+        if 'pk' not in [n for n, _, _ in orden]:
+            orden.append(('pk', orden[0][1] if orden else True, True))
+        return orden
+
+    def admite_nulos(self, queryset, nombre):
+        # Las anotaciones (promedio, relevancia) pueden ser NULL; las columnas, según el modelo
+        if nombre == 'pk':
+            return False
+        if nombre in queryset.query.annotations or '__' in nombre:
+            return True
+        try:
+            return queryset.model._meta.get_field(nombre).null
+        except FieldDoesNotExist:
+            return True
+
+    def expresion_orden(self, nombre, desc, nulls_last):
+        if nombre not in self.nulables:
+            return F(nombre).desc() if desc else F(nombre).asc()
+        nulos = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        return F(nombre).desc(**nulos) if desc else F(nombre).asc(**nulos)
+
+    def despues_de(self, orden, valores):
+        # (a, b, c) "después de" (x, y, z) en el orden dado, campo por campo
+        condiciones = []
+        iguales = Q()
+        for (nombre, desc, nulls_last), valor in zip(orden, valores):
+            es_nulo = Q(**{f'{nombre}__isnull': True})
+            if valor is None:
+                mas_alla = None if nulls_last else ~es_nulo
+                igual = es_nulo
+            else:
+                mas_alla = Q(**{f'{nombre}__{"lt" if desc else "gt"}': valor})
+                if nulls_last and nombre in self.nulables:
+                    mas_alla |= es_nulo
+                igual = Q(**{nombre: valor})
+            if mas_alla is not None:
+                condiciones.append(iguales & mas_alla)
+            iguales &= igual
+        if not condiciones:
+            return Q(pk__in=[])
+        return self.cota(*orden[0], valores[0]) & reduce(operator.or_, condiciones)
+
+    def cota(self, nombre, desc, nulls_last, valor):
+        # Redundante con despues_de, pero le da al motor un rango sobre el primer
+        # campo: sin esto SQLite no usa el índice (fecha_creacion, id) con el OR.
+        es_nulo = Q(**{f'{nombre}__isnull': True})
+        if valor is None:
+            return es_nulo if nulls_last else Q()
+        cota = Q(**{f'{nombre}__{"lte" if desc else "gte"}': valor})
+        return cota | es_nulo if nulls_last and nombre in self.nulables else cota
+
+    def valores_de(self, obj):
+        valores = []
+        for nombre, _, _ in self.orden:
+            valor = obj
+            for parte in nombre.split('__'):
+                valor = getattr(valor, parte, None)
+            if isinstance(valor, Model):
+                valor = valor.pk
+            if isinstance(valor, (datetime.datetime, datetime.date)):
+                valor = valor.isoformat()
+            valores.append(valor)
+        return valores
+
+    def encode_cursor(self, valores, atras):
+        datos = json.dumps({'o': [n for n, _, _ in self.orden], 'v': valores, 'a': atras}, default=str)
+        cursor = base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def campo_de(self, queryset, nombre):
+        # Campo del modelo (o de la anotación) con el que se compara `nombre`
+        if nombre in queryset.query.annotations:
+            return queryset.query.annotations[nombre].output_field
+        if nombre == 'pk':
+            return queryset.model._meta.pk
+        modelo = queryset.model
+        for parte in nombre.split('__'):
+            campo = modelo._meta.get_field(parte)
+            modelo = campo.related_model
+        return campo
+
+    def decode_cursor(self, request, orden, queryset):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if datos['o'] != [n for n, _, _ in orden] or not isinstance(datos['v'], list) \
+                    or len(datos['v']) != len(orden):
+                raise ValueError
+            # Cada valor al tipo de su campo: un cursor manipulado no llega al WHERE
+            valores = [
+                None if valor is None else self.campo_de(queryset, nombre).to_python(valor)
+                for (nombre, _, _), valor in zip(orden, datos['v'])
+            ]
+        except Exception:
+            # Cursor manipulado o de otro ?ordering=
+            raise NotFound(self.invalid_cursor_message)
+        return {'valores': valores, 'atras': bool(datos.get('a'))}
+
+    def get_next_link(self):
+        if self.next_valores is None:
+            return None
+        return self.encode_cursor(self.next_valores, False)
+
+    def get_previous_link(self):
+        if self.previous_valores is None:
+            return None
+        return self.encode_cursor(self.previous_valores, True)
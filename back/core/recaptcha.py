@@ -0,0 +1,124 @@
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from rest_framework.exceptions import APIException
+
+# Verificación de reCAPTCHA. Un solo cliente por proceso (verificador()) con una
+# sesión keep-alive: las conexiones TLS a Google se reutilizan entre registros.
+# Cada llamada tiene timeouts de conexión y de lectura, y un circuito que, tras
+# varias fallas seguidas, deja de llamar durante un rato: el registro responde
+# 503 enseguida en vez de dejar a los workers esperando. La clase se elige con
+# RECAPTCHA_VERIFICADOR y la URL con RECAPTCHA_URL (las pruebas usan un servidor local).
+
+URL_GOOGLE = 'https://www.google.com/recaptcha/api/siteverify'
+
+
+class RecaptchaNoDisponible(Exception):
+    pass
+
+
+class CaptchaNoDisponible(APIException):
+    status_code = 503
+    default_detail = "No pudimos verificar el captcha. Intenta de nuevo en unos minutos."
+    default_code = 'captcha_no_disponible'
+
+
+class Circuito:
+    # Cerrado: se llama normalmente. Abierto: se rechaza sin llamar hasta que pasa
+    # `espera`. Después se deja pasar una llamada de prueba (medio abierto)
+    def __init__(self, max_fallas, espera):
+        self.max_fallas = max_fallas
+        self.espera = espera
+        self.fallas = 0
+        self.abierto_hasta = None
+        self.probando = False
+        self.lock = threading.Lock()
+
+    def permitir(self):
+        with self.lock:
+            if self.abierto_hasta is None:
+                return True
+            if time.monotonic() < self.abierto_hasta or self.probando:
+                return False
+            self.probando = True
+            return True
+
+    def exito(self):
+        with self.lock:
+            self.fallas = 0
+            self.abierto_hasta = None
+            self.probando = False
+
+    def falla(self):
+        with self.lock:
+            self.fallas += 1
+            self.probando = False
+            if self.fallas >= self.max_fallas:
+                self.abierto_hasta = time.monotonic() + self.espera
+
+
+class VerificadorRecaptcha:
+    def __init__(self):
+        self.url = getattr(settings, 'RECAPTCHA_URL', URL_GOOGLE)
+        self.secreto = getattr(settings, 'RECAPTCHA_SECRET_KEY', None)
+        self.timeout = (
+            getattr(settings, 'RECAPTCHA_TIMEOUT_CONEXION', 2),
+            getattr(settings, 'RECAPTCHA_TIMEOUT_LECTURA', 3),
+        )
+        self.circuito = Circuito(
+            getattr(settings, 'RECAPTCHA_CIRCUITO_FALLAS', 5),
+            getattr(settings, 'RECAPTCHA_CIRCUITO_ESPERA', 30),
+        )
+        self.session = requests.Session()
+        # Sin reintentos: un reintento duplicaría el tiempo que espera el usuario
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(settings, 'RECAPTCHA_POOL', 10), max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def verificar(self, token, ip=None):
+        # True/False según Google; RecaptchaNoDisponible si no se pudo preguntar
+        if not self.circuito.permitir():
+            raise RecaptchaNoDisponible("Circuito abierto")
+        data = {'secret': self.secreto, 'response': token}
+        if ip:
+            data['remoteip'] = ip
+        ok = False
+        try:
+            response = self.session.post(self.url, data=data, timeout=self.timeout)
+            response.raise_for_status()
+            resultado = response.json()
+            exito = bool(resultado.get('success'))
+            ok = True
+        except (requests.RequestException, ValueError, AttributeError) as e:
+            raise RecaptchaNoDisponible(str(e)) from e
+        finally:
+            # Cualquier excepción cuenta como falla y libera la llamada de prueba;
+            # si no, un error inesperado dejaría el circuito rechazando todo
+            if ok:
+                self.circuito.exito()
+            else:
+                self.circuito.falla()
+        return exito
+
+    async def averificar(self, token, ip=None):
+        # requests es bloqueante: va a un hilo, fuera del event loop
+        return await sync_to_async(self.verificar, thread_sensitive=False)(token, ip)
+
+
+@lru_cache(maxsize=None)
+def verificador():
+    return import_string(getattr(settings, 'RECAPTCHA_VERIFICADOR', 'core.recaptcha.VerificadorRecaptcha'))()
+
+
+@receiver(setting_changed)
+def reiniciar_verificador(setting, **kwargs):
+    if setting.startswith('RECAPTCHA_'):
+        verificador.cache_clear()
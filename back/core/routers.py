@@ -0,0 +1,129 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Lecturas en réplicas. ReplicaMiddleware decide por petición si sus lecturas
+# pueden ir a una réplica (GET/HEAD/OPTIONS de alguien que no acaba de escribir)
+# y ReplicaRouter lo aplica a cada consulta. Las escrituras, las transacciones
+# y todo lo que pasa fuera de una petición (comandos, run_worker) usan la principal.
+#
+# Quien escribe lee de la principal durante REPLICA_STICKY_SECONDS, mientras la
+# réplica se pone al día: por una cookie firmada y, para los clientes con JWT
+# que no guardan cookies, por el user_id del token (marcado en el caché).
+
+lectura_en_replica = ContextVar('lectura_en_replica', default=False)
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+COOKIE = 'kiwcha_escritura'
+PREFIJO_CACHE = 'replica:escritura'
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def segundos_sticky():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        disponibles = replicas()
+        if not disponibles or not lectura_en_replica.get():
+            return DEFAULT_DB_ALIAS
+        # Dentro de una transacción se lee lo que ella misma escribió
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son la misma base: un objeto leído de una réplica se puede relacionar con uno de la principal
+        mismas = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in mismas and obj2._state.db in mismas:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Las réplicas reciben el esquema por replicación
+        if db in replicas():
+            return False
+        return None
+
+
+def usuario_del_token(request):
+    # Solo valida la firma y la expiración del JWT: no consulta la base
+    cabecera = request.headers.get('Authorization', '')
+    tipo, _, raw = cabecera.partition(' ')
+    if tipo not in jwt_settings.AUTH_HEADER_TYPES or not raw:
+        return None
+    try:
+        return AccessToken(raw.strip())[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+def escribio_hace_poco(request):
+    if request.get_signed_cookie(COOKIE, default=None, max_age=segundos_sticky()) is not None:
+        return True
+    usuario_id = usuario_del_token(request)
+    return usuario_id is not None and cache.get(f'{PREFIJO_CACHE}:{usuario_id}') is not None
+
+
+def marcar_escritura(request, response):
+    response.set_signed_cookie(
+        COOKIE, '1', max_age=segundos_sticky(), httponly=True, samesite='Lax',
+        secure=request.is_secure(),
+    )
+    usuario_id = usuario_del_token(request)
+    if usuario_id is not None:
+        cache.set(f'{PREFIJO_CACHE}:{usuario_id}', 1, timeout=segundos_sticky())
+
+
+class ReplicaMiddleware:
+    # Funciona con WSGI y ASGI sin pasar las vistas async a un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.antes(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            lectura_en_replica.reset(token)
+        return self.despues(request, response)
+
+    async def __acall__(self, request):
+        token = self.antes(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            lectura_en_replica.reset(token)
+        return self.despues(request, response)
+
+    def antes(self, request):
+        request.lectura_en_replica = bool(
+            replicas() and request.method in METODOS_SEGUROS and not escribio_hace_poco(request)
+        )
+        return lectura_en_replica.set(request.lectura_en_replica)
+
+    def despues(self, request, response):
+        if replicas() and request.method not in METODOS_SEGUROS and response.status_code < 400:
+            marcar_escritura(request, response)
+        return response
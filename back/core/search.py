@@ -0,0 +1,183 @@
+import re
+import unicodedata
+
+from django.db import connection, connections, models, router
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Índice de búsqueda de materiales (título y descripción).
+# SQLite: tabla FTS5 de contenido externo, sincronizada con triggers y
+# expuesta al ORM como MaterialBusqueda (se une a core_material por rowid).
+# PostgreSQL: columna tsvector generada + índice GIN, con unaccent.
+# Ambos se crean en la migración 0009; en otros motores se usa icontains.
+# Después de cada `migrate` se vuelven a crear si faltan (asegurar_indice): en
+# SQLite, una migración que reconstruye core_material borra los triggers.
+
+FTS_TABLE = 'core_material_fts'
+
+SQLITE_CREAR = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        titulo, descripcion,
+        content='core_material', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS core_material_fts_ai AFTER INSERT ON core_material BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, titulo, descripcion) VALUES (new.id, new.titulo, new.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS core_material_fts_ad AFTER DELETE ON core_material BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, descripcion) VALUES ('delete', old.id, old.titulo, old.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS core_material_fts_au AFTER UPDATE OF titulo, descripcion ON core_material BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, descripcion) VALUES ('delete', old.id, old.titulo, old.descripcion);
+        INSERT INTO {FTS_TABLE}(rowid, titulo, descripcion) VALUES (new.id, new.titulo, new.descripcion);
+    END""",
+    # El título pesa más que la descripción
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BORRAR = [
+    "DROP TRIGGER IF EXISTS core_material_fts_ai",
+    "DROP TRIGGER IF EXISTS core_material_fts_ad",
+    "DROP TRIGGER IF EXISTS core_material_fts_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """DO $$ BEGIN
+        CREATE TEXT SEARCH CONFIGURATION kiwcha (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION kiwcha ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    EXCEPTION WHEN unique_violation THEN NULL;
+    END $$""",
+    """ALTER TABLE core_material ADD COLUMN IF NOT EXISTS busqueda_tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('kiwcha'::regconfig, coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('kiwcha'::regconfig, coalesce(descripcion, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS core_material_busqueda_gin ON core_material USING gin (busqueda_tsv)",
+]
+
+POSTGRES_BORRAR = [
+    "DROP INDEX IF EXISTS core_material_busqueda_gin",
+    "ALTER TABLE core_material DROP COLUMN IF EXISTS busqueda_tsv",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS kiwcha",
+]
+
+POSTGRES_FILTRO = "core_material.busqueda_tsv @@ to_tsquery('kiwcha', %s)"
+POSTGRES_RANGO = "-ts_rank(core_material.busqueda_tsv, to_tsquery('kiwcha', %s))"
+
+
+class IndiceFTS(models.TextField):
+    # Columna oculta de FTS5 con el nombre de la tabla: admite `__match`
+    pass
+
+
+@IndiceFTS.register_lookup
+class Coincide(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def normalizar(texto):
+    # Minúsculas y sin tildes/diéresis: "Canción" y "cancion" son lo mismo
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def terminos(texto):
+    # Solo letras y dígitos: los operadores de FTS5/tsquery nunca llegan a la consulta
+    return re.findall(r'\w+', normalizar(texto or ''))
+
+
+def consulta_fts(palabras):
+    # Todas las palabras deben aparecer; la última como prefijo (búsqueda mientras se escribe)
+    partes = [f'"{p}"' for p in palabras[:-1]] + [f'"{palabras[-1]}"*']
+    return ' '.join(partes)
+
+
+def consulta_tsquery(palabras):
+    partes = list(palabras[:-1]) + [f'{palabras[-1]}:*']
+    return ' & '.join(partes)
+
+
+def buscar(queryset, texto):
+    # Filtra por el índice y anota `relevancia` (menor = mejor) para ordenar
+    palabras = terminos(texto)
+    if not palabras:
+        return queryset
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        return queryset.filter(indice_busqueda__indice__match=consulta_fts(palabras)).annotate(
+            relevancia=F('indice_busqueda__rank')
+        )
+    if vendor == 'postgresql':
+        consulta = consulta_tsquery(palabras)
+        return queryset.annotate(
+            coincide=RawSQL(POSTGRES_FILTRO, [consulta], output_field=BooleanField()),
+            relevancia=RawSQL(POSTGRES_RANGO, [consulta], output_field=FloatField()),
+        ).filter(coincide=True)
+    condicion = Q()
+    for palabra in texto.split():
+        condicion &= Q(titulo__icontains=palabra) | Q(descripcion__icontains=palabra)
+    return queryset.filter(condicion)
+
+
+def crear_indice(schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'sqlite': SQLITE_CREAR, 'postgresql': POSTGRES_CREAR}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+SQLITE_TRIGGERS = ('core_material_fts_ai', 'core_material_fts_ad', 'core_material_fts_au')
+
+
+def indice_completo(conexion):
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            SQLITE_TRIGGERS,
+        )
+        return cursor.fetchone()[0] == len(SQLITE_TRIGGERS)
+
+
+def asegurar_indice(sender, using='default', **kwargs):
+    # post_migrate: las sentencias usan IF NOT EXISTS. En SQLite solo se
+    # recrea (con 'rebuild' incluido) si falta algún trigger, porque lo insertado
+    # mientras faltaban no quedó en el índice
+    from .models import Material
+
+    conexion = connections[using]
+    if not router.allow_migrate_model(using, Material):
+        return
+    if Material._meta.db_table not in conexion.introspection.table_names():
+        return
+    if conexion.vendor == 'sqlite' and indice_completo(conexion):
+        return
+    with conexion.schema_editor() as schema_editor:
+        crear_indice(schema_editor)
+
+
+def borrar_indice(schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'sqlite': SQLITE_BORRAR, 'postgresql': POSTGRES_BORRAR}.get(vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+class BusquedaFilter(filters.SearchFilter):
+    # Reemplaza el LIKE '%...%' de SearchFilter por el índice de texto completo.
+    # Sin ?ordering= explícito, los resultados salen por relevancia.
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '')
+        if not terminos(texto):
+            return queryset
+        queryset = buscar(queryset, texto)
+        if 'relevancia' in queryset.query.annotations and not request.query_params.get('ordering'):
+            queryset = queryset.order_by('relevancia', '-fecha_creacion')
+        return queryset
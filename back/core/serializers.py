@@ -1,7 +1,9 @@
 from rest_framework import serializers
-import requests
+from django.conf import settings
 from django.db import models
-from .models import CustomUser, Material, Favorito, Comentario, Calificacion
+from .models import CustomUser, Material, Favorito, Comentario, Calificacion, SubidaFragmentada, EstadisticasUsuario
+from .thumbnails import ANCHOS_MINIATURA
+from .recaptcha import CaptchaNoDisponible, RecaptchaNoDisponible, verificador
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,12 +24,12 @@ class RegisterSerializer(serializers.ModelSerializer):
         recaptcha_secret = getattr(settings, 'RECAPTCHA_SECRET_KEY', None)
         if not recaptcha_secret:
             raise serializers.ValidationError("Captcha: Clave secreta no configurada.")
-        url = 'https://www.google.com/recaptcha/api/siteverify'
-        data = {'secret': recaptcha_secret, 'response': value}
-        response = requests.post(url, data=data)
-        result = response.json()
-
-        if not result.get('success'):
+        request = self.context.get('request')
+        try:
+            valido = verificador().verificar(value, ip=request.META.get('REMOTE_ADDR') if request else None)
+        except RecaptchaNoDisponible:
+            raise CaptchaNoDisponible()
+        if not valido:
             raise serializers.ValidationError("Captcha inválido. Intenta de nuevo.")
         return value
 
@@ -80,11 +82,16 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'email', 'date_joined', 'statistics', 'recent_activity']
 
     def get_statistics(self, obj):
+        # Contadores precalculados (EstadisticasUsuario); sin actividad aún no hay fila
+        try:
+            estadisticas = obj.estadisticas
+        except EstadisticasUsuario.DoesNotExist:
+            estadisticas = EstadisticasUsuario()
         return {
-            'materialsUploaded': obj.materiales.count(),
-            'favorites': obj.favoritos.count(),
-            'comments': Comentario.objects.filter(usuario=obj).count(),
-            'ratings': Calificacion.objects.filter(usuario=obj).count(),
+            'materialsUploaded': estadisticas.materiales,
+            'favorites': estadisticas.favoritos,
+            'comments': estadisticas.comentarios,
+            'ratings': estadisticas.calificaciones,
         }
 
     def get_recent_activity(self, obj):
@@ -93,10 +100,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
                 obj.materiales.all().order_by('-fecha_creacion')[:3], many=True
             ).data,
             'comments': RecentComentarioSerializer(
-                Comentario.objects.filter(usuario=obj).order_by('-fecha')[:3], many=True
+                Comentario.objects.filter(usuario=obj).select_related('material').order_by('-fecha')[:3], many=True
             ).data,
             'ratings': RecentCalificacionSerializer(
-                Calificacion.objects.filter(usuario=obj).order_by('-fecha')[:3], many=True
+                Calificacion.objects.filter(usuario=obj).select_related('material').order_by('-fecha')[:3], many=True
             ).data,
         }
 
@@ -110,18 +117,29 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
 #---------------------------Material----------------------
 
 from rest_framework import serializers
+from django.core.files.base import ContentFile
 from .models import Material
+from functools import partial
 import base64
+import binascii
 
 class MaterialSerializer(serializers.ModelSerializer):
     # ARCHIVO PRINCIPAL
     archivo_blob = serializers.CharField(write_only=True, required=False, help_text="Archivo codificado en base64")
+    archivo = serializers.FileField(write_only=True, required=False, help_text="Archivo por multipart/form-data")
+    subida = serializers.PrimaryKeyRelatedField(
+        queryset=SubidaFragmentada.objects.all(), write_only=True, required=False,
+        help_text="Id de una subida por partes ya completa",
+    )
     archivo_nombre = serializers.CharField(required=False, allow_blank=True)
     archivo_tipo = serializers.CharField(required=False, allow_blank=True)
     archivo_url = serializers.SerializerMethodField(read_only=True)
+    archivo_size = serializers.IntegerField(read_only=True)
 
     # MINIATURA (solo lectura, nunca la sube el usuario)
     thumbnail_url = serializers.SerializerMethodField(read_only=True)
+    thumbnail_status = serializers.CharField(read_only=True)
+    thumbnail_srcset = serializers.SerializerMethodField(read_only=True)
 
     # USUARIO Y CALIFICACIONES
     usuario = serializers.ReadOnlyField(source='usuario.email')
@@ -129,38 +147,76 @@ class MaterialSerializer(serializers.ModelSerializer):
     calificacion_promedio = serializers.SerializerMethodField()
     total_calificaciones = serializers.SerializerMethodField()
     mi_calificacion = serializers.SerializerMethodField()
+    mi_calificacion_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Material
         fields = [
             'id', 'titulo', 'descripcion',
-            'archivo_blob', 'archivo_nombre', 'archivo_tipo', 'archivo_url',
+            'archivo_blob', 'archivo', 'subida',
+            'archivo_nombre', 'archivo_tipo', 'archivo_url', 'archivo_size',
             'video_url', 'tipo',
             'usuario', 'usuario_nombre', 'fecha_creacion',
-            'calificacion_promedio', 'total_calificaciones', 'mi_calificacion',
-            'thumbnail_url',
+            'calificacion_promedio', 'total_calificaciones', 'mi_calificacion', 'mi_calificacion_id',
+            'thumbnail_url', 'thumbnail_srcset', 'thumbnail_status',
         ]
         read_only_fields = [
             'id', 'usuario', 'usuario_nombre', 'fecha_creacion',
-            'calificacion_promedio', 'total_calificaciones', 'mi_calificacion',
-            'archivo_url', 'thumbnail_url'
+            'calificacion_promedio', 'total_calificaciones', 'mi_calificacion', 'mi_calificacion_id',
+            'archivo_url', 'archivo_size', 'thumbnail_url', 'thumbnail_srcset', 'thumbnail_status'
         ]
 
+    def validate_archivo_blob(self, value):
+        # Se decodifica una sola vez; desde aquí el archivo viaja como File
+        try:
+            return ContentFile(base64.b64decode(value))
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError("El archivo no es base64 válido.")
+
+    def validate_subida(self, subida):
+        request = self.context.get('request')
+        if not request or subida.usuario_id != request.user.pk or not subida.completa:
+            raise serializers.ValidationError("La subida no existe o todavía no está completa.")
+        return subida
+
     def validate(self, data):
-        archivo_blob = data.get('archivo_blob', getattr(self.instance, 'archivo_blob', None))
+        archivo = data.pop('archivo', None)
+        if archivo is not None:
+            data['archivo_blob'] = archivo
+            data['archivo_nombre'] = data.get('archivo_nombre') or archivo.name
+            data['archivo_tipo'] = data.get('archivo_tipo') or archivo.content_type
+        subida = data.get('subida')
+        if subida is not None:
+            data['archivo_nombre'] = data.get('archivo_nombre') or subida.archivo_nombre
+            data['archivo_tipo'] = data.get('archivo_tipo') or subida.archivo_tipo
+
+        # Con la instancia basta el tamaño: el blob no se carga para validar
+        tiene_archivo = (
+            data.get('archivo_blob') is not None
+            or subida is not None
+            or getattr(self.instance, 'has_archivo', False)
+        )
         video_url = data.get('video_url', getattr(self.instance, 'video_url', None))
-        if not archivo_blob and not video_url:
+        if not tiene_archivo and not video_url:
             raise serializers.ValidationError("Debes subir un archivo (como base64) o ingresar una URL de video.")
         return data
 
+    def _guardar_con_subida(self, validated_data, guardar):
+        subida = validated_data.pop('subida', None)
+        if subida is None:
+            return guardar(validated_data)
+        with subida.abrir() as archivo:
+            validated_data['archivo_blob'] = archivo
+            material = guardar(validated_data)
+        subida.descartar()
+        return material
 
     def create(self, validated_data):
-        archivo_blob_b64 = validated_data.pop('archivo_blob', None)
-        if archivo_blob_b64:
-            validated_data['archivo_blob'] = base64.b64decode(archivo_blob_b64)
-        material = super().create(validated_data)
         # El thumbnail se genera automáticamente en la view (perform_create)
-        return material
+        return self._guardar_con_subida(validated_data, super().create)
+
+    def update(self, instance, validated_data):
+        return self._guardar_con_subida(validated_data, partial(super().update, instance))
 
     def to_representation(self, instance):
         ret = super().to_representation(instance)
@@ -170,36 +226,56 @@ class MaterialSerializer(serializers.ModelSerializer):
 
     def get_archivo_url(self, obj):
         request = self.context.get('request')
-        if obj.archivo_blob and request:
+        if obj.has_archivo and request:
             return request.build_absolute_uri(f'/api/materiales/{obj.id}/descargar/')
         return None
 
     def get_thumbnail_url(self, obj):
         request = self.context.get('request')
-        if obj.thumbnail_blob and request:
-            return request.build_absolute_uri(f'/api/materiales/{obj.id}/thumbnail/')
+        if obj.has_thumbnail and request:
+            return request.build_absolute_uri(f'/api/materiales/{obj.id}/thumbnail/?v={obj.thumbnail_version}')
         return None
 
+    def get_thumbnail_srcset(self, obj):
+        # Listo para <img srcset>: el navegador elige el ancho y el servidor el formato
+        url = self.get_thumbnail_url(obj)
+        if not url:
+            return None
+        return ', '.join(f'{url}&w={ancho} {ancho}w' for ancho in ANCHOS_MINIATURA)
+
+    # Si la vista anotó el queryset (with_ratings) se usan las anotaciones;
+    # si no (p. ej. justo después de crear), se consulta como antes.
     def get_calificacion_promedio(self, obj):
-        calificaciones = getattr(obj, 'calificaciones', None)
-        if calificaciones and calificaciones.exists():
-            promedio = calificaciones.aggregate(models.Avg('puntaje'))['puntaje__avg']
-            return round(promedio, 2)
-        return None
+        if hasattr(obj, 'calificacion_promedio'):
+            promedio = obj.calificacion_promedio
+        else:
+            promedio = obj.calificaciones.aggregate(models.Avg('puntaje'))['puntaje__avg']
+        return round(promedio, 2) if promedio is not None else None
 
     def get_total_calificaciones(self, obj):
-        calificaciones = getattr(obj, 'calificaciones', None)
-        return calificaciones.count() if calificaciones else 0
+        if hasattr(obj, 'total_calificaciones'):
+            return obj.total_calificaciones
+        return obj.calificaciones.count()
 
     def get_mi_calificacion(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            calificaciones = getattr(obj, 'calificaciones', None)
-            calificacion = calificaciones.filter(usuario=request.user).first() if calificaciones else None
+            if hasattr(obj, 'mi_calificacion'):
+                return obj.mi_calificacion
+            calificacion = obj.calificaciones.filter(usuario=request.user).first()
             if calificacion:
                 return calificacion.puntaje
         return None
 
+    def get_mi_calificacion_id(self, obj):
+        # Para editar la calificación propia (PUT /calificaciones/<id>/)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            if hasattr(obj, 'mi_calificacion_id'):
+                return obj.mi_calificacion_id
+            return obj.calificaciones.filter(usuario=request.user).values_list('id', flat=True).first()
+        return None
+
     def get_usuario_nombre(self, obj):
         if obj.usuario.first_name and obj.usuario.last_name:
             return f"{obj.usuario.first_name} {obj.usuario.last_name}"
@@ -208,6 +284,25 @@ class MaterialSerializer(serializers.ModelSerializer):
         return "Desconocido"
 
 
+#-----------------------Subidas por partes--------------------------
+
+class SubidaFragmentadaSerializer(serializers.ModelSerializer):
+    completa = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = SubidaFragmentada
+        fields = ['id', 'archivo_nombre', 'archivo_tipo', 'tamanio_total', 'recibido', 'completa', 'fecha_creacion']
+        read_only_fields = ['id', 'recibido', 'completa', 'fecha_creacion']
+
+    def validate_tamanio_total(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("El tamaño debe ser mayor que cero.")
+        maximo = getattr(settings, 'SUBIDA_TAMANIO_MAXIMO', 2 * 1024 ** 3)
+        if value > maximo:
+            raise serializers.ValidationError(f"El archivo supera el máximo de {maximo // 1024 ** 2} MB.")
+        return value
+
+
 #-----------------------Favoritos--------------------------
 
 class FavoritoSerializer(serializers.ModelSerializer):
@@ -1,34 +1,91 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Material
-from pdf2image import convert_from_bytes
-from io import BytesIO
+from .models import CustomUser, Material, Favorito, Comentario, Calificacion, ResumenCalificacion, EstadisticasUsuario
+from .authentication import invalidar_usuario
+from .cache import invalidar_catalogo_al_confirmar
+from .tasks import encolar
+from .thumbnails import soporta_miniatura
 
 @receiver(post_save, sender=Material)
-def generate_pdf_thumbnail(sender, instance, created, **kwargs):
-    # Solo para PDFs subidos, con blob, y si no hay thumbnail aún
-    if (
-        created and
-        instance.archivo_blob and
-        instance.archivo_tipo and
-        instance.archivo_tipo.lower() == 'application/pdf' and
-        not instance.thumbnail_blob
-    ):
-        try:
-            # Usar convert_from_bytes de pdf2image
-            images = convert_from_bytes(
-                instance.archivo_blob,
-                first_page=1,
-                last_page=1,
-                fmt='jpeg',
-                size=(400, 500)
-            )
-            if images:
-                thumb_io = BytesIO()
-                images[0].save(thumb_io, format='JPEG')
-                # Guardar miniatura en el campo BLOB y tipo en thumbnail_tipo
-                instance.thumbnail_blob = thumb_io.getvalue()
-                instance.thumbnail_tipo = "image/jpeg"
-                instance.save(update_fields=['thumbnail_blob', 'thumbnail_tipo'])
-        except Exception as e:
-            print("Error generating thumbnail:", e)
+def encolar_miniatura(sender, instance, created, **kwargs):
+    # Archivo nuevo o reemplazado sin miniatura propia: se genera en segundo plano
+    guardados = getattr(instance, '_blobs_guardados', set())
+    if 'archivo_blob' not in guardados or 'thumbnail_blob' in guardados:
+        return
+    if not instance.has_archivo or instance.has_thumbnail or not soporta_miniatura(instance.archivo_tipo):
+        return
+    instance.thumbnail_status = Material.THUMBNAIL_PENDIENTE
+    Material.objects.filter(pk=instance.pk).update(thumbnail_status=Material.THUMBNAIL_PENDIENTE)
+    encolar('generar_miniatura', material_id=instance.pk)
+
+
+@receiver(post_delete, sender=Material)
+def liberar_archivos_del_material(sender, instance, **kwargs):
+    digests = [instance.archivo_sha256, instance.thumbnail_sha256]
+    transaction.on_commit(lambda: Material.liberar_blobs(digests))
+
+
+@receiver(post_save, sender=Calificacion)
+def actualizar_resumen_al_guardar(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_puntaje_guardado', None)
+    material_anterior = getattr(instance, '_material_guardado', instance.material_id)
+    if created:
+        ResumenCalificacion.aplicar(instance.material_id, nuevo=instance.puntaje)
+    elif anterior is None:
+        # No sabemos el puntaje previo: se recalcula solo este material
+        ResumenCalificacion.reconstruir(material_ids=[instance.material_id])
+    elif material_anterior != instance.material_id:
+        ResumenCalificacion.aplicar(material_anterior, anterior=anterior)
+        ResumenCalificacion.aplicar(instance.material_id, nuevo=instance.puntaje)
+    else:
+        ResumenCalificacion.aplicar(instance.material_id, anterior=anterior, nuevo=instance.puntaje)
+    instance._puntaje_guardado = instance.puntaje
+    instance._material_guardado = instance.material_id
+
+
+@receiver(post_delete, sender=Calificacion)
+def actualizar_resumen_al_borrar(sender, instance, **kwargs):
+    anterior = getattr(instance, '_puntaje_guardado', None) or instance.puntaje
+    material_id = getattr(instance, '_material_guardado', instance.material_id)
+    ResumenCalificacion.aplicar(material_id, anterior=anterior)
+
+
+# Contadores por usuario: +1 al crear, -1 al borrar (también en borrados en cascada)
+CONTADOR_POR_MODELO = {
+    Material: 'materiales',
+    Favorito: 'favoritos',
+    Comentario: 'comentarios',
+    Calificacion: 'calificaciones',
+}
+
+
+def sumar_estadistica(sender, instance, created, **kwargs):
+    if created:
+        EstadisticasUsuario.aplicar(instance.usuario_id, **{CONTADOR_POR_MODELO[sender]: 1})
+
+
+def restar_estadistica(sender, instance, **kwargs):
+    EstadisticasUsuario.aplicar(instance.usuario_id, **{CONTADOR_POR_MODELO[sender]: -1})
+
+
+for modelo in CONTADOR_POR_MODELO:
+    post_save.connect(sumar_estadistica, sender=modelo, dispatch_uid=f'estadisticas_alta_{modelo.__name__}')
+    post_delete.connect(restar_estadistica, sender=modelo, dispatch_uid=f'estadisticas_baja_{modelo.__name__}')
+
+
+# El listado anónimo en caché (core.cache) depende de materiales y calificaciones
+def invalidar_catalogo(sender, **kwargs):
+    invalidar_catalogo_al_confirmar()
+
+
+for modelo in (Material, Calificacion):
+    post_save.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'catalogo_guardar_{modelo.__name__}')
+    post_delete.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'catalogo_borrar_{modelo.__name__}')
+
+
+# El usuario autenticado sale del caché (core.authentication)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidar_usuario_en_cache(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
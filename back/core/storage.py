@@ -0,0 +1,105 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import ContentFile, File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Cada archivo se guarda con su SHA-256 como nombre: subir dos veces el
+    # mismo contenido ocupa espacio una sola vez.
+    chunk_size = 64 * 1024
+
+    def name_for(self, digest):
+        return os.path.join(digest[:2], digest[2:4], digest)
+
+    def store(self, content):
+        # Acepta bytes o un archivo; lo escribe por bloques y devuelve (digest, tamaño)
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            content = ContentFile(bytes(content))
+        elif not isinstance(content, File):
+            content = File(content)
+
+        os.makedirs(self.location, exist_ok=True)
+        if hasattr(content, 'temporary_file_path') and getattr(content, 'sha256', None):
+            return self._store_hashed_upload(content)
+
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, prefix='.subida-')
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                for chunk in content.chunks(self.chunk_size):
+                    sha.update(chunk)
+                    size += len(chunk)
+                    destino.write(chunk)
+            digest = sha.hexdigest()
+            final_path = self.path(self.name_for(digest))
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def _store_hashed_upload(self, content):
+        # Subida multipart ya escrita en disco y con su hash: se mueve, sin copiarla
+        digest = content.sha256
+        final_path = self.path(self.name_for(digest))
+        if not os.path.exists(final_path):
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            file_move_safe(content.temporary_file_path(), final_path, allow_overwrite=True)
+            os.chmod(final_path, self.file_permissions_mode or 0o644)
+        return digest, content.size
+
+    def partial_path(self, upload_id):
+        return self.path(os.path.join('.subidas', f'{upload_id}.part'))
+
+    def open_digest(self, digest):
+        return self.open(self.name_for(digest), 'rb')
+
+    def read_digest(self, digest):
+        with self.open_digest(digest) as f:
+            return f.read()
+
+    def exists_digest(self, digest):
+        return self.exists(self.name_for(digest))
+
+    def delete_digest(self, digest):
+        self.delete(self.name_for(digest))
+        # Las variantes (miniaturas en otros tamaños) se derivan del digest
+        carpeta = self.path(os.path.dirname(self.variant_name(digest, 0, '')))
+        if os.path.isdir(carpeta):
+            for nombre in os.listdir(carpeta):
+                if nombre.startswith(f'{digest}-'):
+                    os.remove(os.path.join(carpeta, nombre))
+
+    def variant_name(self, digest, ancho, ext):
+        return os.path.join('.variantes', digest[:2], digest[2:4], f'{digest}-{ancho}.{ext}')
+
+    def store_variant(self, name, data):
+        # Escritura atómica: dos peticiones simultáneas pueden generarla a la vez
+        final_path = self.path(name)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), prefix='.variante-')
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                destino.write(data)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(data)
+
+
+def blob_storage():
+    return storages['blobs']
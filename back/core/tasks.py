@@ -0,0 +1,82 @@
+import socket
+import os
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+from .models import Tarea
+
+# Cola de trabajos en la base de datos. Cada tipo de tarea se registra con
+# @task('nombre') y `python manage.py run_worker` las va ejecutando.
+HANDLERS = {}
+
+BACKOFF_BASE = timedelta(seconds=30)
+# Una tarea "en_proceso" más vieja que esto se da por abandonada (worker caído)
+TIEMPO_MAXIMO = timedelta(minutes=10)
+
+
+def task(nombre, al_fallar=None):
+    def registrar(func):
+        HANDLERS[nombre] = (func, al_fallar)
+        return func
+    return registrar
+
+
+def encolar(nombre, max_intentos=3, **payload):
+    return Tarea.objects.create(tipo=nombre, payload=payload, max_intentos=max_intentos)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def reclamar_siguiente(worker=None):
+    # Toma la próxima tarea disponible; el UPDATE condicionado al estado evita
+    # que dos workers se queden con la misma.
+    ahora = timezone.now()
+    disponibles = Tarea.objects.filter(
+        models.Q(estado=Tarea.PENDIENTE, disponible_desde__lte=ahora)
+        | models.Q(estado=Tarea.EN_PROCESO, tomada_en__lt=ahora - TIEMPO_MAXIMO)
+    ).order_by('disponible_desde', 'id')
+    for candidata in disponibles.values('id', 'estado')[:10]:
+        tomadas = Tarea.objects.filter(id=candidata['id'], estado=candidata['estado']).update(
+            estado=Tarea.EN_PROCESO,
+            intentos=models.F('intentos') + 1,
+            tomada_en=ahora,
+            worker=worker or worker_id(),
+        )
+        if tomadas:
+            return Tarea.objects.get(id=candidata['id'])
+    return None
+
+
+def ejecutar(tarea):
+    handler, al_fallar = HANDLERS.get(tarea.tipo, (None, None))
+    try:
+        if handler is None:
+            raise LookupError(f"Tarea sin handler registrado: {tarea.tipo}")
+        handler(**tarea.payload)
+    except Exception as e:
+        tarea.ultimo_error = f"{type(e).__name__}: {e}"
+        if tarea.intentos >= tarea.max_intentos:
+            tarea.estado = Tarea.FALLIDA
+            if al_fallar is not None:
+                al_fallar(**tarea.payload)
+        else:
+            tarea.estado = Tarea.PENDIENTE
+            tarea.disponible_desde = timezone.now() + BACKOFF_BASE * (2 ** (tarea.intentos - 1))
+    else:
+        tarea.estado = Tarea.COMPLETADA
+    tarea.save(update_fields=['estado', 'ultimo_error', 'disponible_desde', 'fecha_actualizacion'])
+    return tarea
+
+
+def procesar_tareas(limite=None, worker=None):
+    procesadas = []
+    while limite is None or len(procesadas) < limite:
+        tarea = reclamar_siguiente(worker)
+        if tarea is None:
+            break
+        procesadas.append(ejecutar(tarea))
+    return procesadas
@@ -1,12 +1,66 @@
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from django.contrib.auth import get_user_model
 from unittest.mock import patch
 from rest_framework import status
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
 from .models import Material
 from .models import Favorito
 from .models import Comentario
+from .models import Calificacion
+from .models import ResumenCalificacion
+from .models import EstadisticasUsuario
+from .models import SubidaFragmentada
+from .models import Tarea
+from .models import CorreoPendiente
+from .tasks import encolar, procesar_tareas, task
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+import hashlib
+import re
+import io
+from django.core.management import call_command, CommandError
+from django.core.management.sql import emit_post_migrate_signal
+from io import StringIO
+from django.conf import settings
+from django.test import override_settings
+from .storage import blob_storage
+from .search import indice_completo
+from .cache import cache_catalogo, metricas
+from .correos import enviar_correos_pendientes
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.utils import timezone
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+import os
+import shutil
+import tempfile
 import base64
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Los archivos de los materiales van a un directorio temporal durante las pruebas.
+# El caché del catálogo sobrevive entre pruebas (no se revierte con la base de
+# datos), así que solo se activa en CacheCatalogoTests; lo mismo con los límites
+# de peticiones (LimitesDePeticionesTests).
+BLOBS_DIR = tempfile.mkdtemp(prefix='kiwcha-blobs-')
+_blobs_override = override_settings(STORAGES={
+    **settings.STORAGES,
+    'blobs': {'BACKEND': 'core.storage.ContentAddressedStorage', 'OPTIONS': {'location': BLOBS_DIR}},
+}, CATALOGO_CACHE_TIMEOUT=0, LIMITES_DE_PETICIONES={})
+
+def setUpModule():
+    _blobs_override.enable()
+
+def tearDownModule():
+    _blobs_override.disable()
+    shutil.rmtree(BLOBS_DIR, ignore_errors=True)
 
 # Prueba de Registro ---------------------------------------------------------------
 User = get_user_model()
@@ -102,6 +156,29 @@ class PerfilUsuarioTest(APITestCase):
         self.assertEqual(response.data['last_name'], 'Bravísima')
         print("El usuario puede editar su perfil.")
 
+    def test_estadisticas_y_actividad_en_consultas_constantes(self):
+        def contar():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(self.url)
+            return len(ctx.captured_queries), response
+
+        pocas, _ = contar()
+        otro = User.objects.create_user(email='otro-perfil@correo.com', password='x', is_verified=True)
+        for i in range(5):
+            material = Material.objects.create(titulo=f"M{i}", tipo="ficha", usuario=self.user)
+            Comentario.objects.create(material=material, usuario=self.user, texto="hola")
+            Calificacion.objects.create(material=material, usuario=self.user, puntaje=3)
+            Favorito.objects.create(material=material, usuario=self.user)
+            Comentario.objects.create(material=material, usuario=otro, texto="de otro")
+        muchas, response = contar()
+        self.assertEqual(pocas, muchas)
+        self.assertEqual(muchas, 4)
+        self.assertEqual(response.data['statistics'], {
+            'materialsUploaded': 5, 'favorites': 5, 'comments': 5, 'ratings': 5,
+        })
+        self.assertEqual(response.data['recent_activity']['comments'][0]['material_titulo'], "M4")
+        print("El perfil lee los contadores precalculados y hace una consulta por lista reciente.")
+
 
 # Peueba con los materiales ---------------------------------
 
@@ -154,7 +231,7 @@ class MaterialPDFTests(APITestCase):
             archivo_nombre="otro.pdf"
         )
         response = self.client.get(self.url)
-        titulos = [m['titulo'] for m in response.data]
+        titulos = [m['titulo'] for m in response.data['results']]
         self.assertIn("MíoPDF", titulos)
         self.assertNotIn("De otro PDF", titulos)
         print("Solo veo mis propios materiales PDF.")
@@ -255,7 +332,7 @@ class MaterialDownloadTests(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], "application/pdf")
         self.assertEqual(response['Content-Disposition'], 'attachment; filename="descargar.pdf"')
-        self.assertEqual(response.content, self.fake_pdf_bytes)
+        self.assertEqual(b''.join(response.streaming_content), self.fake_pdf_bytes)
         print("⬇Descarga correcta de mi propio material.")
 
     def test_descargar_material_de_otro(self):
@@ -270,6 +347,45 @@ class MaterialDownloadTests(APITestCase):
         self.assertEqual(response.status_code, 404)
         print("Descarga de material inexistente da 404.")
 
+    def test_descarga_por_rangos(self):
+        url = reverse('material-download', args=[self.material.pk])
+        total = len(self.fake_pdf_bytes)
+        response = self.client.get(url)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), total)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 2-5/{total}')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b''.join(response.streaming_content), self.fake_pdf_bytes[2:6])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(b''.join(response.streaming_content), self.fake_pdf_bytes[10:])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.fake_pdf_bytes[-4:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={total}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{total}')
+        print("Descarga parcial con Range (206/416) correcta.")
+
+    def test_descarga_delegada_al_servidor_web(self):
+        url = reverse('material-download', args=[self.material.pk])
+        with self.settings(DOWNLOAD_SENDFILE='x-sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['X-Sendfile'].endswith(self.material.archivo_sha256))
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="descargar.pdf"')
+
+        with self.settings(DOWNLOAD_SENDFILE='x-accel-redirect', DOWNLOAD_ACCEL_PREFIX='/protegido/'):
+            response = self.client.get(url)
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protegido/'))
+        self.assertTrue(response['X-Accel-Redirect'].endswith(self.material.archivo_sha256))
+        print("Modo X-Sendfile / X-Accel-Redirect sin enviar bytes desde Django.")
+
 # Prueba de Favoritos ---------------------
 
 class FavoritoTests(APITestCase):
@@ -378,7 +494,7 @@ class ComentarioTests(APITestCase):
         c2 = Comentario.objects.create(material=self.material, usuario=self.other_user, texto="Dos")
         url = self.url + f"?material={self.material.pk}"
         response = self.client.get(url)
-        textos = [c['texto'] for c in response.data]
+        textos = [c['texto'] for c in response.data['results']]
         self.assertIn("Uno", textos)
         self.assertIn("Dos", textos)
         print("Listado de comentarios de un material OK.")
@@ -419,3 +535,1710 @@ class ComentarioTests(APITestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("texto", response.data)
         print("No se puede crear comentario vacío.")
+
+
+# Listados sin blobs --------------------------------------
+
+class MaterialSinBlobsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="sinblob@correo.com", password="claveblob", is_verified=True
+        )
+        self.fake_pdf_bytes = b'%PDF-1.4 ' + b'x' * 1024
+        self.material = Material.objects.create(
+            titulo="Pesado", tipo="ficha", usuario=self.user,
+            archivo_blob=self.fake_pdf_bytes, archivo_tipo="application/pdf",
+            thumbnail_blob=b'png', thumbnail_tipo="image/png",
+        )
+
+    def assertSinBlobs(self, queries):
+        selects = [q['sql'] for q in queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNotIn('archivo_blob', sql)
+            self.assertNotIn('thumbnail_blob', sql)
+
+    def test_tamanios_derivados(self):
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.archivo_size, len(self.fake_pdf_bytes))
+        self.assertEqual(self.material.thumbnail_size, 3)
+        self.assertTrue(self.material.has_archivo)
+        self.assertTrue(self.material.has_thumbnail)
+        print("Los tamaños de los blobs se guardan al crear el material.")
+
+    def test_listado_no_lee_blobs(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('material-list-create'))
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertIsNotNone(item['archivo_url'])
+        self.assertIsNotNone(item['thumbnail_url'])
+        self.assertEqual(item['archivo_size'], len(self.fake_pdf_bytes))
+        self.assertSinBlobs(ctx.captured_queries)
+        print("El listado de materiales no selecciona columnas blob.")
+
+    def test_detalle_y_edicion_no_leen_blobs(self):
+        url = reverse('material-detail', args=[self.material.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertSinBlobs(ctx.captured_queries)
+
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url, {"titulo": "Liviano"})
+        self.assertEqual(response.status_code, 200)
+        self.assertSinBlobs(ctx.captured_queries)
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.archivo_blob, self.fake_pdf_bytes)
+        self.assertEqual(self.material.archivo_size, len(self.fake_pdf_bytes))
+        print("Detalle y edición del material no seleccionan columnas blob.")
+
+    def test_reemplazar_archivo_actualiza_tamanio(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('material-detail', args=[self.material.pk])
+        nuevo = b'%PDF-1.4 nuevo'
+        response = self.client.patch(url, {"archivo_blob": base64.b64encode(nuevo).decode('utf-8')})
+        self.assertEqual(response.status_code, 200)
+        self.material.refresh_from_db()
+        self.assertEqual(bytes(self.material.archivo_blob), nuevo)
+        self.assertEqual(self.material.archivo_size, len(nuevo))
+        print("Reemplazar el archivo actualiza su tamaño.")
+
+
+# Calificaciones anotadas (sin N+1) --------------------------------------
+
+class MaterialCalificacionesAnotadasTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="anota@correo.com", password="claveanota", first_name="Ana", is_verified=True
+        )
+        self.votante = User.objects.create_user(
+            email="vota@correo.com", password="claveanota", is_verified=True
+        )
+        self.url = reverse('material-list-create')
+
+    def crear_materiales(self, n):
+        for i in range(n):
+            mat = Material.objects.create(
+                titulo=f"Material {i}", tipo="video", usuario=self.user,
+                video_url="https://example.com/video",
+            )
+            Calificacion.objects.create(usuario=self.user, material=mat, puntaje=4)
+            Calificacion.objects.create(usuario=self.votante, material=mat, puntaje=5)
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_listado_con_numero_constante_de_consultas(self):
+        self.crear_materiales(2)
+        pocas, _ = self.contar_consultas()
+        self.crear_materiales(20)
+        muchas, response = self.contar_consultas()
+        self.assertEqual(pocas, muchas)
+        self.assertEqual(muchas, 1)
+        self.assertEqual(len(response.data['results']), 20)
+        print("El listado anónimo usa una sola consulta sin importar el tamaño.")
+
+    def test_valores_anotados(self):
+        self.crear_materiales(3)
+        self.client.force_authenticate(self.user)
+        pocas, response = self.contar_consultas()
+        item = response.data['results'][0]
+        self.assertEqual(item['calificacion_promedio'], 4.5)
+        self.assertEqual(item['total_calificaciones'], 2)
+        self.assertEqual(item['mi_calificacion'], 4)
+        self.assertEqual(item['mi_calificacion_id'], Calificacion.objects.get(material_id=item['id'], usuario=self.user).pk)
+        self.assertEqual(item['usuario_nombre'], "Ana")
+        self.crear_materiales(10)
+        muchas, _ = self.contar_consultas()
+        self.assertEqual(pocas, muchas)
+        print("Promedio, total y mi calificación salen de la consulta anotada.")
+
+    def test_detalle_sin_calificaciones(self):
+        mat = Material.objects.create(
+            titulo="Sin votos", tipo="video", usuario=self.user,
+            video_url="https://example.com/video",
+        )
+        response = self.client.get(reverse('material-detail', args=[mat.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['calificacion_promedio'])
+        self.assertEqual(response.data['total_calificaciones'], 0)
+        self.assertIsNone(response.data['mi_calificacion'])
+        self.assertIsNone(response.data['mi_calificacion_id'])
+        print("Detalle de material sin calificaciones OK.")
+
+
+# Resumen de calificaciones --------------------------------------
+
+class ResumenCalificacionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="resumen@correo.com", password="claveresumen", is_verified=True
+        )
+        self.otro = User.objects.create_user(
+            email="resumen2@correo.com", password="claveresumen", is_verified=True
+        )
+        self.material = Material.objects.create(
+            titulo="Votado", tipo="video", usuario=self.user, video_url="https://example.com/a",
+        )
+        self.url = reverse('calificacion-list')
+
+    def resumen(self):
+        return ResumenCalificacion.objects.get(material=self.material)
+
+    def test_resumen_se_mantiene_por_api(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {"material": self.material.pk, "puntaje": 5})
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(self.otro)
+        response = self.client.post(self.url, {"material": self.material.pk, "puntaje": 2})
+        self.assertEqual(response.status_code, 201)
+        resumen = self.resumen()
+        self.assertEqual((resumen.total, resumen.suma, resumen.promedio), (2, 7, 3.5))
+        self.assertEqual(resumen.histograma, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        url = reverse('calificacion-detail', args=[response.data['id']])
+        response = self.client.put(url, {"material": self.material.pk, "puntaje": 4})
+        self.assertEqual(response.status_code, 200)
+        resumen = self.resumen()
+        self.assertEqual((resumen.total, resumen.suma, resumen.promedio), (2, 9, 4.5))
+        self.assertEqual(resumen.histograma, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        resumen = self.resumen()
+        self.assertEqual((resumen.total, resumen.suma, resumen.promedio), (1, 5, 5.0))
+
+        Calificacion.objects.filter(usuario=self.user).get().delete()
+        resumen = self.resumen()
+        self.assertEqual((resumen.total, resumen.suma), (0, 0))
+        self.assertIsNone(resumen.promedio)
+        print("El resumen de calificaciones se actualiza al crear, editar y borrar.")
+
+    def test_comando_detecta_y_corrige_desfase(self):
+        Calificacion.objects.create(usuario=self.user, material=self.material, puntaje=3)
+        call_command('rebuild_rating_summary', '--check', stdout=StringIO())
+        # Escritura masiva que no pasa por las señales
+        Calificacion.objects.update(puntaje=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rating_summary', '--check', stdout=StringIO())
+        self.assertEqual(self.resumen().suma, 3)
+        call_command('rebuild_rating_summary', stdout=StringIO())
+        resumen = self.resumen()
+        self.assertEqual((resumen.total, resumen.suma, resumen.promedio), (1, 1, 1.0))
+        self.assertEqual(resumen.histograma[1], 1)
+        call_command('rebuild_rating_summary', '--check', stdout=StringIO())
+        print("El comando rebuild_rating_summary detecta y corrige el desfase.")
+
+    def test_ordenar_por_promedio(self):
+        mejor = Material.objects.create(
+            titulo="Mejor", tipo="video", usuario=self.user, video_url="https://example.com/b",
+        )
+        Calificacion.objects.create(usuario=self.user, material=self.material, puntaje=2)
+        Calificacion.objects.create(usuario=self.user, material=mejor, puntaje=5)
+        response = self.client.get(reverse('material-list-create') + "?ordering=-calificacion_promedio")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['titulo'] for m in response.data['results']], ["Mejor", "Votado"])
+        self.assertEqual(response.data['results'][0]['calificacion_promedio'], 5.0)
+        print("Se puede ordenar /api/materiales/ por calificación promedio.")
+
+
+class EstadisticasUsuarioTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="contador@correo.com", password="clavecontador", is_verified=True
+        )
+        self.otro = User.objects.create_user(
+            email="contador2@correo.com", password="clavecontador", is_verified=True
+        )
+        self.material = Material.objects.create(
+            titulo="Contado", tipo="video", usuario=self.otro, video_url="https://example.com/c",
+        )
+
+    def contadores(self, usuario):
+        e = EstadisticasUsuario.objects.get(usuario=usuario)
+        return (e.materiales, e.favoritos, e.comentarios, e.calificaciones)
+
+    def test_contadores_se_mantienen_por_api(self):
+        self.client.force_authenticate(self.user)
+        favorito = self.client.post(reverse('favorito-list'), {"material": self.material.pk})
+        comentario = self.client.post(reverse('comentario-list'), {"material": self.material.pk, "texto": "hola"})
+        calificacion = self.client.post(reverse('calificacion-list'), {"material": self.material.pk, "puntaje": 4})
+        self.assertEqual([r.status_code for r in (favorito, comentario, calificacion)], [201, 201, 201])
+        self.assertEqual(self.contadores(self.user), (0, 1, 1, 1))
+
+        response = self.client.delete(reverse('comentario-detail', args=[comentario.data['id']]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.contadores(self.user), (0, 1, 0, 1))
+
+        # Borrar el material borra en cascada lo del otro usuario y descuenta todo
+        self.client.force_authenticate(self.otro)
+        response = self.client.delete(reverse('material-detail', args=[self.material.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.contadores(self.user), (0, 0, 0, 0))
+        self.assertEqual(self.contadores(self.otro), (0, 0, 0, 0))
+        print("Los contadores por usuario se actualizan al crear y borrar, también en cascada.")
+
+    def test_top_de_autores(self):
+        for i in range(3):
+            Material.objects.create(titulo=f"T{i}", tipo="video", usuario=self.user, video_url="https://example.com/t")
+        top = EstadisticasUsuario.objects.order_by('-materiales').values_list('usuario_id', 'materiales')
+        self.assertEqual(list(top), [(self.user.pk, 3), (self.otro.pk, 1)])
+        print("Las estadísticas se pueden ordenar para el top de autores.")
+
+    def test_comando_detecta_y_corrige_desfase(self):
+        call_command('rebuild_user_stats', '--check', stdout=StringIO())
+        # Altas masivas y un usuario sin fila: no pasan por las señales
+        Comentario.objects.bulk_create([
+            Comentario(material=self.material, usuario=self.user, texto=f"c{i}") for i in range(3)
+        ])
+        EstadisticasUsuario.objects.filter(usuario=self.otro).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_user_stats', '--check', stdout=StringIO())
+        self.assertFalse(EstadisticasUsuario.objects.filter(usuario=self.user).exists())
+        call_command('rebuild_user_stats', '--usuario', str(self.user.pk), stdout=StringIO())
+        self.assertEqual(self.contadores(self.user), (0, 0, 3, 0))
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.contadores(self.otro), (1, 0, 0, 0))
+        call_command('rebuild_user_stats', '--check', stdout=StringIO())
+        print("El comando rebuild_user_stats detecta y corrige el desfase.")
+
+
+# Almacenamiento de archivos por SHA-256 --------------------------------------
+
+class AlmacenamientoBlobsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="blobs@correo.com", password="claveblobs", is_verified=True
+        )
+        self.contenido = b'%PDF-1.4 contenido compartido'
+
+    def crear(self, titulo, contenido):
+        return Material.objects.create(
+            titulo=titulo, tipo="ficha", usuario=self.user,
+            archivo_blob=contenido, archivo_tipo="application/pdf",
+        )
+
+    def test_archivo_fuera_de_la_base(self):
+        mat = self.crear("Uno", self.contenido)
+        mat.refresh_from_db()
+        self.assertEqual(len(mat.archivo_sha256), 64)
+        self.assertTrue(blob_storage().exists_digest(mat.archivo_sha256))
+        self.assertEqual(mat.archivo_blob, self.contenido)
+        with mat.open_archivo() as f:
+            self.assertEqual(f.read(), self.contenido)
+        response = self.client.get(reverse('material-download', args=[mat.pk]))
+        self.assertEqual(b''.join(response.streaming_content), self.contenido)
+        print("El archivo se guarda fuera de la base y se descarga igual.")
+
+    def test_contenido_repetido_se_deduplica(self):
+        uno = self.crear("Uno", self.contenido)
+        dos = self.crear("Dos", self.contenido)
+        self.assertEqual(uno.archivo_sha256, dos.archivo_sha256)
+        archivos = [f for _, _, fs in os.walk(blob_storage().location) for f in fs]
+        self.assertEqual(archivos.count(uno.archivo_sha256), 1)
+        self.assertFalse([f for f in archivos if f.startswith('.subida-')])
+        print("Dos subidas idénticas comparten un solo archivo.")
+
+    def test_archivo_sin_uso_se_borra(self):
+        uno = self.crear("Uno", self.contenido)
+        dos = self.crear("Dos", self.contenido)
+        digest = uno.archivo_sha256
+        with self.captureOnCommitCallbacks(execute=True):
+            uno.delete()
+        self.assertTrue(blob_storage().exists_digest(digest))
+        with self.captureOnCommitCallbacks(execute=True):
+            dos.archivo_blob = b'%PDF-1.4 otro contenido'
+            dos.save()
+        self.assertFalse(blob_storage().exists_digest(digest))
+        self.assertTrue(blob_storage().exists_digest(dos.archivo_sha256))
+        print("Los archivos que ya nadie usa se borran del almacenamiento.")
+
+
+# Caché condicional (ETag / 304) --------------------------------------
+
+class DescargaCondicionalTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="etag@correo.com", password="claveetag", is_verified=True
+        )
+        self.material = Material.objects.create(
+            titulo="Con miniatura", tipo="ficha", usuario=self.user,
+            archivo_blob=b'%PDF-1.4 etag', archivo_tipo="application/pdf", archivo_nombre="etag.pdf",
+            thumbnail_blob=b'miniatura', thumbnail_tipo="image/png",
+        )
+        self.descarga = reverse('material-download', args=[self.material.pk])
+        self.miniatura = reverse('material-thumbnail', args=[self.material.pk])
+
+    def test_etag_y_304_sin_abrir_el_archivo(self):
+        response = self.client.get(self.descarga)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{self.material.archivo_sha256}"')
+        self.assertIn('Last-Modified', response)
+
+        with patch('core.storage.ContentAddressedStorage.open_digest') as abrir:
+            response = self.client.get(self.descarga, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(self.miniatura, HTTP_IF_NONE_MATCH=f'"{self.material.thumbnail_sha256}"')
+            self.assertEqual(response.status_code, 304)
+            abrir.assert_not_called()
+        self.assertEqual(response['ETag'], f'"{self.material.thumbnail_sha256}"')
+
+        response = self.client.get(self.descarga, HTTP_IF_NONE_MATCH='"otro"')
+        self.assertEqual(response.status_code, 200)
+        print("ETag fuerte y 304 sin leer el archivo.")
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.descarga)
+        response = self.client.get(self.descarga, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        print("If-Modified-Since responde 304.")
+
+    def test_miniatura_versionada_es_inmutable(self):
+        response = self.client.get(reverse('material-detail', args=[self.material.pk]))
+        url = response.data['thumbnail_url']
+        self.assertIn(f'?v={self.material.thumbnail_version}', url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(self.miniatura)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        print("La URL versionada de la miniatura se cachea como inmutable.")
+
+    def test_if_range_con_etag_distinto_envia_todo(self):
+        response = self.client.get(self.descarga, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"viejo"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.descarga, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=f'"{self.material.archivo_sha256}"'
+        )
+        self.assertEqual(response.status_code, 206)
+        print("If-Range solo respeta el rango si el ETag coincide.")
+
+
+# Subidas multipart y por partes --------------------------------------
+
+class DescargaAsgiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="asgi@correo.com", password="claveasgi", is_verified=True
+        )
+        self.contenido = bytes(range(256)) * 600  # ~150 KB: varios bloques
+        self.material = Material.objects.create(
+            titulo="Grande", tipo="ficha", usuario=self.user,
+            archivo_blob=self.contenido, archivo_tipo="application/pdf", archivo_nombre="grande.pdf",
+        )
+        self.descarga = reverse('material-download', args=[self.material.pk])
+
+    async def leer(self, response):
+        self.assertTrue(response.is_async)
+        return b''.join([parte async for parte in response.streaming_content])
+
+    async def test_descarga_con_iterador_asincrono(self):
+        response = await self.async_client.get(self.descarga)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(self.contenido))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="grande.pdf"')
+        self.assertEqual(await self.leer(response), self.contenido)
+
+        response = await self.async_client.get(self.descarga, headers={'Range': 'bytes=70000-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 70000-{len(self.contenido) - 1}/{len(self.contenido)}')
+        self.assertEqual(await self.leer(response), self.contenido[70000:])
+        print("Bajo ASGI la descarga (completa y por rangos) se envía con un iterador asíncrono.")
+
+    async def test_miniatura_y_errores_bajo_asgi(self):
+        response = await self.async_client.get(reverse('material-download', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse('material-thumbnail', args=[self.material.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "Este material no tiene miniatura."})
+        print("Las vistas asíncronas responden 404 en JSON como antes.")
+
+    def test_bajo_wsgi_se_usa_file_response(self):
+        response = self.client.get(self.descarga)
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response.streaming_content), self.contenido)
+        print("Bajo WSGI la descarga sigue usando FileResponse.")
+
+
+class SubidaMaterialTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="sube@correo.com", password="clavesube", is_verified=True
+        )
+        self.client.force_authenticate(self.user)
+        self.url = reverse('material-list-create')
+
+    def test_subida_multipart(self):
+        contenido = b'%PDF-1.4 multipart ' + b'x' * 200000
+        archivo = SimpleUploadedFile("guia.pdf", contenido, content_type="application/pdf")
+        response = self.client.post(self.url, {
+            "titulo": "Multipart", "tipo": "ficha", "archivo": archivo,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        mat = Material.objects.get(pk=response.data['id'])
+        self.assertEqual(mat.archivo_nombre, "guia.pdf")
+        self.assertEqual(mat.archivo_tipo, "application/pdf")
+        self.assertEqual(mat.archivo_sha256, hashlib.sha256(contenido).hexdigest())
+        self.assertEqual(mat.archivo_size, len(contenido))
+        self.assertEqual(mat.archivo_blob, contenido)
+        print("Subida multipart guardada con su hash.")
+
+    def test_subida_multipart_de_imagen_genera_miniatura(self):
+        imagen = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'purple').save(imagen, format='JPEG')
+        archivo = SimpleUploadedFile("foto.jpg", imagen.getvalue(), content_type="image/jpeg")
+        response = self.client.post(self.url, {
+            "titulo": "Foto", "tipo": "ficha", "archivo": archivo,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['thumbnail_status'], 'pendiente')
+        self.assertIsNone(response.data['thumbnail_url'])
+
+        procesar_tareas()
+        mat = Material.objects.get(pk=response.data['id'])
+        self.assertTrue(mat.has_thumbnail)
+        self.assertEqual(mat.thumbnail_status, Material.THUMBNAIL_LISTA)
+        self.assertEqual(Image.open(io.BytesIO(mat.thumbnail_blob)).size, (800, 600))
+        print("La miniatura se genera en el worker desde el archivo guardado.")
+
+    def test_base64_invalido(self):
+        response = self.client.post(self.url, {
+            "titulo": "Roto", "tipo": "ficha", "archivo_blob": "%%%no-es-base64",
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('archivo_blob', response.data)
+        print("Base64 inválido responde 400.")
+
+    def test_subida_por_partes_reanudable(self):
+        contenido = b'video-' * 5000
+        response = self.client.post(reverse('subida-create'), {
+            "archivo_nombre": "clase.mp4", "archivo_tipo": "video/mp4", "tamanio_total": len(contenido),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = reverse('subida-detail', args=[response.data['id']])
+        mitad = len(contenido) // 2
+
+        response = self.client.patch(url, contenido[:mitad], content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Upload-Offset'], str(mitad))
+
+        # Un offset viejo (p. ej. un reintento) no duplica datos
+        response = self.client.patch(url, contenido[:mitad], content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['recibido'], mitad)
+
+        response = self.client.get(url)
+        self.assertFalse(response.data['completa'])
+        response = self.client.patch(url, contenido[mitad:], content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET=str(mitad))
+        self.assertTrue(response.data['completa'])
+
+        subida = SubidaFragmentada.objects.get()
+        ruta = subida.ruta_parcial
+        # El hash se calculó con el último trozo; al crear el material el parcial se mueve
+        self.assertEqual(subida.sha256, hashlib.sha256(contenido).hexdigest())
+        inodo = os.stat(ruta).st_ino
+        response = self.client.post(self.url, {
+            "titulo": "Clase grabada", "tipo": "video", "subida": str(subida.pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        mat = Material.objects.get(pk=response.data['id'])
+        self.assertEqual(mat.archivo_nombre, "clase.mp4")
+        self.assertEqual(mat.archivo_sha256, hashlib.sha256(contenido).hexdigest())
+        self.assertEqual(os.stat(mat.archivo_path).st_ino, inodo)
+        self.assertFalse(SubidaFragmentada.objects.exists())
+        self.assertFalse(os.path.exists(ruta))
+        print("Subida por partes reanudable y creación del material.")
+
+    def test_subida_incompleta_o_ajena_no_sirve(self):
+        subida = SubidaFragmentada.objects.create(
+            usuario=self.user, archivo_nombre="a.mp4", tamanio_total=10,
+        )
+        response = self.client.post(self.url, {
+            "titulo": "Incompleta", "tipo": "video", "subida": str(subida.pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        otro = User.objects.create_user(email="ajeno@correo.com", password="x", is_verified=True)
+        self.client.force_authenticate(otro)
+        response = self.client.get(reverse('subida-detail', args=[subida.pk]))
+        self.assertEqual(response.status_code, 404)
+        print("No se puede usar una subida incompleta o ajena.")
+
+    def test_fragmento_con_offset_viejo_no_toca_el_archivo(self):
+        subida = SubidaFragmentada.objects.create(usuario=self.user, archivo_nombre="a.bin", tamanio_total=8)
+        # Dos peticiones leyeron la subida con recibido=0; la primera escribe
+        copia = SubidaFragmentada.objects.get(pk=subida.pk)
+        self.assertTrue(subida.agregar(io.BytesIO(b'AAAA'), 0, 4))
+        self.assertFalse(copia.agregar(io.BytesIO(b'BBBB'), 0, 4))
+        with open(subida.ruta_parcial, 'rb') as f:
+            self.assertEqual(f.read(), b'AAAA')
+        subida.descartar()
+        print("Un fragmento con offset viejo no pisa el archivo.")
+
+    def test_fragmento_mientras_otro_escribe(self):
+        import fcntl
+        subida = SubidaFragmentada.objects.create(usuario=self.user, archivo_nombre="a.bin", tamanio_total=8)
+        os.makedirs(os.path.dirname(subida.ruta_parcial), exist_ok=True)
+        # Otra petición tiene el flock del parcial: esta no espera ni escribe
+        with open(subida.ruta_parcial, 'wb') as otro:
+            fcntl.flock(otro, fcntl.LOCK_EX)
+            self.assertFalse(subida.agregar(io.BytesIO(b'BBBB'), 0, 4))
+        self.assertEqual(os.path.getsize(subida.ruta_parcial), 0)
+        self.assertTrue(subida.agregar(io.BytesIO(b'AAAA'), 0, 4))
+        subida.descartar()
+        print("Dos fragmentos de la misma subida no se escriben a la vez.")
+
+    @override_settings(SUBIDA_TAMANIO_MAXIMO=1024)
+    def test_subida_mayor_al_maximo(self):
+        response = self.client.post(reverse('subida-create'), {
+            "archivo_nombre": "enorme.mp4", "tamanio_total": 1025,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tamanio_total', response.data)
+        print("No se abre una subida mayor a SUBIDA_TAMANIO_MAXIMO.")
+
+    @override_settings(SUBIDA_EXPIRACION=3600)
+    def test_subidas_vencidas_se_borran(self):
+        vieja = SubidaFragmentada.objects.create(usuario=self.user, archivo_nombre="v.bin", tamanio_total=8)
+        vieja.agregar(io.BytesIO(b'1234'), 0, 4)
+        SubidaFragmentada.objects.filter(pk=vieja.pk).update(fecha_creacion=timezone.now() - timedelta(hours=2))
+        nueva = SubidaFragmentada.objects.create(usuario=self.user, archivo_nombre="n.bin", tamanio_total=8)
+        nueva.agregar(io.BytesIO(b'1234'), 0, 4)
+        # Un parcial viejo cuya fila ya no existe
+        huerfano = blob_storage().partial_path(uuid.uuid4())
+        with open(huerfano, 'wb') as f:
+            f.write(b'x')
+        os.utime(huerfano, (time.time() - 7200, time.time() - 7200))
+
+        response = self.client.get(reverse('subida-detail', args=[vieja.pk]))
+        self.assertEqual(response.status_code, 404)
+        call_command('purge_uploads', stdout=io.StringIO())
+        self.assertEqual(list(SubidaFragmentada.objects.all()), [nueva])
+        self.assertFalse(os.path.exists(vieja.ruta_parcial))
+        self.assertFalse(os.path.exists(huerfano))
+        self.assertTrue(os.path.exists(nueva.ruta_parcial))
+        nueva.descartar()
+        print("Las subidas vencidas y sus archivos se borran.")
+
+
+class ColaDeTareasTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="cola@correo.com", password="clavecola", is_verified=True
+        )
+
+    def _imagen(self):
+        imagen = io.BytesIO()
+        Image.new('RGB', (60, 40), 'green').save(imagen, format='PNG')
+        return imagen.getvalue()
+
+    def test_material_con_imagen_encola_una_sola_tarea(self):
+        mat = Material.objects.create(
+            titulo="Img", tipo="ficha", usuario=self.user,
+            archivo_blob=self._imagen(), archivo_nombre="a.png", archivo_tipo="image/png",
+        )
+        mat.refresh_from_db()
+        self.assertEqual(mat.thumbnail_status, Material.THUMBNAIL_PENDIENTE)
+        self.assertEqual(Tarea.objects.filter(tipo='generar_miniatura').count(), 1)
+
+        # Guardar otros campos no vuelve a encolar
+        mat.titulo = "Img 2"
+        mat.save()
+        self.assertEqual(Tarea.objects.count(), 1)
+
+        procesar_tareas()
+        mat.refresh_from_db()
+        self.assertEqual(Tarea.objects.get().estado, Tarea.COMPLETADA)
+        self.assertEqual(mat.thumbnail_status, Material.THUMBNAIL_LISTA)
+        self.assertTrue(mat.has_thumbnail)
+        print("Una imagen nueva encola su miniatura y el worker la genera.")
+
+    def test_material_sin_archivo_no_encola(self):
+        mat = Material.objects.create(titulo="Video", tipo="video", usuario=self.user,
+                                      video_url="https://youtu.be/abcdefghijk")
+        self.assertEqual(mat.thumbnail_status, Material.THUMBNAIL_NO_APLICA)
+        self.assertFalse(Tarea.objects.exists())
+        print("Sin archivo no hay tarea de miniatura.")
+
+    def test_reintentos_con_backoff_y_fallo_definitivo(self):
+        fallidas = []
+
+        @task('prueba_falla', al_fallar=lambda **payload: fallidas.append(payload))
+        def falla(**payload):
+            raise ValueError("roto")
+
+        tarea = encolar('prueba_falla', max_intentos=2, dato=1)
+        procesar_tareas()
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.PENDIENTE)
+        self.assertEqual(tarea.intentos, 1)
+        self.assertIn("roto", tarea.ultimo_error)
+        self.assertGreater(tarea.disponible_desde, tarea.tomada_en)
+
+        # Durante el backoff no se vuelve a tomar
+        self.assertEqual(procesar_tareas(), [])
+
+        Tarea.objects.filter(pk=tarea.pk).update(disponible_desde=tarea.tomada_en)
+        procesar_tareas()
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.FALLIDA)
+        self.assertEqual(tarea.intentos, 2)
+        self.assertEqual(fallidas, [{'dato': 1}])
+        print("Las tareas fallidas se reintentan con backoff y luego quedan como fallidas.")
+
+    def test_miniatura_fallida_queda_marcada(self):
+        mat = Material.objects.create(
+            titulo="Rota", tipo="ficha", usuario=self.user,
+            archivo_blob=b'no soy una imagen', archivo_nombre="a.png", archivo_tipo="image/png",
+        )
+        Tarea.objects.update(max_intentos=1)
+        procesar_tareas()
+        mat.refresh_from_db()
+        self.assertEqual(Tarea.objects.get().estado, Tarea.FALLIDA)
+        self.assertEqual(mat.thumbnail_status, Material.THUMBNAIL_FALLIDA)
+        self.assertFalse(mat.has_thumbnail)
+        print("Si la miniatura no se puede generar, el material queda como fallida.")
+
+    def test_comando_run_worker_once(self):
+        Material.objects.create(
+            titulo="Img", tipo="ficha", usuario=self.user,
+            archivo_blob=self._imagen(), archivo_nombre="a.png", archivo_tipo="image/png",
+        )
+        out = StringIO()
+        call_command('run_worker', '--once', stdout=out)
+        self.assertIn("completada", out.getvalue())
+        self.assertEqual(Material.objects.get().thumbnail_status, Material.THUMBNAIL_LISTA)
+        print("run_worker --once procesa la cola y termina.")
+
+
+class MiniaturaMemoriaAcotadaTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="memoria@correo.com", password="clavememoria", is_verified=True
+        )
+
+    def subir(self, formato, content_type):
+        buf = io.BytesIO()
+        Image.new('RGB', (4000, 3000), 'orange').save(buf, format=formato)
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(
+                titulo=formato, tipo="ficha", usuario=self.user,
+                archivo_blob=buf.getvalue(), archivo_tipo=content_type,
+            )
+        # Sin reintentos: el error no depende del intento
+        Tarea.objects.update(max_intentos=1)
+        procesar_tareas()
+        material.refresh_from_db()
+        return material
+
+    @patch('core.thumbnails.MAX_PIXELES_DECODIFICADOS', 4_000_000)
+    def test_jpeg_se_decodifica_reducido(self):
+        # 12 MP en disco, pero draft() lo decodifica a 2000x1500 (3 MP)
+        material = self.subir('JPEG', 'image/jpeg')
+        self.assertEqual(material.thumbnail_status, Material.THUMBNAIL_LISTA)
+        self.assertEqual(Image.open(material.open_thumbnail()).size, (800, 600))
+        print("Los JPEG grandes se decodifican reducidos, por debajo del límite de píxeles.")
+
+    @patch('core.thumbnails.MAX_PIXELES_DECODIFICADOS', 4_000_000)
+    def test_imagen_que_supera_el_limite_falla_sin_decodificar(self):
+        material = self.subir('PNG', 'image/png')
+        self.assertEqual(material.thumbnail_status, Material.THUMBNAIL_FALLIDA)
+        self.assertFalse(material.has_thumbnail)
+        self.assertIn("demasiado grande", Tarea.objects.get(tipo='generar_miniatura').ultimo_error)
+        print("Una imagen por encima del límite de píxeles no se decodifica y la miniatura queda fallida.")
+
+
+class MiniaturaVariantesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="variantes@correo.com", password="clavevar", is_verified=True
+        )
+        imagen = io.BytesIO()
+        Image.effect_noise((1200, 900), 60).convert('RGB').save(imagen, format='JPEG', quality=95)
+        self.material = Material.objects.create(
+            titulo="Foto", tipo="ficha", usuario=self.user,
+            archivo_blob=imagen.getvalue(), archivo_nombre="foto.jpg", archivo_tipo="image/jpeg",
+        )
+        procesar_tareas()
+        self.material.refresh_from_db()
+        self.url = reverse('material-thumbnail', args=[self.material.pk])
+
+    def _imagen(self, response):
+        return Image.open(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_variante_webp_por_ancho(self):
+        response = self.client.get(self.url, {'w': 300}, HTTP_ACCEPT='image/webp,image/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('Accept', response['Vary'])
+        imagen = self._imagen(response)
+        self.assertEqual(imagen.format, 'WEBP')
+        # Se redondea al ancho estándar que cubre lo pedido
+        self.assertEqual(imagen.size, (320, 240))
+        self.assertLess(int(response['Content-Length']), self.material.thumbnail_size)
+        print("?w= entrega una variante WebP más liviana que la maestra.")
+
+    def test_sin_webp_se_envia_jpeg_y_se_reutiliza(self):
+        response = self.client.get(self.url, {'w': 160}, HTTP_ACCEPT='image/png')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(self._imagen(response).size, (160, 120))
+        etag = response['ETag']
+
+        storage = blob_storage()
+        nombre = storage.variant_name(self.material.thumbnail_sha256, 160, 'jpg')
+        self.assertTrue(storage.exists(nombre))
+        with patch('core.thumbnails.Image.open') as abrir:
+            response = self.client.get(self.url, {'w': 160}, HTTP_ACCEPT='image/png')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(self.url, {'w': 160}, HTTP_ACCEPT='image/png', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+        abrir.assert_not_called()
+        print("Sin soporte WebP se usa JPEG y la variante se genera una sola vez.")
+
+    def test_ancho_invalido(self):
+        for ancho in ('grande', '²', '0', '-5'):
+            response = self.client.get(self.url, {'w': ancho})
+            self.assertEqual(response.status_code, 400, ancho)
+        print("Un ancho inválido responde 400.")
+
+    def test_srcset_en_el_serializer(self):
+        response = self.client.get(reverse('material-detail', args=[self.material.pk]))
+        srcset = response.data['thumbnail_srcset']
+        self.assertIn(f'?v={self.material.thumbnail_version}&w=160 160w', srcset)
+        self.assertIn('&w=800 800w', srcset)
+        print("El serializer entrega un srcset con todos los anchos.")
+
+    def test_variantes_se_borran_con_la_miniatura(self):
+        self.client.get(self.url, {'w': 160}, HTTP_ACCEPT='image/webp')
+        storage = blob_storage()
+        nombre = storage.variant_name(self.material.thumbnail_sha256, 160, 'webp')
+        self.assertTrue(storage.exists(nombre))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.material.delete()
+        self.assertFalse(storage.exists(nombre))
+        print("Al liberar la miniatura también se borran sus variantes.")
+
+
+class BusquedaMaterialTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="busca@correo.com", password="clavebusca", is_verified=True
+        )
+        crear = lambda titulo, descripcion: Material.objects.create(
+            titulo=titulo, descripcion=descripcion, tipo="ficha", usuario=self.user
+        )
+        self.cancion = crear("Canción de cuna en Kichwa", "Letra y audio")
+        self.numeros = crear("Números del 1 al 10", "Ficha para aprender a contar en kichwa")
+        self.otro = crear("Colores", "Presentación de colores")
+        self.url = reverse('material-list-create')
+
+    def _buscar(self, texto, **extra):
+        response = self.client.get(self.url, {'search': texto, **extra})
+        self.assertEqual(response.status_code, 200)
+        return [m['id'] for m in response.data['results']]
+
+    def test_sin_tildes_y_por_prefijo(self):
+        self.assertEqual(self._buscar("cancion"), [self.cancion.id])
+        self.assertEqual(self._buscar("NÚMEROS"), [self.numeros.id])
+        self.assertEqual(self._buscar("presenta"), [self.otro.id])
+        print("La búsqueda ignora tildes/mayúsculas y acepta prefijos.")
+
+    def test_ranking_titulo_antes_que_descripcion(self):
+        self.assertEqual(self._buscar("kichwa"), [self.cancion.id, self.numeros.id])
+        # Un ?ordering= explícito manda sobre la relevancia
+        self.assertEqual(self._buscar("kichwa", ordering='-titulo'), [self.numeros.id, self.cancion.id])
+        print("Los resultados salen ordenados por relevancia.")
+
+    def test_indice_sigue_a_los_cambios(self):
+        self.otro.titulo = "Colores en Kichwa"
+        self.otro.save()
+        self.assertIn(self.otro.id, self._buscar("kichwa"))
+        self.cancion.delete()
+        self.assertNotIn(self.cancion.id, self._buscar("kichwa"))
+        self.assertEqual(self._buscar("cuna"), [])
+        print("El índice se actualiza al guardar y borrar materiales.")
+
+    def test_operadores_no_rompen_la_consulta(self):
+        for texto in ['"kichwa', 'kichwa*', 'NOT colores', 'a OR b', 'titulo:x', '-(', '   ']:
+            self._buscar(texto)
+        self.assertEqual(len(self._buscar('"kichwa')), 2)
+        print("Comillas y operadores del usuario no rompen la búsqueda.")
+
+
+class IndiceTrasMigracionTests(APITransactionTestCase):
+    # Sin la transacción de APITestCase: el schema editor de SQLite no corre dentro de una
+
+    def test_indice_sobrevive_a_reconstruir_la_tabla(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Solo SQLite reconstruye la tabla en un ALTER")
+        user = User.objects.create_user(email="migra@correo.com", password="x", is_verified=True)
+        # Lo que hace una migración que SQLite no puede aplicar con un ALTER simple
+        with connection.schema_editor() as schema_editor:
+            schema_editor._remake_table(Material)
+        self.assertFalse(indice_completo(connection))
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertTrue(indice_completo(connection))
+
+        material = Material.objects.create(titulo="Después de migrar", tipo="ficha", usuario=user)
+        response = self.client.get(reverse('material-list-create'), {'search': 'migrar'})
+        self.assertEqual([m['id'] for m in response.data['results']], [material.id])
+        print("La búsqueda sigue funcionando después de una migración que reconstruye la tabla.")
+
+
+class PaginacionKeysetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="pagina@correo.com", password="clavepag", is_verified=True
+        )
+        Material.objects.bulk_create([
+            Material(titulo=f"Material {i:02d}", tipo="ficha", usuario=self.user) for i in range(45)
+        ])
+        # Muchos con la misma fecha: el id desempata
+        Material.objects.filter(pk__lte=Material.objects.order_by('pk')[20].pk).update(
+            fecha_creacion=Material.objects.order_by('pk').first().fecha_creacion
+        )
+        self.url = reverse('material-list-create')
+
+    def _recorrer(self, url, clave='next'):
+        ids, paginas = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [m['id'] for m in response.data['results']]
+            url = response.data[clave]
+            paginas += 1
+        return ids, paginas
+
+    def test_recorre_todo_sin_repetir_ni_saltar(self):
+        ids, paginas = self._recorrer(self.url)
+        esperado = list(Material.objects.order_by('-fecha_creacion', '-pk').values_list('pk', flat=True))
+        self.assertEqual(ids, esperado)
+        self.assertEqual(paginas, 3)
+        print("La paginación por cursor recorre todo en orden, con empates de fecha.")
+
+    def test_volver_hacia_atras(self):
+        primera = self.client.get(self.url).data
+        segunda = self.client.get(primera['next']).data
+        self.assertIsNone(primera['previous'])
+        vuelta = self.client.get(segunda['previous']).data
+        self.assertEqual([m['id'] for m in vuelta['results']], [m['id'] for m in primera['results']])
+        self.assertIsNone(vuelta['previous'])
+        self.assertIsNotNone(vuelta['next'])
+        print("El cursor anterior devuelve exactamente la página previa.")
+
+    def test_cursor_estable_con_inserciones(self):
+        primera = self.client.get(self.url).data
+        Material.objects.create(titulo="Nuevo", tipo="ficha", usuario=self.user)
+        segunda = self.client.get(primera['next']).data
+        vistos = {m['id'] for m in primera['results']}
+        self.assertFalse(vistos & {m['id'] for m in segunda['results']})
+        self.assertEqual(len(segunda['results']), 20)
+        print("Un material nuevo no desplaza ni repite resultados en el cursor.")
+
+    def test_orden_por_promedio_con_nulos(self):
+        mejores = list(Material.objects.order_by('pk')[:3])
+        for puntaje, material in zip([5, 3, 4], mejores):
+            Calificacion.objects.create(material=material, usuario=self.user, puntaje=puntaje)
+        ids, _ = self._recorrer(self.url + '?ordering=-calificacion_promedio&page_size=7')
+        self.assertEqual(ids[:3], [mejores[0].pk, mejores[2].pk, mejores[1].pk])
+        self.assertEqual(sorted(ids), sorted(Material.objects.values_list('pk', flat=True)))
+        print("Con ?ordering= los nulos van al final y no se pierden filas.")
+
+    def test_tamanio_de_pagina_y_cursor_invalido(self):
+        response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 45)
+        response = self.client.get(self.url, {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'basura'}).status_code, 404)
+        # Cursores bien formados pero con valores del tipo equivocado
+        orden = ['fecha_creacion', 'pk']
+        for valores in (['no-es-fecha', 1], [timezone.now().isoformat(), 'x'], [[1, 2], 1], ['2024-01-01', {'a': 1}]):
+            datos = json.dumps({'o': orden, 'v': valores, 'a': False}).encode()
+            cursor = base64.urlsafe_b64encode(datos).decode().rstrip('=')
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 404, valores)
+        datos = json.dumps({'o': orden, 'v': 'ab', 'a': False}).encode()
+        cursor = base64.urlsafe_b64encode(datos).decode().rstrip('=')
+        self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 404)
+        # Un cursor de otro orden no se acepta
+        siguiente = self.client.get(self.url).data['next']
+        self.assertEqual(self.client.get(siguiente + '&ordering=titulo').status_code, 404)
+        print("El tamaño de página se limita y los cursores inválidos dan 404.")
+
+    def test_comentarios_paginados(self):
+        material = Material.objects.first()
+        Comentario.objects.bulk_create([
+            Comentario(material=material, usuario=self.user, texto=f"c{i}") for i in range(25)
+        ])
+        ids, paginas = self._recorrer(reverse('comentario-list') + f'?material={material.pk}')
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(paginas, 2)
+        print("Los comentarios también se paginan por cursor.")
+
+
+class PlanDeConsultasTests(APITestCase):
+    # Corre EXPLAIN QUERY PLAN sobre cada consulta de los endpoints más usados y
+    # falla si alguna recorre una tabla entera u ordena con un B-tree temporal.
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN QUERY PLAN es de SQLite")
+        self.user = User.objects.create_user(
+            email="plan@correo.com", password="claveplan", first_name="Plan", is_verified=True
+        )
+        self.material = Material.objects.create(titulo="Plan", tipo="ficha", usuario=self.user)
+        for i in range(3):
+            Material.objects.create(titulo=f"Otro {i}", tipo="video", usuario=self.user)
+        Comentario.objects.create(material=self.material, usuario=self.user, texto="Hola")
+        Calificacion.objects.create(material=self.material, usuario=self.user, puntaje=4)
+
+    def planes(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        resultado = []
+        with connection.cursor() as cursor:
+            for consulta in ctx.captured_queries:
+                sql = consulta['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                resultado.append((sql, [fila[-1] for fila in cursor.fetchall()]))
+        return response, resultado
+
+    def assertSinEscaneos(self, url, params=None):
+        response, planes = self.planes(url, params)
+        for sql, detalles in planes:
+            for detalle in detalles:
+                escaneo = re.fullmatch(r'SCAN (\w+)', detalle)
+                self.assertFalse(escaneo, f"Recorre {detalle[5:]} entera:\n{sql}\n{detalles}")
+                self.assertNotIn('TEMP B-TREE', detalle, f"Ordena sin índice:\n{sql}\n{detalles}")
+        return response
+
+    def test_listados_de_materiales(self):
+        url = reverse('material-list-create')
+        response = self.assertSinEscaneos(url, {'page_size': 2})
+        self.assertSinEscaneos(response.data['next'])
+        self.assertSinEscaneos(url, {'tipo': 'video'})
+        self.assertSinEscaneos(url, {'usuario': self.user.pk})
+        self.client.force_authenticate(self.user)
+        self.assertSinEscaneos(url)
+        self.assertSinEscaneos(reverse('material-detail', args=[self.material.pk]))
+        print("Los listados de materiales usan índices, sin escaneos ni ordenamientos.")
+
+    def test_comentarios_y_calificaciones_por_material(self):
+        self.assertSinEscaneos(reverse('comentario-list'), {'material': self.material.pk})
+        self.assertSinEscaneos(reverse('calificacion-list'), {'material': self.material.pk})
+        print("Comentarios y calificaciones por material usan índices.")
+
+    def test_perfil(self):
+        self.client.force_authenticate(self.user)
+        self.assertSinEscaneos(reverse('profile'))
+        print("El perfil usa índices para estadísticas y actividad reciente.")
+
+
+@override_settings(CATALOGO_CACHE_TIMEOUT=300)
+class CacheCatalogoTests(APITestCase):
+    def setUp(self):
+        cache_catalogo().clear()
+        self.user = User.objects.create_user(
+            email="cache@correo.com", password="clavecache", is_verified=True
+        )
+        self.material = Material.objects.create(
+            titulo="En caché", tipo="video", usuario=self.user, video_url="https://example.com/c",
+        )
+        self.url = reverse('material-list-create')
+
+    def test_segunda_lectura_anonima_sale_del_cache(self):
+        primera = self.client.get(self.url, {'tipo': 'video', 'ordering': 'titulo'})
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        # Mismos parámetros en otro orden y con uno vacío: misma clave
+        with CaptureQueriesContext(connection) as ctx:
+            segunda = self.client.get(self.url + '?ordering=titulo&search=&tipo=video')
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(segunda.data, primera.data)
+        self.assertEqual(self.client.get(self.url, {'tipo': 'ficha'})['X-Cache'], 'MISS')
+        self.assertEqual((metricas()['aciertos'], metricas()['fallos']), (1, 2))
+        print("El listado anónimo se sirve del caché sin consultas a la base de datos.")
+
+    def test_escrituras_invalidan_el_cache(self):
+        self.client.get(self.url)
+        Material.objects.create(titulo="Nuevo", tipo="video", usuario=self.user, video_url="https://example.com/n")
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([m['titulo'] for m in response.data['results']], ["Nuevo", "En caché"])
+
+        Calificacion.objects.create(usuario=self.user, material=self.material, puntaje=4)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][1]['calificacion_promedio'], 4.0)
+
+        self.material.delete()
+        response = self.client.get(self.url)
+        self.assertEqual([m['titulo'] for m in response.data['results']], ["Nuevo"])
+        print("Crear o borrar materiales y calificaciones invalida el catálogo en caché.")
+
+    def test_usuario_autenticado_no_usa_cache(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(metricas()['fallos'], 0)
+        print("Las lecturas autenticadas no pasan por el caché.")
+
+    def test_comando_cache_stats(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertIn("Aciertos: 1  Fallos: 1  Tasa de aciertos: 50.0%", out.getvalue())
+        self.assertEqual(metricas()['aciertos'], 0)
+        print("El comando cache_stats muestra y reinicia las métricas.")
+
+
+class ImportarMaterialesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="curador@correo.com", password="clavecurador", is_verified=True
+        )
+        self.dir = tempfile.mkdtemp(prefix='kiwcha-import-')
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        os.makedirs(os.path.join(self.dir, 'unidad_1'))
+        for nombre, color in [('unidad_1/Colores_del_inti.png', 'red'), ('Animales.jpg', 'blue')]:
+            Image.new('RGB', (1200, 600), color).save(os.path.join(self.dir, nombre))
+        with open(os.path.join(self.dir, 'unidad_1', 'Saludos.pptx'), 'wb') as f:
+            f.write(b'PK\x03\x04 diapositivas')
+
+    def importar(self, origen, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_materials', origen, '--usuario', self.user.email, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_importa_directorio_con_miniaturas_en_procesos(self):
+        out, _ = self.importar(self.dir, '--workers', '1', '--batch-size', '2')
+        self.assertIn("3 importados, 0 omitidos", out)
+        self.assertRegex(out, r"archivos/s, [\d.]+ MB/s")
+        materiales = {m.titulo: m for m in Material.objects.filter(usuario=self.user)}
+        self.assertEqual(set(materiales), {"Colores del inti", "Animales", "Saludos"})
+        self.assertEqual(materiales["Saludos"].tipo, "presentacion")
+        self.assertEqual(materiales["Saludos"].thumbnail_status, Material.THUMBNAIL_NO_APLICA)
+        colores = materiales["Colores del inti"]
+        self.assertEqual((colores.tipo, colores.archivo_tipo), ("ficha", "image/png"))
+        self.assertEqual(colores.thumbnail_status, Material.THUMBNAIL_LISTA)
+        self.assertEqual(Image.open(colores.open_thumbnail()).size, (800, 400))
+        self.assertEqual(self.user.estadisticas.materiales, 3)
+        self.assertIn("Miniaturas: 2 generadas", out)
+        print("import_materials importa un directorio y genera las miniaturas en un pool de procesos.")
+
+    def test_reanuda_sin_duplicar(self):
+        self.importar(self.dir, '--workers', '0')
+        self.assertEqual(Tarea.objects.filter(tipo='generar_miniatura').count(), 2)
+        Image.new('RGB', (10, 10), 'green').save(os.path.join(self.dir, 'Nuevo.png'))
+        out, _ = self.importar(self.dir, '--workers', '0')
+        self.assertIn("1 importados, 3 omitidos", out)
+        self.assertEqual(Material.objects.filter(usuario=self.user).count(), 4)
+        print("import_materials se puede volver a ejecutar: solo importa lo que falta.")
+
+    def test_manifiesto_csv(self):
+        manifiesto = os.path.join(self.dir, 'manifiesto.csv')
+        with open(manifiesto, 'w', newline='', encoding='utf-8') as f:
+            f.write("archivo,titulo,descripcion,tipo,video_url\n")
+            f.write("Animales.jpg,Animales de la chakra,Ficha para colorear,ficha,\n")
+            f.write(",Canción del inti,,video,https://example.com/v\n")
+            f.write("no_existe.pdf,Perdido,,ficha,\n")
+        out, err = self.importar(manifiesto, '--workers', '0')
+        self.assertIn("2 importados, 0 omitidos (ya estaban), 1 con error", out)
+        self.assertIn("no_existe.pdf", err)
+        animales = Material.objects.get(titulo="Animales de la chakra")
+        self.assertEqual(animales.descripcion, "Ficha para colorear")
+        self.assertTrue(animales.has_archivo)
+        self.assertEqual(Material.objects.get(tipo='video').video_url, "https://example.com/v")
+        print("import_materials acepta un manifiesto CSV y reporta los archivos con error.")
+
+
+class ReconstruirMiniaturasTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="miniaturas@correo.com", password="claveminiatura", is_verified=True
+        )
+
+    def imagen(self, color, formato='PNG'):
+        buf = io.BytesIO()
+        Image.new('RGB', (1000, 500), color).save(buf, format=formato)
+        return buf.getvalue()
+
+    def crear(self, titulo, estado, **extra):
+        material = Material.objects.create(
+            titulo=titulo, tipo="ficha", usuario=self.user,
+            archivo_blob=self.imagen(titulo), archivo_tipo="image/png", **extra,
+        )
+        if 'thumbnail_blob' not in extra:
+            Material.objects.filter(pk=material.pk).update(thumbnail_status=estado)
+        material.refresh_from_db()
+        return material
+
+    def test_genera_las_que_faltan(self):
+        fallida = self.crear("red", Material.THUMBNAIL_FALLIDA)
+        sin_miniatura = self.crear("blue", Material.THUMBNAIL_NO_APLICA)
+        en_cola = self.crear("green", Material.THUMBNAIL_PENDIENTE)
+        # Pendiente sin tarea: el import que la marcó murió antes de encolarla
+        huerfana = self.crear("yellow", Material.THUMBNAIL_PENDIENTE)
+        Tarea.objects.filter(payload__material_id=huerfana.pk).delete()
+        out = StringIO()
+        call_command('rebuild_thumbnails', '--workers', '1', '--batch-size', '1', stdout=out)
+        self.assertIn("3 materiales sin miniatura", out.getvalue())
+        self.assertIn("3 procesados", out.getvalue())
+        for material in (fallida, sin_miniatura, huerfana):
+            material.refresh_from_db()
+            self.assertEqual(material.thumbnail_status, Material.THUMBNAIL_LISTA)
+            self.assertEqual(Image.open(material.open_thumbnail()).size, (800, 400))
+        en_cola.refresh_from_db()
+        self.assertFalse(en_cola.has_thumbnail)
+        print("rebuild_thumbnails genera en paralelo las miniaturas que faltan.")
+
+    def test_stale_reemplaza_miniaturas_png(self):
+        vieja = self.imagen("white")
+        material = self.crear("black", None, thumbnail_blob=vieja, thumbnail_tipo="image/png")
+        digest_viejo = material.thumbnail_sha256
+        out = StringIO()
+        call_command('rebuild_thumbnails', '--dry-run', stdout=out)
+        self.assertIn("0 materiales", out.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_thumbnails', '--stale', '--workers', '1', stdout=StringIO())
+        material.refresh_from_db()
+        self.assertEqual(material.thumbnail_tipo, "image/webp")
+        self.assertNotEqual(material.thumbnail_sha256, digest_viejo)
+        self.assertFalse(blob_storage().exists_digest(digest_viejo))
+        print("rebuild_thumbnails --stale reemplaza las miniaturas PNG y libera las viejas.")
+
+
+class BandejaDeCorreosTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="correo@correo.com", password="clavecorreo", first_name="Rosa", is_verified=True
+        )
+
+    @patch('core.serializers.RegisterSerializer.validate_recaptcha_token')
+    def test_registro_deja_el_correo_en_la_bandeja(self, mock_captcha):
+        mock_captcha.return_value = "dummy-token"
+        response = self.client.post(reverse('register'), {
+            "email": "nuevo@correo.com", "first_name": "Nina", "last_name": "Q",
+            "password": "superclave123", "recaptcha_token": "dummy-token",
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        # La petición no toca SMTP
+        self.assertEqual(len(mail.outbox), 0)
+        correo = CorreoPendiente.objects.get(destinatario="nuevo@correo.com")
+        self.assertEqual(correo.plantilla, 'verificacion')
+        self.assertIn("/verify-email/", correo.texto)
+        self.assertIn("Hola <b>Nina</b>", correo.html)
+
+        enviar_correos_pendientes()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Verifica tu cuenta en Kichwa Yachay')
+        self.assertEqual(mail.outbox[0].to, ["nuevo@correo.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoPendiente.ENVIADO)
+        self.assertIsNotNone(correo.fecha_envio)
+        print("El registro guarda el correo en la bandeja y el worker lo envía.")
+
+    def test_registro_fallido_no_deja_correo(self):
+        with patch('core.views.send_verification_email', side_effect=RuntimeError("plantilla")):
+            with patch('core.serializers.RegisterSerializer.validate_recaptcha_token', return_value="x"):
+                with self.assertRaises(RuntimeError):
+                    self.client.post(reverse('register'), {
+                        "email": "revertido@correo.com", "first_name": "R", "last_name": "R",
+                        "password": "superclave123", "recaptcha_token": "x",
+                    }, format='json')
+        self.assertFalse(User.objects.filter(email="revertido@correo.com").exists())
+        print("Usuario y correo se guardan en la misma transacción.")
+
+    def test_recuperacion_de_contrasena(self):
+        response = self.client.post(reverse('password-reset'), {"email": "correo@correo.com"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        enviar_correos_pendientes()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/reset-password/", mail.outbox[0].body)
+        self.assertTrue(mail.outbox[0].body.startswith("Hola Rosa,"))
+        print("La recuperación de contraseña también pasa por la bandeja.")
+
+    @override_settings(CORREOS_LOTE=2)
+    def test_una_conexion_por_lote(self):
+        from django.core.mail import get_connection
+        from .utils import send_password_reset_email
+        for _ in range(5):
+            send_password_reset_email(self.user, None)
+        with patch('core.correos.get_connection', wraps=get_connection) as conexiones:
+            procesados = enviar_correos_pendientes()
+        self.assertEqual(len(procesados), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(conexiones.call_count, 3)
+        print("Los correos se envían por lotes, una conexión SMTP por lote.")
+
+    def test_destinatario_rechazado_se_reintenta_sin_frenar_el_lote(self):
+        from .utils import send_password_reset_email
+        otro = User.objects.create_user(email="rebota@correo.com", password="x", is_verified=True)
+        rechazado = send_password_reset_email(otro, None)
+        bueno = send_password_reset_email(self.user, None)
+        CorreoPendiente.objects.filter(pk=rechazado.pk).update(max_intentos=2)
+
+        original = LocmemBackend.send_messages
+        def enviar(backend, mensajes):
+            if mensajes[0].to == ["rebota@correo.com"]:
+                raise SMTPRecipientsRefused({"rebota@correo.com": (550, b"no existe")})
+            return original(backend, mensajes)
+
+        with patch.object(LocmemBackend, 'send_messages', enviar):
+            enviar_correos_pendientes()
+            rechazado.refresh_from_db()
+            bueno.refresh_from_db()
+            self.assertEqual(bueno.estado, CorreoPendiente.ENVIADO)
+            self.assertEqual(rechazado.estado, CorreoPendiente.PENDIENTE)
+            self.assertIn("SMTPRecipientsRefused", rechazado.ultimo_error)
+            self.assertGreater(rechazado.disponible_desde, rechazado.tomado_en)
+
+            # Durante el backoff no se vuelve a tomar
+            self.assertEqual(enviar_correos_pendientes(), [])
+            CorreoPendiente.objects.filter(pk=rechazado.pk).update(disponible_desde=rechazado.tomado_en)
+            enviar_correos_pendientes()
+        rechazado.refresh_from_db()
+        self.assertEqual(rechazado.estado, CorreoPendiente.FALLIDO)
+        self.assertEqual(rechazado.intentos, 2)
+        self.assertEqual(len(mail.outbox), 1)
+        print("Un destinatario rechazado se reintenta con backoff sin frenar el lote.")
+
+    def test_servidor_caido_deja_el_lote_pendiente(self):
+        from .utils import send_password_reset_email
+        send_password_reset_email(self.user, None)
+        send_password_reset_email(self.user, None)
+        with patch.object(LocmemBackend, 'open', side_effect=SMTPServerDisconnected("caído")):
+            enviar_correos_pendientes()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(CorreoPendiente.objects.filter(estado=CorreoPendiente.PENDIENTE, intentos=1).count(), 2)
+
+        CorreoPendiente.objects.update(disponible_desde=timezone.now())
+        out = StringIO()
+        call_command('run_worker', '--once', stdout=out)
+        self.assertIn("Correos: 2 enviados", out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+        print("Si el servidor SMTP no responde, el lote espera y run_worker lo envía después.")
+
+
+class ConfiguracionBaseDeDatosTests(APITestCase):
+    def test_pragmas_de_sqlite(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Pragmas de SQLite")
+        with connection.cursor() as cursor:
+            pragmas = {
+                nombre: cursor.execute(f'PRAGMA {nombre}').fetchone()[0]
+                for nombre in ('synchronous', 'busy_timeout', 'temp_store')
+            }
+        # synchronous=NORMAL (1), temp_store=MEMORY (2)
+        self.assertEqual(pragmas, {'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        print("SQLite abre cada conexión con los pragmas de settings.")
+
+    def test_wal_en_archivo(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Pragmas de SQLite")
+        # Las pruebas usan una base en memoria; WAL solo aplica a un archivo
+        carpeta = tempfile.mkdtemp(prefix='kiwcha-wal-')
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        wrapper = type(connections['default'])({**connection.settings_dict, 'NAME': os.path.join(carpeta, 'a.sqlite3')})
+        try:
+            with wrapper.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        finally:
+            wrapper.close()
+        print("Una base SQLite en archivo queda en modo WAL.")
+
+
+# La "réplica" de las pruebas es la misma base (TEST MIRROR); se comprueba la decisión de cada petición
+@override_settings(DATABASE_REPLICAS=['default'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="replica@correo.com", password="clavereplica", is_verified=True
+        )
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.url = reverse('material-list-create')
+
+    def tearDown(self):
+        from django.core.cache import cache
+        cache.delete(f'replica:escritura:{self.user.pk}')
+
+    def test_router(self):
+        from .routers import ReplicaRouter, lectura_en_replica
+        router = ReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica_1']):
+            self.assertEqual(router.db_for_read(Material), 'default')
+            token = lectura_en_replica.set(True)
+            try:
+                # Las pruebas corren dentro de una transacción
+                self.assertEqual(router.db_for_read(Material), 'default')
+                with patch.object(connections['default'], 'in_atomic_block', False):
+                    self.assertEqual(router.db_for_read(Material), 'replica_1')
+                self.assertEqual(router.db_for_write(Material), 'default')
+            finally:
+                lectura_en_replica.reset(token)
+            self.assertFalse(router.allow_migrate('replica_1', 'core'))
+            self.assertIsNone(router.allow_migrate('default', 'core'))
+        print("El router manda las lecturas permitidas a la réplica y lo demás a la principal.")
+
+    def test_lecturas_anonimas_van_a_la_replica(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.wsgi_request.lectura_en_replica)
+        response = self.client.post(reverse('login'), {"email": self.user.email, "password": "x"}, format='json')
+        self.assertFalse(response.wsgi_request.lectura_en_replica)
+        print("Los GET anónimos leen de la réplica; los POST, de la principal.")
+
+    def test_quien_escribe_lee_de_la_principal(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.post(self.url, {
+            "titulo": "Recién subido", "tipo": "video", "video_url": "https://youtu.be/abcdefghijk",
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('kiwcha_escritura', response.cookies)
+
+        # Con la cookie
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.lectura_en_replica)
+        self.assertEqual(response.data['results'][0]['titulo'], "Recién subido")
+
+        # Sin cookie (otro cliente), por el user_id del JWT
+        otro = self.client_class()
+        otro.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertFalse(otro.get(self.url).wsgi_request.lectura_en_replica)
+        # Los demás siguen en la réplica
+        self.assertTrue(self.client_class().get(self.url).wsgi_request.lectura_en_replica)
+        print("Quien acaba de escribir lee de la principal, por cookie o por JWT.")
+
+    def test_escritura_rechazada_no_fija_la_principal(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.post(self.url, {"titulo": ""}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('kiwcha_escritura', response.cookies)
+        self.assertTrue(self.client.get(self.url).wsgi_request.lectura_en_replica)
+        print("Una escritura fallida no cambia de dónde se lee.")
+
+
+@override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+class AutenticacionJWTTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="jwt@correo.com", password="clavejwt", first_name="Killa", is_verified=True
+        )
+
+    def login(self):
+        response = self.client.post(reverse('login'), {"email": "jwt@correo.com", "password": "clavejwt"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def consultas_a_usuarios(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "core_customuser"' in q['sql']]
+
+    def test_login_sin_outstanding_token_y_con_claims(self):
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+        from rest_framework_simplejwt.tokens import AccessToken
+        tokens = self.login()
+        self.assertFalse(OutstandingToken.objects.exists())
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['email'], "jwt@correo.com")
+        self.assertEqual(access['first_name'], "Killa")
+        self.assertTrue(access['is_verified'])
+        print("El login no escribe en la base y el token lleva los datos del usuario.")
+
+    def test_usuario_autenticado_sale_del_cache(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        url = reverse('favorito-list')
+        self.consultas_a_usuarios(url)
+        self.assertEqual(self.consultas_a_usuarios(url), [])
+
+        # Al editar el perfil se borra del caché
+        response = self.client.patch(reverse('profile'), {"first_name": "Inti"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.consultas_a_usuarios(url)), 1)
+
+        # Y el siguiente access ya lleva el nombre nuevo
+        from rest_framework_simplejwt.tokens import AccessToken
+        response = self.client.post(reverse('token_refresh'), {"refresh": tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['first_name'], "Inti")
+        print("El usuario autenticado sale del caché y se invalida al editar el perfil.")
+
+    def test_usuario_inactivo_rechazado(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.consultas_a_usuarios(reverse('favorito-list'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('favorito-list')).status_code, 401)
+        print("Desactivar al usuario invalida su caché.")
+
+    def test_cache_sin_hash_de_contrasena(self):
+        from django.core.cache import cache
+        from .authentication import clave_usuario, usuario_en_cache
+        usuario_en_cache(self.user.pk)
+        guardado = cache.get(clave_usuario(self.user.pk))
+        self.assertNotIn('password', guardado)
+        self.assertEqual(guardado['email'], "jwt@correo.com")
+
+        # Un usuario armado desde el caché se puede guardar sin perder la contraseña
+        user = usuario_en_cache(self.user.pk)
+        self.assertIn('password', user.get_deferred_fields())
+        user.first_name = "Inti"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Inti")
+        self.assertTrue(self.user.check_password("clavejwt"))
+        print("El caché guarda solo los campos necesarios, sin el hash de la contraseña.")
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_timeout_cero_lee_de_la_base(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        url = reverse('favorito-list')
+        self.consultas_a_usuarios(url)
+        self.assertEqual(len(self.consultas_a_usuarios(url)), 1)
+        print("Con AUTH_USER_CACHE_TIMEOUT=0 el usuario se lee de la base en cada petición.")
+
+    def test_logout_pone_el_refresh_en_la_lista_negra(self):
+        tokens = self.login()
+        response = self.client.post(reverse('token_blacklist'), {"refresh": tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('token_refresh'), {"refresh": tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+        # La lista negra se consultó en el caché, no en la base
+        self.assertFalse([q for q in ctx.captured_queries if 'token_blacklist' in q['sql']])
+        print("Tras el logout el refresh ya no sirve; la lista negra se consulta en el caché.")
+
+    def test_purga_de_tokens_vencidos(self):
+        from datetime import timedelta
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        ahora = timezone.now()
+        vencido = OutstandingToken.objects.create(
+            jti="vencido", token="x", user=self.user, created_at=ahora - timedelta(days=2), expires_at=ahora - timedelta(days=1),
+        )
+        BlacklistedToken.objects.create(token=vencido)
+        OutstandingToken.objects.create(
+            jti="vigente", token="y", user=self.user, created_at=ahora, expires_at=ahora + timedelta(days=1),
+        )
+        out = StringIO()
+        call_command('run_worker', '--once', stdout=out)
+        self.assertIn("Tokens vencidos borrados: 1", out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ["vigente"])
+        self.assertFalse(BlacklistedToken.objects.exists())
+        print("run_worker borra los tokens vencidos.")
+
+
+@override_settings(LIMITES_DE_PETICIONES={
+    'login': {'ip': '5/min', 'email': '2/min'},
+    'recuperacion': {'ip': '10/hour', 'email': '1/hour'},
+})
+class LimitesDePeticionesTests(APITestCase):
+    def setUp(self):
+        from .throttling import cache_limites
+        cache_limites().clear()
+        self.user = User.objects.create_user(
+            email="limite@correo.com", password="clavelimite", is_verified=True
+        )
+
+    def login(self, email, password="mala"):
+        return self.client.post(reverse('login'), {"email": email, "password": password}, format='json')
+
+    def test_login_por_email_antes_del_hasher(self):
+        self.assertEqual(self.login("limite@correo.com").status_code, 400)
+        self.assertEqual(self.login("LIMITE@correo.com ").status_code, 400)
+        with patch('core.views.authenticate') as autenticar:
+            response = self.login("limite@correo.com", "clavelimite")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        autenticar.assert_not_called()
+        # Otra cuenta desde la misma IP todavía puede
+        self.assertEqual(self.login("otra@correo.com").status_code, 400)
+        print("El login se limita por email antes de verificar la contraseña.")
+
+    def test_login_por_ip(self):
+        for i in range(5):
+            self.assertEqual(self.login(f"ip{i}@correo.com").status_code, 400)
+        self.assertEqual(self.login("ip9@correo.com").status_code, 429)
+        # Otra IP no comparte el límite
+        response = self.client.post(reverse('login'), {"email": "ip9@correo.com", "password": "x"},
+                                    format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 400)
+        print("El login se limita por IP.")
+
+    def test_recuperacion_no_encola_correos_de_mas(self):
+        url = reverse('password-reset')
+        self.assertEqual(self.client.post(url, {"email": "limite@correo.com"}, format='json').status_code, 200)
+        self.assertEqual(self.client.post(url, {"email": "limite@correo.com"}, format='json').status_code, 429)
+        self.assertEqual(CorreoPendiente.objects.count(), 1)
+        print("La recuperación de contraseña no manda más de un correo por hora a la misma cuenta.")
+
+    def test_los_permisos_se_recuperan_de_a_poco(self):
+        from .throttling import consumir
+        clave = 'limite:prueba:ip:x'
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6000))
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6001))
+        self.assertAlmostEqual(consumir(clave, 2, 60, ahora=6002), 88)
+        # En la ventana siguiente los 2 permitidos pesan cada vez menos:
+        # a los 30 s ya queda un lugar, sin esperar a que se vacíe
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6090))
+        self.assertIsNotNone(consumir(clave, 2, 60, ahora=6091))
+        print("Los límites se recuperan de forma gradual, como un token bucket.")
+
+    def test_reintentar_bloqueado_no_alarga_la_espera(self):
+        from .throttling import consumir
+        clave = 'limite:prueba:ip:reintentos'
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6000))
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6001))
+        espera = consumir(clave, 2, 60, ahora=6002)
+        # El cliente insiste mientras está bloqueado, también pasado el cambio de
+        # ventana; la espera anunciada no cambia
+        for ahora in range(6003, 6090, 3):
+            restante = consumir(clave, 2, 60, ahora=ahora)
+            self.assertAlmostEqual(ahora + restante, 6002 + espera)
+        self.assertIsNone(consumir(clave, 2, 60, ahora=6002 + espera))
+        print("Los reintentos bloqueados no cuentan: pasado el Retry-After se vuelve a entrar.")
+
+    def test_sin_tasa_no_se_limita(self):
+        with override_settings(LIMITES_DE_PETICIONES={}):
+            for _ in range(5):
+                self.assertEqual(self.login("limite@correo.com").status_code, 400)
+        print("Sin tasa configurada no hay límite.")
+
+
+class StubRecaptcha(BaseHTTPRequestHandler):
+    # Servidor local en lugar de Google: el token decide la respuesta
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        datos = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.server.peticiones.append(datos)
+        self.server.conexiones.add(self.client_address)
+        token = datos['response'][0]
+        if token == 'lento':
+            time.sleep(1)
+        codigo = 500 if token == 'roto' else 200
+        cuerpo = json.dumps({'success': token in ('valido', 'lento')}).encode()
+        try:
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente ya se fue por el timeout
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class RecaptchaTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubRecaptcha)
+        cls.servidor.daemon_threads = True
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.servidor.peticiones = []
+        self.servidor.conexiones = set()
+        ajustes = override_settings(
+            RECAPTCHA_URL=f'http://127.0.0.1:{self.servidor.server_address[1]}/siteverify',
+            RECAPTCHA_SECRET_KEY='secreto', RECAPTCHA_TIMEOUT_LECTURA=0.3,
+            RECAPTCHA_CIRCUITO_FALLAS=2, RECAPTCHA_CIRCUITO_ESPERA=0.5,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def registrar(self, email, token):
+        return self.client.post(reverse('register'), {
+            "email": email, "first_name": "Sisa", "last_name": "T",
+            "password": "superclave123", "recaptcha_token": token,
+        }, format='json')
+
+    def test_registro_verifica_con_una_sesion_keep_alive(self):
+        self.assertEqual(self.registrar("cap1@correo.com", "valido").status_code, 201)
+        self.assertEqual(self.registrar("cap2@correo.com", "valido").status_code, 201)
+        self.assertEqual(self.registrar("cap3@correo.com", "invalido").status_code, 400)
+        self.assertEqual(len(self.servidor.peticiones), 3)
+        self.assertEqual(self.servidor.peticiones[0]['secret'], ['secreto'])
+        self.assertEqual(self.servidor.peticiones[0]['remoteip'], ['127.0.0.1'])
+        # Las tres verificaciones usaron la misma conexión
+        self.assertEqual(len(self.servidor.conexiones), 1)
+        print("El registro verifica el captcha reutilizando la conexión.")
+
+    def test_timeout_responde_503(self):
+        inicio = time.perf_counter()
+        response = self.registrar("lento@correo.com", "lento")
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(time.perf_counter() - inicio, 0.9)
+        self.assertFalse(User.objects.filter(email="lento@correo.com").exists())
+        print("Si reCAPTCHA no responde a tiempo, el registro falla rápido con 503.")
+
+    def test_circuito_se_abre_y_se_recupera(self):
+        from .recaptcha import RecaptchaNoDisponible, verificador
+        for _ in range(2):
+            with self.assertRaises(RecaptchaNoDisponible):
+                verificador().verificar('roto')
+        # Abierto: ni siquiera llama
+        with self.assertRaises(RecaptchaNoDisponible):
+            verificador().verificar('valido')
+        self.assertEqual(len(self.servidor.peticiones), 2)
+        self.assertEqual(self.registrar("circuito@correo.com", "valido").status_code, 503)
+
+        time.sleep(0.6)
+        self.assertTrue(verificador().verificar('valido'))
+        self.assertTrue(verificador().verificar('valido'))
+        self.assertEqual(len(self.servidor.peticiones), 4)
+        print("Tras varias fallas el circuito se abre y después de la espera vuelve a llamar.")
+
+    def test_error_inesperado_en_la_prueba_no_traba_el_circuito(self):
+        from .recaptcha import RecaptchaNoDisponible, verificador
+        for _ in range(2):
+            with self.assertRaises(RecaptchaNoDisponible):
+                verificador().verificar('roto')
+        time.sleep(0.6)
+        # La llamada de prueba (medio abierto) falla con algo que no es de requests
+        with patch.object(verificador().session, 'post', side_effect=RuntimeError("bug")):
+            with self.assertRaises(RuntimeError):
+                verificador().verificar('valido')
+        self.assertFalse(verificador().circuito.probando)
+        # Contó como falla: el circuito vuelve a abrirse y luego se recupera
+        with self.assertRaises(RecaptchaNoDisponible):
+            verificador().verificar('valido')
+        time.sleep(0.6)
+        self.assertTrue(verificador().verificar('valido'))
+        print("Un error inesperado en la llamada de prueba cuenta como falla y no deja el circuito trabado.")
+
+    def test_variante_async(self):
+        from asgiref.sync import async_to_sync
+        from .recaptcha import verificador
+        self.assertTrue(async_to_sync(verificador().averificar)('valido'))
+        self.assertFalse(async_to_sync(verificador().averificar)('invalido', ip='10.0.0.1'))
+        self.assertEqual(self.servidor.peticiones[1]['remoteip'], ['10.0.0.1'])
+        print("averificar verifica desde código async sin bloquear el event loop.")
@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+# Límites para login, registro y recuperación de contraseña, por IP y por email.
+# Cada vista declara su `throttle_scope` y LIMITES_DE_PETICIONES[scope] da la tasa
+# de cada clave ('5/min'); sin tasa no se limita. Se revisan en initial(), antes
+# de tocar la base o el hasher de contraseñas.
+#
+# Es un token bucket aproximado con dos contadores (ventana actual y anterior),
+# porque el caché de Django solo ofrece add/incr atómicos: los permisos se
+# recuperan de forma gradual a lo largo de la ventana, como en un bucket, y dos
+# procesos que comparten el caché (Redis) nunca pisan la cuenta del otro.
+
+PREFIJO = 'limite'
+PERIODOS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def cache_limites():
+    return caches[getattr(settings, 'LIMITES_CACHE_ALIAS', 'default')]
+
+
+def limites():
+    return getattr(settings, 'LIMITES_DE_PETICIONES', {})
+
+
+def parsear_tasa(tasa):
+    # '5/min' -> (5, 60)
+    cantidad, periodo = tasa.split('/')
+    return int(cantidad), PERIODOS[periodo.strip()[0]]
+
+
+def consumir(clave, capacidad, ventana, ahora=None):
+    # Devuelve None si se permite, o los segundos a esperar
+    ahora = time.time() if ahora is None else ahora
+    numero = int(ahora // ventana)
+    transcurrido = (ahora % ventana) / ventana
+    cache = cache_limites()
+    actual = f'{clave}:{numero}'
+    cache.add(actual, 0, timeout=ventana * 2)
+    try:
+        usados = cache.incr(actual)
+    except ValueError:
+        # Expiró entre add e incr
+        cache.set(actual, 1, timeout=ventana * 2)
+        usados = 1
+    anteriores = cache.get(f'{clave}:{numero - 1}', 0)
+    if anteriores * (1 - transcurrido) + usados <= capacidad:
+        return None
+    # Solo cuentan las peticiones permitidas: si no, un cliente que reintenta
+    # mientras está bloqueado alarga su propio bloqueo y el Retry-After miente.
+    try:
+        cache.decr(actual)
+    except ValueError:
+        pass
+    # Cuándo lo que queda de la ventana anterior deja lugar otra vez
+    if usados <= capacidad:
+        libre = 1 - (capacidad - usados) / anteriores
+        return max(libre - transcurrido, 0) * ventana
+    # La ventana actual está llena: en la siguiente pasa a ser la anterior
+    libre = 1 - (capacidad - 1) / (usados - 1)
+    return (1 - transcurrido + max(libre, 0)) * ventana
+
+class LimiteDePeticiones(BaseThrottle):
+    clave = None
+
+    def identificar(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.espera = None
+        scope = getattr(view, 'throttle_scope', None)
+        tasa = limites().get(scope, {}).get(self.clave)
+        if not tasa:
+            return True
+        identidad = self.identificar(request)
+        if not identidad:
+            return True
+        capacidad, ventana = parsear_tasa(tasa)
+        digest = hashlib.sha256(identidad.encode()).hexdigest()[:32]
+        self.espera = consumir(f'{PREFIJO}:{scope}:{self.clave}:{digest}', capacidad, ventana)
+        return self.espera is None
+
+    def wait(self):
+        return self.espera
+
+
+class LimitePorIP(LimiteDePeticiones):
+    clave = 'ip'
+
+    def identificar(self, request):
+        # Respeta NUM_PROXIES de DRF para X-Forwarded-For
+        return self.get_ident(request)
+
+
+class LimitePorEmail(LimiteDePeticiones):
+    # Frena el credential stuffing repartido entre muchas IPs contra una cuenta
+    clave = 'email'
+
+    def identificar(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower()
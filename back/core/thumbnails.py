@@ -0,0 +1,199 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from PIL import Image, features
+
+from .cache import invalidar_catalogo_al_confirmar
+from .models import Material
+from .storage import blob_storage
+from .tasks import task
+
+try:
+    from pdf2image import convert_from_path
+    PDF_SUPPORT = True
+except ImportError:
+    PDF_SUPPORT = False
+
+try:
+    import pillow_avif  # noqa: F401  (registra AVIF en Pillow < 11)
+except ImportError:
+    pass
+
+# La miniatura "maestra" se guarda una vez; las variantes de cada ancho se
+# derivan de ella la primera vez que alguien las pide (?w=).
+THUMBNAIL_SIZE = (800, 800)
+ANCHOS_MINIATURA = (160, 320, 480, 800)
+
+# Límites de memoria al decodificar (ver bench_thumbnail_memory):
+# los JPEG se decodifican ya reducidos (draft), y lo que igual habría que
+# decodificar completo no puede pasar de MAX_PIXELES_DECODIFICADOS
+# (40 MP en RGBA son ~160 MB). Los PDF se rasterizan solo en la primera
+# página, directamente al tamaño de la miniatura.
+MAX_PIXELES_DECODIFICADOS = 40_000_000
+PDF_DPI = 72
+PDF_TIMEOUT = 60
+
+# (formato de Pillow, extensión, content type, opciones), del más liviano al más compatible
+FORMATOS_VARIANTE = [
+    ('AVIF', 'avif', 'image/avif', {'quality': 60}),
+    ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+
+class ImagenDemasiadoGrande(ValueError):
+    pass
+
+
+def soporta_miniatura(archivo_tipo):
+    if not archivo_tipo:
+        return False
+    return archivo_tipo.startswith('image/') or (archivo_tipo == 'application/pdf' and PDF_SUPPORT)
+
+
+def generate_thumbnail(material):
+    # Único lugar donde se generan miniaturas (imágenes y primera página de PDF).
+    # Devuelve (bytes, content_type) o None si el tipo no se soporta.
+    if not material.has_archivo or not soporta_miniatura(material.archivo_tipo):
+        return None
+    return miniatura_de_archivo(material.archivo_path, material.archivo_tipo)
+
+
+def miniatura_de_archivo(ruta, archivo_tipo):
+    # Solo lee del disco, sin tocar la base de datos: sirve también en un
+    # pool de procesos (import_materials, rebuild_thumbnails)
+    if archivo_tipo.startswith('image/'):
+        # Image.open solo lee la cabecera (y rechaza las bombas de descompresión)
+        with Image.open(ruta) as image:
+            # JPEG: el decodificador reduce 1/2, 1/4 u 1/8 sin pasar por el tamaño
+            # completo; se pide el doble de la miniatura para no perder calidad
+            ancho, alto = image.size
+            escala = min(THUMBNAIL_SIZE[0] / ancho, THUMBNAIL_SIZE[1] / alto, 1)
+            image.draft(None, (round(ancho * escala * 2), round(alto * escala * 2)))
+            ancho, alto = image.size
+            if ancho * alto > MAX_PIXELES_DECODIFICADOS:
+                raise ImagenDemasiadoGrande(f"Imagen de {ancho}x{alto} demasiado grande para la miniatura.")
+            image.thumbnail(THUMBNAIL_SIZE)
+            return _maestra(image)
+
+    images = convert_from_path(
+        ruta, first_page=1, last_page=1, size=THUMBNAIL_SIZE, dpi=PDF_DPI,
+        thread_count=1, timeout=PDF_TIMEOUT,
+    )
+    return _maestra(images[0])
+
+
+def _maestra(image):
+    # La maestra va en WebP sin pérdida si Pillow lo soporta (pesa bastante menos que PNG)
+    if image.mode not in ('RGB', 'RGBA'):
+        con_alfa = image.mode in ('P', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if con_alfa else 'RGB')
+    output = io.BytesIO()
+    if features.check('webp'):
+        image.save(output, format='WEBP', lossless=True, method=4)
+        return output.getvalue(), 'image/webp'
+    image.save(output, format='PNG')
+    return output.getvalue(), 'image/png'
+
+
+def formatos_disponibles():
+    Image.init()
+    return [f for f in FORMATOS_VARIANTE if f[0] in Image.SAVE]
+
+
+def elegir_formato(accept):
+    # Negociación simple por la cabecera Accept; JPEG lo entiende cualquiera
+    accept = accept or ''
+    for formato in formatos_disponibles():
+        if formato[2] in accept or formato[0] == 'JPEG':
+            return formato
+    return FORMATOS_VARIANTE[-1]
+
+
+def elegir_ancho(pedido):
+    # El ancho estándar más chico que cubre lo pedido
+    for ancho in ANCHOS_MINIATURA:
+        if pedido <= ancho:
+            return ancho
+    return ANCHOS_MINIATURA[-1]
+
+
+def obtener_variante(material, ancho, formato):
+    # Devuelve (nombre en el almacenamiento, tamaño) y la genera si no existe
+    storage = blob_storage()
+    pillow_fmt, ext, _content_type, opciones = formato
+    nombre = storage.variant_name(material.thumbnail_sha256, ancho, ext)
+    if storage.exists(nombre):
+        return nombre, storage.size(nombre)
+
+    with material.open_thumbnail() as maestra:
+        image = Image.open(maestra)
+        image.load()
+    if image.width > ancho:
+        image = image.resize((ancho, round(image.height * ancho / image.width)), Image.LANCZOS)
+    if pillow_fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        fondo = Image.new('RGB', image.size, 'white')
+        fondo.paste(image, mask=image.getchannel('A'))
+        image = fondo
+    output = io.BytesIO()
+    image.save(output, format=pillow_fmt, **opciones)
+    return nombre, storage.store_variant(nombre, output.getvalue())
+
+
+@task('generar_miniatura', al_fallar=lambda material_id: _marcar(material_id, Material.THUMBNAIL_FALLIDA))
+def generar_miniatura(material_id):
+    material = Material.objects.filter(pk=material_id).first()
+    if material is None:
+        return
+    resultado = generate_thumbnail(material)
+    if resultado is None:
+        _marcar(material_id, Material.THUMBNAIL_NO_APLICA)
+        return
+    material.thumbnail_blob, material.thumbnail_tipo = resultado
+    material.save(update_fields=['thumbnail_blob', 'thumbnail_tipo'])
+
+
+def _marcar(material_id, estado):
+    # update() no dispara señales: el catálogo en caché se invalida a mano
+    Material.objects.filter(pk=material_id).update(thumbnail_status=estado)
+    invalidar_catalogo_al_confirmar()
+
+
+#------------------------Miniaturas en lote------------------------
+
+CAMPOS_MINIATURA = ['thumbnail_sha256', 'thumbnail_size', 'thumbnail_tipo', 'thumbnail_status']
+
+
+def pool_de_miniaturas(workers=None):
+    # spawn: los procesos no heredan las conexiones a la base de datos
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def tarea_de_miniatura(pool, material):
+    ruta = blob_storage().path(blob_storage().name_for(material.archivo_sha256))
+    return pool.submit(miniatura_de_archivo, ruta, material.archivo_tipo)
+
+
+def aplicar_miniatura(material, futuro):
+    # Guarda en el material el resultado del pool (sin save(): va con bulk_update
+    # y CAMPOS_MINIATURA). Devuelve el error, si lo hubo.
+    try:
+        resultado = futuro.result()
+    except Exception as e:
+        material.thumbnail_status = Material.THUMBNAIL_FALLIDA
+        return e
+    if resultado is None:
+        material.thumbnail_status = Material.THUMBNAIL_NO_APLICA
+        return None
+    contenido, material.thumbnail_tipo = resultado
+    material.thumbnail_sha256, material.thumbnail_size = blob_storage().store(contenido)
+    material.thumbnail_status = Material.THUMBNAIL_LISTA
+    return None
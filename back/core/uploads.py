@@ -0,0 +1,33 @@
+import hashlib
+
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    # Escribe cada fragmento del multipart a un archivo temporal y va calculando
+    # el SHA-256: en memoria nunca hay más de un fragmento (64 KB).
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        archivo.sha256 = self.sha256.hexdigest()
+        return archivo
+
+
+class ArchivoEnDisco(File):
+    # Archivo ya completo en disco y con su hash (p. ej. una subida por partes):
+    # como un TemporaryUploadedFile, store() lo mueve en vez de copiarlo
+    def __init__(self, path, name, sha256):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
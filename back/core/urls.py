@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import RegisterView, LoginView, ProfileView, VerifyEmailView, PasswordResetRequestView, PasswordResetConfirmView, MaterialListCreateView, MaterialDetailView, FavoritoViewSet, ComentarioViewSet, CalificacionViewSet, MaterialDownloadView, MaterialThumbnailView
+from .views import RegisterView, LoginView, ProfileView, VerifyEmailView, PasswordResetRequestView, PasswordResetConfirmView, MaterialListCreateView, MaterialDetailView, FavoritoViewSet, ComentarioViewSet, CalificacionViewSet, MaterialDownloadView, MaterialThumbnailView, SubidaFragmentadaCreateView, SubidaFragmentadaDetailView
 from rest_framework_simplejwt.views import (
     TokenRefreshView, TokenBlacklistView
 )
@@ -24,6 +24,8 @@ urlpatterns = [
     path('materiales/<int:pk>/', MaterialDetailView.as_view(), name='material-detail'),
     path('materiales/<int:pk>/descargar/', MaterialDownloadView.as_view(), name='material-download'),
     path('materiales/<int:pk>/thumbnail/', MaterialThumbnailView.as_view(), name='material-thumbnail'),
+    path('subidas/', SubidaFragmentadaCreateView.as_view(), name='subida-create'),
+    path('subidas/<uuid:pk>/', SubidaFragmentadaDetailView.as_view(), name='subida-detail'),
 ]
 
 urlpatterns += router.urls
@@ -1,28 +1,28 @@
 from rest_framework import generics, permissions, status, parsers, viewsets, filters
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import default_token_generator
-from .models import CustomUser, Material, Favorito, Comentario, Calificacion
-from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, UserProfileSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer, MaterialSerializer, FavoritoSerializer, ComentarioSerializer, CalificacionSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from .models import CustomUser, Material, Favorito, Comentario, Calificacion, SubidaFragmentada
+from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, UserProfileSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer, MaterialSerializer, FavoritoSerializer, ComentarioSerializer, CalificacionSerializer, SubidaFragmentadaSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate, get_user_model
 from .utils import send_verification_email, send_password_reset_email
+from .authentication import TokenConClaims
+from .downloads import serve_blob
+from .throttling import LimitePorEmail, LimitePorIP
+from .uploads import HashingFileUploadHandler
+from .pagination import KeysetPagination
+from .cache import CatalogoCacheMixin
+from .search import BusquedaFilter
+from .thumbnails import elegir_ancho, elegir_formato, obtener_variante
 from .permissions import IsOwnerOrReadOnly, EsAutorComentario
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import AllowAny
-from django.http import HttpResponse, Http404
-from rest_framework.parsers import JSONParser
-from PIL import Image
-import io
-import base64
-
-try:
-    from pdf2image import convert_from_bytes
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
-
+from django.http import JsonResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 User = get_user_model()
 
 #Registro con envio de correo
@@ -30,15 +30,21 @@ class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LimitePorIP, LimitePorEmail]
+    throttle_scope = 'registro'
 
     def perform_create(self, serializer):
-        user = serializer.save()
-        send_verification_email(user, self.request)
+        # El usuario y su correo de verificación se guardan juntos
+        with transaction.atomic():
+            user = serializer.save()
+            send_verification_email(user, self.request)
 
 # Login usando JWT
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LimitePorIP, LimitePorEmail]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -49,7 +55,7 @@ class LoginView(generics.GenericAPIView):
         if user is not None:
             if not user.is_verified:
                 return Response({'error': 'Cuenta no verificada. Revisa tu email.'}, status=status.HTTP_403_FORBIDDEN)
-            refresh = RefreshToken.for_user(user)
+            refresh = TokenConClaims.for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -63,7 +69,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return CustomUser.objects.select_related('estadisticas').get(pk=self.request.user.pk)
 
 #Verificacion email
 class VerifyEmailView(APIView):
@@ -89,6 +95,8 @@ class PasswordResetRequestView(generics.GenericAPIView):
     # Recibe solo el email, y manda el correo de recuperación
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LimitePorIP, LimitePorEmail]
+    throttle_scope = 'recuperacion'
 
     def post(self, request):
         email = request.data.get('email')
@@ -127,12 +135,13 @@ class PasswordResetConfirmView(generics.GenericAPIView):
 
 
 #------------------------------Material----------------------------
-class MaterialListCreateView(generics.ListCreateAPIView):
+class MaterialListCreateView(CatalogoCacheMixin, generics.ListCreateAPIView):
     queryset = Material.objects.all().order_by('-fecha_creacion')
     serializer_class = MaterialSerializer
     permission_classes = [AllowAny]
-    parser_classes = [JSONParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
     filterset_fields = {
         'titulo': ['exact', 'icontains'],
         'tipo': ['exact'],
@@ -140,50 +149,25 @@ class MaterialListCreateView(generics.ListCreateAPIView):
         'fecha_creacion': ['exact', 'gte', 'lte'],
     }
     search_fields = ['titulo', 'descripcion']
-    ordering_fields = ['fecha_creacion', 'titulo']
+    ordering_fields = ['fecha_creacion', 'titulo', 'calificacion_promedio', 'total_calificaciones']
 
     def get_queryset(self):
         user = self.request.user
+        qs = Material.objects.with_ratings(user)
         if user.is_authenticated:
-            return Material.objects.filter(usuario=user).order_by('-fecha_creacion')
-        return Material.objects.all().order_by('-fecha_creacion')
+            return qs.filter(usuario=user).order_by('-fecha_creacion')
+        return qs.order_by('-fecha_creacion')
+
+    def initial(self, request, *args, **kwargs):
+        # Multipart: los archivos van directo a disco, por fragmentos y con su hash
+        request.upload_handlers = [HashingFileUploadHandler(request)]
+        super().initial(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        # Decodifica el archivo principal
-        archivo_blob_b64 = self.request.data.get('archivo_blob')
-        archivo_tipo = self.request.data.get('archivo_tipo')
-
-        thumbnail_blob = None
-        thumbnail_tipo = None
-
-        # Solo para 'ficha' o 'presentacion' generamos thumbnail
-        if archivo_blob_b64 and archivo_tipo:
-            try:
-                decoded = base64.b64decode(archivo_blob_b64)
-                # Si es imagen
-                if archivo_tipo.startswith("image/"):
-                    thumb = Image.open(io.BytesIO(decoded))
-                    thumb.thumbnail((400, 400))
-                    output = io.BytesIO()
-                    thumb.save(output, format='PNG')
-                    thumbnail_blob = output.getvalue()
-                    thumbnail_tipo = 'image/png'
-                # Si es PDF y tienes pdf2image
-                elif archivo_tipo == "application/pdf" and PDF_SUPPORT:
-                    images = convert_from_bytes(decoded, first_page=1, last_page=1, size=(400, 400))
-                    output = io.BytesIO()
-                    images[0].save(output, format='PNG')
-                    thumbnail_blob = output.getvalue()
-                    thumbnail_tipo = 'image/png'
-                # Puedes agregar más tipos si lo deseas
-            except Exception as e:
-                print("No se pudo generar thumbnail automáticamente:", e)
-
-        serializer.save(
-            usuario=self.request.user,
-            thumbnail_blob=thumbnail_blob,
-            thumbnail_tipo=thumbnail_tipo,
-        )
+        # La miniatura la genera el worker (signals.encolar_miniatura);
+        # el contador del autor (EstadisticasUsuario) va en la misma transacción
+        with transaction.atomic():
+            serializer.save(usuario=self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -196,49 +180,148 @@ class MaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MaterialSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
+    def get_queryset(self):
+        return Material.objects.with_ratings(self.request.user)
+
+    def initial(self, request, *args, **kwargs):
+        request.upload_handlers = [HashingFileUploadHandler(request)]
+        super().initial(request, *args, **kwargs)
+
     def perform_update(self, serializer):
         serializer.save(usuario=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Borra en cascada favoritos, comentarios y calificaciones: todos los contadores juntos
+        with transaction.atomic():
+            instance.delete()
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
 
-class MaterialDownloadView(APIView):
-    def get(self, request, pk):
-        try:
-            material = Material.objects.get(pk=pk)
-        except Material.DoesNotExist:
-            raise Http404("Material no encontrado.")
+# Descargas y miniaturas: vistas asíncronas (Django, no DRF). Bajo ASGI un
+# cliente lento no ocupa un hilo mientras recibe el archivo (serve_blob
+# entrega un iterador asíncrono); bajo WSGI responden igual que antes.
+async def _material_o_404(pk):
+    try:
+        return await Material.objects.aget(pk=pk)
+    except Material.DoesNotExist:
+        return None
+
 
-        if not material.archivo_blob:
-            return Response({"error": "Este material no tiene archivo adjunto."}, status=404)
+def _no_encontrado():
+    return JsonResponse({"detail": "Material no encontrado."}, status=404)
+
+
+class MaterialDownloadView(View):
+    async def get(self, request, pk):
+        material = await _material_o_404(pk)
+        if material is None:
+            return _no_encontrado()
+
+        if not material.has_archivo:
+            return JsonResponse({"error": "Este material no tiene archivo adjunto."}, status=404)
 
         content_type = material.archivo_tipo or "application/octet-stream"
         nombre = material.archivo_nombre or f"material_{material.pk}"
 
-        response = HttpResponse(material.archivo_blob, content_type=content_type)
-        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
-        return response
+        return serve_blob(
+            request, material.archivo_sha256, material.archivo_size, content_type, nombre,
+            last_modified=material.fecha_actualizacion,
+        )
 
 
-class MaterialThumbnailView(APIView):
-    def get(self, request, pk):
-        try:
-            material = Material.objects.get(pk=pk)
-        except Material.DoesNotExist:
-            raise Http404("Material no encontrado.")
+class MaterialThumbnailView(View):
+    async def get(self, request, pk):
+        material = await _material_o_404(pk)
+        if material is None:
+            return _no_encontrado()
+
+        if not material.has_thumbnail:
+            return JsonResponse({"error": "Este material no tiene miniatura."}, status=404)
+
+        immutable = material.thumbnail_version == request.GET.get('v')
+        ancho = request.GET.get('w')
+        if ancho is None:
+            # Sin ?w= se envía la miniatura maestra, tal como se guardó
+            content_type = material.thumbnail_tipo or "image/png"
+            return serve_blob(
+                request, material.thumbnail_sha256, material.thumbnail_size, content_type,
+                f"thumbnail_{material.pk}.{content_type.split('/')[-1]}",
+                as_attachment=False,
+                last_modified=material.fecha_actualizacion,
+                immutable=immutable,
+            )
+
+        # isdecimal y no isdigit: '²' es un dígito pero int() no lo acepta
+        if not ancho.isdecimal() or int(ancho) == 0:
+            return JsonResponse({"error": "El parámetro w debe ser un ancho en píxeles."}, status=400)
+        ancho = elegir_ancho(int(ancho))
+        formato = elegir_formato(request.headers.get('Accept'))
+        # Redimensionar es trabajo de CPU: va a un hilo, fuera del event loop
+        nombre, size = await sync_to_async(obtener_variante, thread_sensitive=False)(material, ancho, formato)
+        _fmt, ext, content_type, _opciones = formato
+        return serve_blob(
+            request, f"{material.thumbnail_sha256}-{ancho}.{ext}", size, content_type,
+            f"thumbnail_{material.pk}_{ancho}.{ext}",
+            as_attachment=False,
+            last_modified=material.fecha_actualizacion,
+            immutable=immutable,
+            name=nombre,
+            vary=('Accept',),
+        )
+
+#-----------------------Subidas por partes-----------------------------
+class SubidaFragmentadaCreateView(generics.CreateAPIView):
+    serializer_class = SubidaFragmentadaSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
-        if not material.thumbnail_blob:
-            return Response({"error": "Este material no tiene miniatura."}, status=404)
+    def perform_create(self, serializer):
+        serializer.save(usuario=self.request.user)
 
-        content_type = material.thumbnail_tipo or "image/png"
-        nombre = f"thumbnail_{material.pk}.png"
 
-        response = HttpResponse(material.thumbnail_blob, content_type=content_type)
-        response['Content-Disposition'] = f'inline; filename="{nombre}"'
+class SubidaFragmentadaDetailView(generics.RetrieveDestroyAPIView):
+    # GET para saber desde dónde reanudar, PATCH para enviar el siguiente trozo
+    serializer_class = SubidaFragmentadaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Las vencidas ya no se pueden reanudar; run_worker las borra
+        vencidas = SubidaFragmentada.vencidas().values('pk')
+        return SubidaFragmentada.objects.filter(usuario=self.request.user).exclude(pk__in=vencidas)
+
+    def patch(self, request, pk):
+        subida = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            largo = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({"error": "Falta la cabecera Upload-Offset."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if offset != subida.recibido:
+            return Response(
+                {"error": "El offset no coincide con lo recibido.", "recibido": subida.recibido},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if largo <= 0 or offset + largo > subida.tamanio_total:
+            return Response({"error": "Tamaño del fragmento inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Se lee el cuerpo directo del stream, sin pasar por los parsers
+        if not subida.agregar(request._request, offset, largo):
+            subida.refresh_from_db()
+            return Response(
+                {"error": "Otra petición escribió en esta subida.", "recibido": subida.recibido},
+                status=status.HTTP_409_CONFLICT,
+            )
+        response = Response(self.get_serializer(subida).data)
+        response['Upload-Offset'] = subida.recibido
         return response
+
+    def perform_destroy(self, instance):
+        instance.descartar()
+
 #-----------------------FAvorito-----------------------------
 class FavoritoViewSet(viewsets.ModelViewSet):
     serializer_class = FavoritoSerializer
@@ -248,38 +331,62 @@ class FavoritoViewSet(viewsets.ModelViewSet):
         # Así solo puedes ver tus propios favoritos
         return Favorito.objects.filter(usuario=self.request.user)
 
+    # Los contadores del usuario (signals) se actualizan en la misma transacción
     def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
+        with transaction.atomic():
+            serializer.save(usuario=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
 #------------------------Comentarios----------------------------
 
 class ComentarioViewSet(viewsets.ModelViewSet):
     serializer_class = ComentarioSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, EsAutorComentario]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         material_id = self.request.query_params.get('material')
-        qs = Comentario.objects.all().order_by('-fecha')
+        qs = Comentario.objects.select_related('usuario').order_by('-fecha')
         if material_id:
             qs = qs.filter(material_id=material_id)
         return qs
 
+    # Los contadores del usuario (signals) se actualizan en la misma transacción
     def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
+        with transaction.atomic():
+            serializer.save(usuario=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
 
 #----------------------Calificacion-------------------------
 class CalificacionViewSet(viewsets.ModelViewSet):
     serializer_class = CalificacionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     queryset = Calificacion.objects.all()
 
     def get_queryset(self):
         material_id = self.request.query_params.get('material')
-        qs = Calificacion.objects.all().order_by('-fecha')
+        qs = Calificacion.objects.select_related('usuario').order_by('-fecha')
         if material_id:
             qs = qs.filter(material_id=material_id)
         return qs
 
+    # El resumen por material y los contadores del usuario (signals) se actualizan en la misma transacción
     def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
\ No newline at end of file
+        with transaction.atomic():
+            serializer.save(usuario=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
\ No newline at end of file
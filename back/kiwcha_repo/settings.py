@@ -20,6 +20,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 RECAPTCHA_SECRET_KEY = os.getenv('RECAPTCHA_SECRET_KEY')
+# Cliente de reCAPTCHA (core.recaptcha): timeouts en segundos y circuito
+RECAPTCHA_URL = os.getenv('RECAPTCHA_URL', 'https://www.google.com/recaptcha/api/siteverify')
+RECAPTCHA_TIMEOUT_CONEXION = float(os.getenv('RECAPTCHA_TIMEOUT_CONEXION', 2))
+RECAPTCHA_TIMEOUT_LECTURA = float(os.getenv('RECAPTCHA_TIMEOUT_LECTURA', 3))
+RECAPTCHA_CIRCUITO_FALLAS = 5
+RECAPTCHA_CIRCUITO_ESPERA = 30
 
 
 # Quick-start development settings - unsuitable for production
@@ -63,6 +69,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,12 +97,76 @@ WSGI_APPLICATION = 'kiwcha_repo.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql usa PostgreSQL (necesita psycopg); si no, SQLite en modo WAL
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'kiwcha'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', ''),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.getenv('DB_POOL', 'True') == 'True':
+        # Pool de psycopg 3 (psycopg[pool]) por proceso; con pool CONN_MAX_AGE debe ser 0
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Conexiones persistentes: no se reabre el archivo en cada petición
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Segundos que una escritura espera el lock antes de "database is locked"
+                'timeout': int(os.getenv('DB_TIMEOUT', 20)),
+                # Las transacciones toman el lock de escritura al empezar: sin
+                # esto, dos que leen y luego escriben chocan sin respetar el timeout
+                'transaction_mode': 'IMMEDIATE',
+                # Se ejecuta en cada conexión nueva. WAL: los lectores no se
+                # bloquean mientras alguien escribe
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))};"
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+
+# Réplicas de solo lectura (core.routers): DB_REPLICAS separadas por comas, cada
+# una es un archivo SQLite o un host de PostgreSQL con los mismos datos de la principal
+DATABASE_REPLICAS = []
+for numero, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica_{numero}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # En las pruebas la réplica es la misma base que la principal
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASES[alias]['HOST' if DB_ENGINE == 'postgresql' else 'NAME'] = replica.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Segundos que quien acaba de escribir sigue leyendo de la principal
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY', 10))
 
 
 # Password validation
@@ -118,8 +189,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        
+        'core.authentication.JWTAuthenticationEnCache',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -152,6 +222,68 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos de los materiales: fuera de la base de datos, direccionados por SHA-256
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'blobs': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+        'OPTIONS': {
+            'location': os.getenv('BLOB_STORAGE_ROOT', BASE_DIR / 'blobs'),
+        },
+    },
+}
+
+# Descargas: '' las sirve Django por bloques; 'x-sendfile' (Apache mod_xsendfile)
+# o 'x-accel-redirect' (nginx) delegan el envío al servidor web
+DOWNLOAD_SENDFILE = os.getenv('DOWNLOAD_SENDFILE', '')
+DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected-blobs/')
+
+# Subidas por partes: tamaño máximo y segundos tras los que una subida sin
+# terminar se descarta (run_worker / purge_uploads borran la fila y el archivo)
+SUBIDA_TAMANIO_MAXIMO = int(os.getenv('SUBIDA_TAMANIO_MAXIMO', 2 * 1024 ** 3))
+SUBIDA_EXPIRACION = int(os.getenv('SUBIDA_EXPIRACION', 24 * 3600))
+
+# Caché: Redis si hay REDIS_URL (necesita el paquete redis), si no, en memoria del proceso
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# JWT (core.authentication): el token lleva los datos del usuario y el usuario
+# autenticado sale del caché durante estos segundos. Con Redis el borrado llega a
+# todos los procesos; con el caché en memoria cada proceso tiene su copia, así que
+# el TTL es corto (5 s): es lo que otro worker puede tardar en notar un cambio
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.RefrescarTokenSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'core.authentication.CerrarSesionSerializer',
+}
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60 if os.getenv('REDIS_URL') else 5))
+
+# Límites por IP y por email de las vistas públicas (core.throttling); "N/s|min|hour|day"
+LIMITES_DE_PETICIONES = {
+    'login': {'ip': '30/min', 'email': '10/min'},
+    'registro': {'ip': '10/hour', 'email': '3/hour'},
+    'recuperacion': {'ip': '10/hour', 'email': '3/hour'},
+}
+
+# Listado anónimo de materiales en caché (core.cache); 0 lo desactiva
+CATALOGO_CACHE_ALIAS = 'default'
+CATALOGO_CACHE_TIMEOUT = int(os.getenv('CATALOGO_CACHE_TIMEOUT', 300))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -167,6 +299,9 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
+# Correos de la bandeja de salida que run_worker envía por cada conexión SMTP
+CORREOS_LOTE = int(os.getenv('CORREOS_LOTE', 50))
 
 
 
@@ -1,5 +1,7 @@
 // api/comments.ts
 
+import { fetchPage, Page } from './pagination';
+
 const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000/api";
 
 // Crear un nuevo comentario
@@ -53,16 +55,12 @@ export async function deleteComment(commentId: number, token: string) {
   }
 }
 
-//Obtener Comentarios
-export async function getComments(materialId: number, token?: string) {
-  const url = `${API_URL}/comentarios/?material=${materialId}`;
+//Obtener Comentarios: la primera página, o la de `pageUrl` (el `next` de la anterior)
+export async function getComments(materialId: number, token?: string, pageUrl?: string): Promise<Page> {
+  const url = pageUrl || `${API_URL}/comentarios/?material=${materialId}`;
   const headers: any = {
     'Content-Type': 'application/json',
   };
   if (token) headers['Authorization'] = `Bearer ${token}`;
-  const res = await fetch(url, { headers });
-  if (!res.ok) {
-    throw new Error('Error fetching comments');
-  }
-  return await res.json();
+  return await fetchPage(url, { headers }, 'Error fetching comments');
 }
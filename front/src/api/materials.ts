@@ -1,5 +1,7 @@
 // src/api/materials.ts
 
+import { fetchPage, Page } from './pagination';
+
 const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000/api";
 
 // Helper para convertir File a base64
@@ -16,7 +18,7 @@ export async function fileToBase64(file: File): Promise<string> {
   });
 }
 
-// Función para subir material (como JSON con archivo en base64)
+// Función para subir material (multipart: el archivo viaja tal cual, sin base64)
 export async function uploadMaterial(
   fields: {
     titulo: string,
@@ -27,31 +29,25 @@ export async function uploadMaterial(
   },
   token: string
 ) {
-  let archivo_blob, archivo_nombre, archivo_tipo;
+  const formData = new FormData();
+  formData.append("titulo", fields.titulo);
+  formData.append("descripcion", fields.descripcion || "");
+  formData.append("tipo", fields.tipo);
 
   if (fields.archivo) {
-    archivo_blob = await fileToBase64(fields.archivo);
-    archivo_nombre = fields.archivo.name;
-    archivo_tipo = fields.archivo.type;
+    formData.append("archivo", fields.archivo);
+    formData.append("archivo_nombre", fields.archivo.name);
+    formData.append("archivo_tipo", fields.archivo.type);
   }
+  if (fields.video_url) formData.append("video_url", fields.video_url);
 
-  const payload = {
-    titulo: fields.titulo,
-    descripcion: fields.descripcion || "",
-    tipo: fields.tipo,
-    archivo_blob,
-    archivo_nombre,
-    archivo_tipo,
-    video_url: fields.video_url || null,
-  };
-
+  // Sin Content-Type: el navegador agrega el boundary del multipart
   const res = await fetch(`${API_URL}/materiales/`, {
     method: "POST",
     headers: {
       "Authorization": `Bearer ${token}`,
-      "Content-Type": "application/json",
     },
-    body: JSON.stringify(payload),
+    body: formData,
   });
 
   const contentType = res.headers.get("content-type") || "";
@@ -73,62 +69,76 @@ export async function uploadMaterial(
   }
 }
 
-// Obtener todos los materiales (sin filtro por usuario)
-export async function getAllMaterials(
-  type: string = '',
-  author: string = '',
-  sort: string = 'newest',
-  startDate: string = '',
-  endDate: string = '',
-  token: string = '' // Si no hay token, se puede dejar vacío
+// Orden del selector del frontend -> ?ordering= del backend
+const ORDERING: { [key: string]: string } = {
+  newest: '',
+  oldest: 'fecha_creacion',
+  rating: '-calificacion_promedio',
+  title: 'titulo',
+};
+
+function materialsUrl(
+  type: string,
+  author: string,
+  sort: string,
+  startDate: string,
+  endDate: string,
+  search: string,
+  pageSize?: number
 ) {
   const url = new URL(`${API_URL}/materiales/`);
 
   if (type) url.searchParams.append('tipo', type);
   if (author) url.searchParams.append('usuario', author);
-  if (sort && sort !== 'newest') url.searchParams.append('ordering', sort);
+  if (ORDERING[sort]) url.searchParams.append('ordering', ORDERING[sort]);
   if (startDate) url.searchParams.append('fecha_creacion__gte', startDate);
   if (endDate) url.searchParams.append('fecha_creacion__lte', endDate);
+  if (search) url.searchParams.append('search', search);
+  if (pageSize) url.searchParams.append('page_size', String(pageSize));
+  return url.toString();
+}
 
-  const res = await fetch(url.toString(), {
-    method: 'GET',
-    headers: {
-      'Authorization': token ? `Bearer ${token}` : '',
-    },
-  });
-
-  if (!res.ok) throw new Error('Error loading materials');
-
-  return await res.json();
+// Primera página de todos los materiales (sin filtro por usuario)
+export async function getAllMaterials(
+  type: string = '',
+  author: string = '',
+  sort: string = 'newest',
+  startDate: string = '',
+  endDate: string = '',
+  token: string = '', // Si no hay token, se puede dejar vacío
+  search: string = '',
+  pageSize?: number
+): Promise<Page> {
+  return await getMaterialsPage(
+    materialsUrl(type, author, sort, startDate, endDate, search, pageSize),
+    token
+  );
 }
 
-// Obtener materiales del usuario autenticado
+// Primera página de los materiales del usuario autenticado
 export async function getMyMaterials(
   type: string = '',
   author: string = '',
   sort: string = 'newest',
   startDate: string = '',
   endDate: string = '',
-  token: string
-) {
-  const url = new URL(`${API_URL}/materiales/`);
-
-  if (type) url.searchParams.append('tipo', type);
-  if (author) url.searchParams.append('usuario', author);
-  if (sort && sort !== 'newest') url.searchParams.append('ordering', sort);
-  if (startDate) url.searchParams.append('fecha_creacion__gte', startDate);
-  if (endDate) url.searchParams.append('fecha_creacion__lte', endDate);
+  token: string,
+  pageSize?: number
+): Promise<Page> {
+  return await getMaterialsPage(
+    materialsUrl(type, author, sort, startDate, endDate, '', pageSize),
+    token
+  );
+}
 
-  const res = await fetch(url.toString(), {
+// Otra página de un listado de materiales: `url` es el `next` o `previous` de la anterior
+export async function getMaterialsPage(url: string, token: string = ''): Promise<Page> {
+  return await fetchPage(url, {
     method: 'GET',
     headers: {
-      'Authorization': `Bearer ${token}`,
+      'Authorization': token ? `Bearer ${token}` : '',
     },
-  });
-
-  if (!res.ok) throw new Error('Error loading materials');
-
-  return await res.json();
+  }, 'Error loading materials');
 }
 
 // Eliminar un material por ID
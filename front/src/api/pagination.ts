@@ -0,0 +1,18 @@
+// api/pagination.ts
+
+// Los listados del backend vienen paginados por cursor: { next, previous, results }.
+// `next` y `previous` son las URLs (con ?cursor=) de las páginas vecinas, o null.
+export interface Page<T = any> {
+  results: T[];
+  next: string | null;
+  previous: string | null;
+}
+
+// Pide UNA sola página; para la siguiente se vuelve a llamar con `next`
+export async function fetchPage(url: string, init: RequestInit, errorMessage: string): Promise<Page> {
+  const res = await fetch(url, init);
+  if (!res.ok) throw new Error(errorMessage);
+  const data = await res.json();
+  if (Array.isArray(data)) return { results: data, next: null, previous: null };
+  return { results: data.results, next: data.next ?? null, previous: data.previous ?? null };
+}
@@ -2,14 +2,8 @@
 
 const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000/api";
 
-// Obtener ratings de un material
-export async function getRatings(materialId: number, token?: string) {
-  const headers: any = { 'Content-Type': 'application/json' };
-  if (token) headers['Authorization'] = `Bearer ${token}`;
-  const res = await fetch(`${API_URL}/calificaciones/?material=${materialId}`, { headers });
-  if (!res.ok) throw new Error('Error fetching ratings');
-  return await res.json();
-}
+// El promedio y la calificación propia (mi_calificacion, mi_calificacion_id)
+// vienen en el detalle del material: no hace falta listar las calificaciones
 
 // Calificar un material (crear)
 export async function addRating(materialId: number, rating: number, token: string) {
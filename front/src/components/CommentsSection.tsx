@@ -15,6 +15,8 @@ interface CommentsSectionProps {
   onDelete: (commentId: number) => void;
   isAuthenticated: boolean;
   currentUserEmail?: string;
+  hasMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 export default function CommentsSection({
@@ -23,6 +25,8 @@ export default function CommentsSection({
   onDelete,
   isAuthenticated,
   currentUserEmail,
+  hasMore,
+  onLoadMore,
 }: CommentsSectionProps) {
   const { t } = useTranslation();
   const [input, setInput] = useState('');
@@ -94,6 +98,16 @@ export default function CommentsSection({
           </div>
         ))}
       </div>
+      {/* Los comentarios llegan por páginas: el resto se pide con el cursor */}
+      {hasMore && onLoadMore && (
+        <button
+          type="button"
+          onClick={onLoadMore}
+          className="mt-4 w-full border border-gray-300 rounded px-4 py-2 text-sm font-medium text-gray-700 bg-white hover:bg-gray-50"
+        >
+          {t('comments.loadMore')}
+        </button>
+      )}
     </div>
   );
 }
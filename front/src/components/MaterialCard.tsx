@@ -17,6 +17,7 @@ interface Material {
   downloadUrl?: string;
   video_url?: string;
   thumbnail_url?: string;  // <--- este es el campo importante
+  thumbnail_srcset?: string;  // anchos para srcset (el backend elige WebP/JPEG)
   rating: number;
   ratingsCount: number;
 }
@@ -77,6 +78,7 @@ const MaterialCard: React.FC<MaterialCardProps> = ({ material }) => {
   };
 
   let displayImage: string | null = null;
+  let displaySrcSet: string | undefined;
 
   // 1. Si es video, usa miniatura de YouTube
   if (material.type === 'video' && material.video_url) {
@@ -85,6 +87,7 @@ const MaterialCard: React.FC<MaterialCardProps> = ({ material }) => {
   // 2. Si hay miniatura generada en el backend (para PDFs/fichas/presentaciones)
   else if (material.thumbnail_url) {
     displayImage = material.thumbnail_url;
+    displaySrcSet = material.thumbnail_srcset || undefined;
   }
 
   return (
@@ -93,6 +96,8 @@ const MaterialCard: React.FC<MaterialCardProps> = ({ material }) => {
         {displayImage ? (
           <img
             src={displayImage}
+            srcSet={displaySrcSet}
+            sizes="(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
             alt={material.title}
             className="w-full h-48 object-cover"
             loading="lazy"
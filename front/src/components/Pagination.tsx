@@ -2,11 +2,14 @@ import React from 'react';
 import { useTranslation } from 'react-i18next';
 import { ChevronLeft, ChevronRight } from 'lucide-react';
 
+// Con totalPages muestra los números de página. Sin él (listados por cursor,
+// donde no se conoce el total) solo Anterior/Siguiente, según hasNext.
 interface PaginationProps {
   currentPage: number;
-  totalPages: number;
-  totalItems: number;
-  itemsPerPage: number;
+  totalPages?: number;
+  totalItems?: number;
+  itemsPerPage?: number;
+  hasNext?: boolean;
   onPageChange: (page: number) => void;
 }
 
@@ -15,10 +18,38 @@ const Pagination: React.FC<PaginationProps> = ({
   totalPages,
   totalItems,
   itemsPerPage,
+  hasNext,
   onPageChange
 }) => {
   const { t } = useTranslation();
 
+  if (totalPages === undefined || totalItems === undefined || itemsPerPage === undefined) {
+    if (currentPage === 1 && !hasNext) return null;
+    return (
+      <div className="flex items-center justify-between px-4 py-3 bg-white border-t border-gray-200 sm:px-6">
+        <button
+          onClick={() => onPageChange(currentPage - 1)}
+          disabled={currentPage === 1}
+          className="relative inline-flex items-center px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+        >
+          <ChevronLeft className="h-5 w-5 mr-1" />
+          {t('common.previous')}
+        </button>
+        <span className="text-sm text-gray-700">
+          {t('pagination.page')} <span className="font-medium">{currentPage}</span>
+        </span>
+        <button
+          onClick={() => onPageChange(currentPage + 1)}
+          disabled={!hasNext}
+          className="relative inline-flex items-center px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+        >
+          {t('common.next')}
+          <ChevronRight className="h-5 w-5 ml-1" />
+        </button>
+      </div>
+    );
+  }
+
   const startItem = (currentPage - 1) * itemsPerPage + 1;
   const endItem = Math.min(currentPage * itemsPerPage, totalItems);
 
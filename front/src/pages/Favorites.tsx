@@ -15,18 +15,33 @@ const Favorites: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [currentPage, setCurrentPage] = useState(1);
 
+  // La lista de favoritos (solo ids) ya está en el contexto: se pide el detalle
+  // únicamente de los materiales de la página visible
+  const itemsPerPage = 8;
+  const totalPages = Math.ceil(favoritos.length / itemsPerPage);
+  const pageFavoritos = favoritos.slice(
+    (currentPage - 1) * itemsPerPage,
+    currentPage * itemsPerPage
+  );
+  const pageKey = pageFavoritos.map(fav => fav.material).join(',');
+
+  // Si se quitó el último favorito de la última página, retrocede una
+  useEffect(() => {
+    if (currentPage > 1 && currentPage > totalPages) setCurrentPage(Math.max(totalPages, 1));
+  }, [currentPage, totalPages]);
+
   useEffect(() => {
     let isMounted = true;
     setLoading(true);
 
-    if (!token || favoritos.length === 0) {
+    if (!token || pageFavoritos.length === 0) {
       setMaterials([]);
       setLoading(false);
       return;
     }
 
     Promise.all(
-      favoritos.map(fav =>
+      pageFavoritos.map(fav =>
         getMaterialDetail(fav.material, token).catch(() => null)
       )
     ).then(results => {
@@ -41,6 +56,7 @@ setMaterials(
     createdAt: mat.fecha_creacion || mat.createdAt || '',
     downloadUrl: mat.tipo !== 'video' ? (mat.archivo_url || mat.downloadUrl || '') : '',
     thumbnail_url: mat.thumbnail_url || '',
+    thumbnail_srcset: mat.thumbnail_srcset || '',
     rating: mat.calificacion_promedio || 0,
     ratingsCount: mat.total_calificaciones || 0,
     video_url: mat.video_url || '',
@@ -50,15 +66,8 @@ setMaterials(
     });
 
     return () => { isMounted = false; };
-  }, [favoritos, token]);
-
-  // Paginación
-  const itemsPerPage = 8;
-  const totalPages = Math.ceil(materials.length / itemsPerPage);
-  const paginatedMaterials = materials.slice(
-    (currentPage - 1) * itemsPerPage,
-    currentPage * itemsPerPage
-  );
+    // eslint-disable-next-line
+  }, [pageKey, token]);
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -102,7 +111,7 @@ setMaterials(
         ) : (
           <>
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-              {paginatedMaterials.map((material) => (
+              {materials.map((material) => (
                 <MaterialCard key={material.id} material={material} />
               ))}
             </div>
@@ -112,7 +121,7 @@ setMaterials(
                 <Pagination
                   currentPage={currentPage}
                   totalPages={totalPages}
-                  totalItems={materials.length}
+                  totalItems={favoritos.length}
                   itemsPerPage={itemsPerPage}
                   onPageChange={setCurrentPage}
                 />
@@ -11,12 +11,12 @@ const Home: React.FC = () => {
   const [recentMaterials, setRecentMaterials] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
 
-  // Trae SOLO los 3 materiales más recientes del backend
+  // Trae SOLO los 3 materiales más recientes del backend (?page_size=3)
   useEffect(() => {
     setLoading(true);
-    getAllMaterials('', '', 'newest', '', '')
+    getAllMaterials('', '', 'newest', '', '', '', '', 3)
       .then(data => {
-const topThree = data.slice(0, 3).map((mat: any) => ({
+const topThree = data.results.map((mat: any) => ({
   id: mat.id,
   title: mat.titulo,
   description: mat.descripcion,
@@ -25,6 +25,7 @@ const topThree = data.slice(0, 3).map((mat: any) => ({
   createdAt: mat.fecha_creacion,
   downloadUrl: mat.tipo !== 'video' ? (mat.archivo_url || '') : '',
   thumbnail_url: mat.thumbnail_url || '',
+  thumbnail_srcset: mat.thumbnail_srcset || '',
   rating: mat.calificacion_promedio || 0,
   ratingsCount: mat.total_calificaciones || 0,
   video_url: mat.video_url || '',
@@ -4,7 +4,7 @@ import { useTranslation } from 'react-i18next';
 import { useAuth } from '../contexts/AuthContext';
 import { getMaterialDetail } from '../api/materials';
 import { getComments, addComment, deleteComment } from '../api/comments';
-import { getRatings, addRating, updateRating } from '../api/rating';
+import { addRating, updateRating } from '../api/rating';
 import StarRating from '../components/Rating';
 import CommentsSection from '../components/CommentsSection';
 
@@ -31,40 +31,57 @@ const MaterialDetail: React.FC = () => {
   }
   const [comments, setComments] = useState<Comment[]>([]);
   const [commentsLoading, setCommentsLoading] = useState(true);
+  // Cursor de la siguiente página de comentarios (null = no hay más)
+  const [commentsNext, setCommentsNext] = useState<string | null>(null);
+
+  // El detalle trae el promedio y, con token, la calificación propia y su id
+  const fetchMaterial = () => {
+    if (!id) return Promise.resolve();
+    return getMaterialDetail(id, token || undefined).then((data) => {
+      setMaterial({
+        ...data,
+        archivo_url: data.archivo_url || '',
+        thumbnail_url: data.thumbnail_url || '',
+        usuario_nombre: data.usuario_nombre || data.usuario || '',
+      });
+      setAverageRating(data.calificacion_promedio || 0);
+      setUserRating(user ? data.mi_calificacion || 0 : 0);
+      setUserRatingId(user ? data.mi_calificacion_id ?? null : null);
+    });
+  };
 
   useEffect(() => {
     if (id) {
       setLoading(true);
-      getMaterialDetail(id)
-        .then((data) => {
-          setMaterial({
-            ...data,
-            archivo_url: data.archivo_url || '',
-            thumbnail_url: data.thumbnail_url || '',
-            usuario_nombre: data.usuario_nombre || data.usuario || '',
-          });
-          setLoading(false);
-        })
+      fetchMaterial()
+        .then(() => setLoading(false))
         .catch(() => setLoading(false));
     }
-  }, [id]);
+    // eslint-disable-next-line
+  }, [id, token, user]);
+
+  const mapComment = (c: any): Comment => ({
+    id: c.id,
+    author: c.nombre_usuario,
+    authorEmail: c.usuario_email,
+    content: c.texto,
+    createdAt: c.fecha,
+  });
 
-  const fetchComments = () => {
+  // Sin `pageUrl` recarga la primera página; con él agrega la siguiente
+  const fetchComments = (pageUrl?: string) => {
     if (id) {
-      setCommentsLoading(true);
-      getComments(Number(id), token || undefined)
+      if (!pageUrl) setCommentsLoading(true);
+      getComments(Number(id), token || undefined, pageUrl)
         .then((data) => {
-          setComments(data.map((c: any) => ({
-            id: c.id,
-            author: c.nombre_usuario,
-            authorEmail: c.usuario_email,
-            content: c.texto,
-            createdAt: c.fecha,
-          })));
+          const nuevos = data.results.map(mapComment);
+          setComments(prev => (pageUrl ? [...prev, ...nuevos] : nuevos));
+          setCommentsNext(data.next);
           setCommentsLoading(false);
         })
         .catch(() => {
-          setComments([]);
+          if (!pageUrl) setComments([]);
+          setCommentsNext(null);
           setCommentsLoading(false);
         });
     }
@@ -75,44 +92,6 @@ const MaterialDetail: React.FC = () => {
     // eslint-disable-next-line
   }, [id, token]);
 
-  const fetchRatings = () => {
-    if (id) {
-      getRatings(Number(id), user && token ? token : undefined)
-        .then((data) => {
-          if (!data || data.length === 0) {
-            setAverageRating(0);
-            setUserRating(0);
-            setUserRatingId(null);
-          } else {
-            const sum = data.reduce((acc: number, r: any) => acc + r.puntaje, 0);
-            setAverageRating(sum / data.length);
-
-            // Rating del usuario actual
-            const userCalificacion = user
-              ? data.find((r: any) => r.usuario === user.email)
-              : null;
-            if (userCalificacion) {
-              setUserRating(userCalificacion.puntaje);
-              setUserRatingId(userCalificacion.id);
-            } else {
-              setUserRating(0);
-              setUserRatingId(null);
-            }
-          }
-        })
-        .catch(() => {
-          setAverageRating(0);
-          setUserRating(0);
-          setUserRatingId(null);
-        });
-    }
-  };
-
-  useEffect(() => {
-    fetchRatings();
-    // eslint-disable-next-line
-  }, [id, token, user]);
-
   const handleSendComment = async (comment: string) => {
     if (!user || !token || !id) return;
     try {
@@ -141,7 +120,7 @@ const MaterialDetail: React.FC = () => {
       } else {
         await addRating(Number(id), value, token);
       }
-      fetchRatings();
+      await fetchMaterial();
     } catch (error: any) {
       alert(error.message);
     }
@@ -331,6 +310,8 @@ const MaterialDetail: React.FC = () => {
                   onDelete={handleDeleteComment}
                   isAuthenticated={!!user}
                   currentUserEmail={user?.email}
+                  hasMore={Boolean(commentsNext)}
+                  onLoadMore={() => commentsNext && fetchComments(commentsNext)}
                 />
               )}
             </div>
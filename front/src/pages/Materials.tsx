@@ -4,7 +4,8 @@ import { useSearchParams } from 'react-router-dom';
 import { Search, Filter } from 'lucide-react';
 import MaterialCard from '../components/MaterialCard';
 import Pagination from '../components/Pagination';
-import { getAllMaterials } from '../api/materials';
+import { getAllMaterials, getMaterialsPage } from '../api/materials';
+import { Page } from '../api/pagination';
 
 const Materials: React.FC = () => {
   const { t } = useTranslation(); // Hook para traducir
@@ -15,7 +16,12 @@ const Materials: React.FC = () => {
   const [selectedType, setSelectedType] = useState<string>(''); // Predeterminado vacío
   const [sortBy, setSortBy] = useState<string>('newest'); // Predeterminado 'newest'
   const [currentPage, setCurrentPage] = useState(1);
+  // Página pedida por cursor (null = la primera) y los cursores de la actual
+  const [pageUrl, setPageUrl] = useState<string | null>(null);
+  const [page, setPage] = useState<Page>({ results: [], next: null, previous: null });
   const [showFilters, setShowFilters] = useState(false);
+  const search = searchParams.get("search") || "";
+  const itemsPerPage = 8;
 
   const materialTypes = [
     { value: "", label: t("materials.allTypes") },
@@ -65,25 +71,48 @@ const Materials: React.FC = () => {
     if (selectedType) params.set("tipo", selectedType);
     if (sortBy !== "newest") params.set("sort", sortBy);
     setSearchParams(params);  // Actualiza los parámetros en la URL
-    setCurrentPage(1);  // Resetear la página cuando se actualizan los filtros
+    setPageUrl(null);  // Volver a la primera página cuando se actualizan los filtros
+    setCurrentPage(1);
+  };
+
+  // Cambiar un filtro vuelve a la primera página (un cursor vale solo para su orden)
+  const changeFilter = (setter: (value: string) => void, value: string) => {
+    setter(value);
+    setPageUrl(null);
+    setCurrentPage(1);
+  };
+
+  const handlePageChange = (newPage: number) => {
+    const url = newPage > currentPage ? page.next : page.previous;
+    if (!url) return;
+    setPageUrl(url);
+    setCurrentPage(newPage);
   };
 
   // Fetch materials when filters change
   useEffect(() => {
+    let isMounted = true;
     const fetchMaterials = async () => {
       setLoading(true);
       try {
-        const data = await getAllMaterials(
-          selectedType,
-          "", // autor no es necesario
-          sortBy,
-          "", // No estamos usando fechas
-          "",
-          "" // No necesitamos el token aquí
-        );
+        // Filtros, búsqueda y orden los resuelve el backend; solo se pide una página
+        const data = pageUrl
+          ? await getMaterialsPage(pageUrl)
+          : await getAllMaterials(
+              selectedType,
+              "", // autor no es necesario
+              sortBy,
+              "", // No estamos usando fechas
+              "",
+              "", // No necesitamos el token aquí
+              search,
+              itemsPerPage
+            );
+        if (!isMounted) return;
+        setPage(data);
 
         // Map the materials returned to a usable format
-        const mappedMaterials = data.map((item: any) => {
+        const mappedMaterials = data.results.map((item: any) => {
           let thumbnail = '';
 
           // Si es un video, usamos la miniatura de YouTube
@@ -104,6 +133,7 @@ const Materials: React.FC = () => {
             createdAt: item.fecha_creacion,
             downloadUrl: item.tipo !== 'video' ? (item.archivo_url || '') : '', 
             thumbnail_url: thumbnail || '', 
+            thumbnail_srcset: item.tipo !== 'video' ? (item.thumbnail_srcset || '') : '',
             rating: typeof item.calificacion_promedio === "number" ? item.calificacion_promedio : 0,
             ratingsCount: item.total_calificaciones || 0, 
             video_url: item.video_url || ''
@@ -112,48 +142,17 @@ const Materials: React.FC = () => {
 
         setMaterials(mappedMaterials);
       } catch (error) {
+        if (!isMounted) return;
         setMaterials([]);
+        setPage({ results: [], next: null, previous: null });
       } finally {
-        setLoading(false);
+        if (isMounted) setLoading(false);
       }
     };
 
-    // Solo ejecutamos si alguno de los filtros ha cambiado
-    if (selectedType || sortBy) {
-      fetchMaterials();
-    }
-  }, [selectedType, sortBy]);
-
-  const filteredMaterials = materials.filter((material) => {
-    const matchesSearch =
-      material.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      material.description.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesType = !selectedType || material.type === selectedType;
-
-    return matchesSearch && matchesType;
-  });
-
-  const sortedMaterials = [...filteredMaterials].sort((a, b) => {
-    switch (sortBy) {
-      case "newest":
-        return new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime();
-      case "oldest":
-        return new Date(a.createdAt).getTime() - new Date(b.createdAt).getTime();
-      case "rating":
-        return b.rating - a.rating;
-      case "title":
-        return a.title.localeCompare(b.title);
-      default:
-        return 0;
-    }
-  });
-
-  const itemsPerPage = 8;
-  const totalPages = Math.ceil(sortedMaterials.length / itemsPerPage);
-  const paginatedMaterials = sortedMaterials.slice(
-    (currentPage - 1) * itemsPerPage,
-    currentPage * itemsPerPage
-  );
+    fetchMaterials();
+    return () => { isMounted = false; };
+  }, [selectedType, sortBy, search, pageUrl]);
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -199,7 +198,7 @@ const Materials: React.FC = () => {
                   </label>
                   <select
                     value={selectedType}
-                    onChange={(e) => setSelectedType(e.target.value)}
+                    onChange={(e) => changeFilter(setSelectedType, e.target.value)}
                     className="w-full border border-gray-300 rounded-md px-3 py-2 focus:ring-2 focus:ring-purple-500 focus:border-transparent"
                   >
                     {materialTypes.map((type) => (
@@ -216,7 +215,7 @@ const Materials: React.FC = () => {
                   </label>
                   <select
                     value={sortBy}
-                    onChange={(e) => setSortBy(e.target.value)}
+                    onChange={(e) => changeFilter(setSortBy, e.target.value)}
                     className="w-full border border-gray-300 rounded-md px-3 py-2 focus:ring-2 focus:ring-purple-500 focus:border-transparent"
                   >
                     {sortOptions.map((option) => (
@@ -235,31 +234,27 @@ const Materials: React.FC = () => {
           <div className="flex items-center justify-center py-12">
             <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-purple-600"></div>
           </div>
-        ) : sortedMaterials.length === 0 ? (
+        ) : materials.length === 0 ? (
           <div className="text-center py-12">
             <p className="text-gray-500 text-lg">{t("materials.noResults")}</p>
           </div>
         ) : (
           <>
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-              {paginatedMaterials.map((material) => (
+              {materials.map((material) => (
                 <div key={material.id} className="relative group">
                   <MaterialCard material={material} />
                 </div>
               ))}
             </div>
 
-            {totalPages > 1 && (
-              <div className="mt-8">
-                <Pagination
-                  currentPage={currentPage}
-                  totalPages={totalPages}
-                  totalItems={sortedMaterials.length}
-                  itemsPerPage={itemsPerPage}
-                  onPageChange={setCurrentPage}
-                />
-              </div>
-            )}
+            <div className="mt-8">
+              <Pagination
+                currentPage={currentPage}
+                hasNext={Boolean(page.next)}
+                onPageChange={handlePageChange}
+              />
+            </div>
           </>
         )}
       </div>
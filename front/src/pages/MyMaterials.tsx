@@ -5,7 +5,8 @@ import { Plus, Trash2, Eye } from 'lucide-react';
 import { Link, useNavigate } from 'react-router-dom';
 import MaterialCard from '../components/MaterialCard';
 import Pagination from '../components/Pagination';
-import { getMyMaterials, deleteMaterial } from '../api/materials';
+import { getMyMaterials, getMaterialsPage, deleteMaterial } from '../api/materials';
+import { Page } from '../api/pagination';
 import ModalConfirm from '../components/ModalConfirm'; 
 
 const MyMaterials: React.FC = () => {
@@ -14,11 +15,17 @@ const MyMaterials: React.FC = () => {
   const [materials, setMaterials] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [currentPage, setCurrentPage] = useState(1);
+  // Página pedida por cursor (null = la primera) y los cursores de la actual
+  const [pageUrl, setPageUrl] = useState<string | null>(null);
+  const [page, setPage] = useState<Page>({ results: [], next: null, previous: null });
   const [error, setError] = useState<string | null>(null);
   const [deleteModal, setDeleteModal] = useState<{ open: boolean, id: string | null }>({ open: false, id: null }); 
   const navigate = useNavigate();
 
+  const itemsPerPage = 8;
+
   useEffect(() => {
+    let isMounted = true;
     const fetchMaterials = async () => {
       setLoading(true);
       setError(null);
@@ -30,11 +37,13 @@ const MyMaterials: React.FC = () => {
       }
 
       try {
-        const apiMaterials = await getMyMaterials(
-          '', '', 'newest', '', '', token
-        );
+        const data = pageUrl
+          ? await getMaterialsPage(pageUrl, token)
+          : await getMyMaterials('', '', 'newest', '', '', token, itemsPerPage);
+        if (!isMounted) return;
+        setPage(data);
 
-        const mapped = apiMaterials.map((mat: any) => ({
+        const mapped = data.results.map((mat: any) => ({
           id: mat.id,
           title: mat.titulo,
           description: mat.descripcion,
@@ -43,19 +52,29 @@ const MyMaterials: React.FC = () => {
           createdAt: mat.fecha_creacion,
           downloadUrl: mat.tipo !== 'video' ? (mat.archivo_url || '') : '',
           thumbnail_url: mat.thumbnail_url || "",
+          thumbnail_srcset: mat.thumbnail_srcset || "",
           rating: mat.calificacion_promedio || 0,
           ratingsCount: mat.total_calificaciones || 0,
           video_url: mat.video_url || "",
         }));
         setMaterials(mapped);
       } catch (err: any) {
+        if (!isMounted) return;
         setError(err.message || "Error cargando materiales");
       } finally {
-        setLoading(false);
+        if (isMounted) setLoading(false);
       }
     };
     fetchMaterials();
-  }, [token]);
+    return () => { isMounted = false; };
+  }, [token, pageUrl]);
+
+  const handlePageChange = (newPage: number) => {
+    const url = newPage > currentPage ? page.next : page.previous;
+    if (!url) return;
+    setPageUrl(url);
+    setCurrentPage(newPage);
+  };
 
   const openDeleteModal = (id: string) => setDeleteModal({ open: true, id });
   const confirmDelete = async () => {
@@ -71,12 +90,6 @@ const MyMaterials: React.FC = () => {
   };
   const cancelDelete = () => setDeleteModal({ open: false, id: null });
 
-  const itemsPerPage = 8;
-  const totalPages = Math.ceil(materials.length / itemsPerPage);
-  const paginatedMaterials = materials.slice(
-    (currentPage - 1) * itemsPerPage,
-    currentPage * itemsPerPage
-  );
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -116,7 +129,7 @@ const MyMaterials: React.FC = () => {
           <div className="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-3 text-center">
             {error}
           </div>
-        ) : materials.length === 0 ? (
+        ) : materials.length === 0 && currentPage === 1 ? (
           <div className="text-center py-12">
             <div className="max-w-md mx-auto">
               <div className="w-24 h-24 bg-gray-200 rounded-full flex items-center justify-center mx-auto mb-4">
@@ -140,7 +153,7 @@ const MyMaterials: React.FC = () => {
         ) : (
           <>
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-              {paginatedMaterials.map((material) => (
+              {materials.map((material) => (
                 <div key={material.id} className="relative">
                   <MaterialCard material={material} />
                   <div className="flex space-x-2 mt-4">
@@ -161,17 +174,13 @@ const MyMaterials: React.FC = () => {
               ))}
             </div>
 
-            {totalPages > 1 && (
-              <div className="mt-8">
-                <Pagination
-                  currentPage={currentPage}
-                  totalPages={totalPages}
-                  totalItems={materials.length}
-                  itemsPerPage={itemsPerPage}
-                  onPageChange={setCurrentPage}
-                />
-              </div>
-            )}
+            <div className="mt-8">
+              <Pagination
+                currentPage={currentPage}
+                hasNext={Boolean(page.next)}
+                onPageChange={handlePageChange}
+              />
+            </div>
           </>
         )}
       </div>